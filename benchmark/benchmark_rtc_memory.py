@@ -0,0 +1,72 @@
+# Benchmark of storing and restoring the tasks to/from RTC memory
+#
+# Measures time and allocated heap memory of _store() and of restoring the
+# tasks as done by _restore_from_rtc_memory() without printing them.
+# To run it, put sleepscheduler.py and this file onto the ESP32 and execute:
+#
+# import benchmark_rtc_memory
+# benchmark_rtc_memory.run()
+
+import sleepscheduler as sl
+import machine
+import utime
+import gc
+
+
+TASK_COUNTS = [1, 10, 50, 100]
+"""Amount of tasks to store and restore per measurement."""
+REPETITIONS = 10
+FUNCTION_NAMES = ["read_temperature", "read_humidity",
+                  "read_pressure", "read_light", "upload_samples"]
+
+
+def allocated_bytes():
+    try:
+        return gc.mem_alloc()
+    except AttributeError:
+        # CPython, only counts memory that is still allocated at the end
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return tracemalloc.get_traced_memory()[0]
+
+
+def measure(function):
+    # returns the time in us and the allocated bytes per call
+    gc.collect()
+    gc.disable()
+    start_bytes = allocated_bytes()
+    start = utime.ticks_us()
+    for _ in range(REPETITIONS):
+        function()
+    duration_us = utime.ticks_diff(utime.ticks_us(), start)
+    allocated = allocated_bytes() - start_bytes
+    gc.enable()
+    return duration_us // REPETITIONS, allocated // REPETITIONS
+
+
+def restore():
+    sl._decode_tasks(machine.RTC().memory())
+
+
+def run():
+    saved_tasks = sl._sorted_tasks()
+    saved_rtc_memory_bytes = sl.rtc_memory_bytes
+    print("tasks, store us, store bytes allocated, restore us, restore bytes allocated")
+    for count in TASK_COUNTS:
+        sl._clear_tasks()
+        for i in range(count):
+            sl.schedule_epoch_sec("sensors", FUNCTION_NAMES[i % len(FUNCTION_NAMES)],
+                                  700000000 + i * 15, 60)
+        sl.rtc_memory_bytes = bytearray(100)
+        # store once so that the reused buffer has its final size
+        sl._store()
+        store_us, store_bytes = measure(sl._store)
+        restore_us, restore_bytes = measure(restore)
+        print("{}, {}, {}, {}, {}".format(count, store_us,
+                                          store_bytes, restore_us, restore_bytes))
+
+    sl._clear_tasks()
+    for task in saved_tasks:
+        sl._push_task(task)
+    sl.rtc_memory_bytes = saved_rtc_memory_bytes
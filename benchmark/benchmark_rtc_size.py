@@ -0,0 +1,61 @@
+# Size report of the sleepscheduler RTC memory format
+#
+# Compares the size of the legacy RTC memory format with the current one and
+# shows how many tasks fit into the RTC memory. To run it, put sleepscheduler.py,
+# sleepscheduler_encode.py and this file onto the ESP32 and execute:
+#
+# import benchmark_rtc_size
+# benchmark_rtc_size.run()
+
+import sleepscheduler as sl
+import sleepscheduler_encode
+
+
+MODULE_NAME = "sensors_every_minute"
+FUNCTION_NAMES = ["read_temperature", "read_humidity",
+                  "read_pressure", "read_light", "upload_samples"]
+
+
+def legacy_size(tasks):
+    # 4 bytes task count, per task two NUL terminated names and two 4 byte integers
+    size = 4
+    for task in tasks:
+        size = size + len(task.module_name.encode()) + 1 + \
+            len(task.function_name.encode()) + 1 + 8
+    return size + len(sl.rtc_memory_bytes)
+
+
+def schedule(count):
+    sl._clear_tasks()
+    for i in range(count):
+        function_name = FUNCTION_NAMES[i % len(FUNCTION_NAMES)]
+        sl.schedule_epoch_sec(MODULE_NAME, function_name,
+                              700000000 + i * 15, 60 * (1 + i % 10))
+
+
+def max_tasks(size_function):
+    count = 0
+    while True:
+        schedule(count + 1)
+        if size_function() > sl.RTC_MEMORY_SIZE:
+            return count
+        count = count + 1
+
+
+def run():
+    saved_tasks = sl._sorted_tasks()
+    print("tasks, legacy bytes, current bytes")
+    for count in [1, 10, 50]:
+        schedule(count)
+        print("{}, {}, {}".format(count, legacy_size(
+            sl._sorted_tasks()), len(sleepscheduler_encode.encode_tasks())))
+
+    legacy_max = max_tasks(lambda: legacy_size(sl._sorted_tasks()))
+    current_max = max_tasks(lambda: len(sleepscheduler_encode.encode_tasks()))
+    print("max tasks in {} bytes of RTC memory with {} bytes of rtc_memory_bytes: legacy {}, current {} ({} more)".format(
+        sl.RTC_MEMORY_SIZE, len(sl.rtc_memory_bytes), legacy_max, current_max, current_max - legacy_max))
+    sl.print_rtc_memory_usage()
+
+    sl._clear_tasks()
+    for task in saved_tasks:
+        sl._push_task(task)
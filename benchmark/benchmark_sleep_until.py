@@ -0,0 +1,64 @@
+# Benchmark of waiting for the second a task is due
+#
+# Compares polling utime.time() every ms, as done before, with sleeping once
+# until the second starts. Shows how late the wait ended and how many loop
+# iterations were needed. To run it, put sleepscheduler.py and this file onto
+# the ESP32 and execute:
+#
+# import benchmark_sleep_until
+# benchmark_sleep_until.run()
+
+import sleepscheduler as sl
+import utime
+
+
+ROUNDS = 20
+"""Amount of waits per variant."""
+
+
+def poll_until_sec(wake_sec):
+    # copy of the loop used before
+    iterations = 0
+    while wake_sec - utime.time() > 0:
+        utime.sleep_ms(1)
+        iterations = iterations + 1
+    return iterations
+
+
+def lateness_ms(wake_sec):
+    if sl._HAS_TIME_NS:
+        return utime.time_ns() // 1000000 - wake_sec * 1000
+    return None
+
+
+def measure(wait_until_sec):
+    latenesses = []
+    iterations = []
+    for i in range(ROUNDS):
+        # start at different ms within the second
+        utime.sleep_ms(i * 37 % 1000)
+        wake_sec = utime.time() + 1
+        iterations.append(wait_until_sec(wake_sec))
+        latenesses.append(lateness_ms(wake_sec))
+    return latenesses, iterations
+
+
+def print_result(name, latenesses, iterations):
+    iterations.sort()
+    result = "{}: iterations min {}, median {}, max {}".format(
+        name, iterations[0], iterations[len(iterations) // 2], iterations[-1])
+    if latenesses[0] is None:
+        result = result + ", lateness n/a without utime.time_ns()"
+    else:
+        latenesses.sort()
+        result = result + ", lateness ms min {}, median {}, max {}".format(
+            latenesses[0], latenesses[len(latenesses) // 2], latenesses[-1])
+    print(result)
+
+
+def run():
+    latenesses, iterations = measure(poll_until_sec)
+    print_result("poll", latenesses, iterations)
+    latenesses, iterations = measure(
+        lambda wake_sec: sl._sleep_until_ms(wake_sec * 1000))
+    print_result("sleep", latenesses, iterations)
@@ -0,0 +1,430 @@
+# Benchmark suite of the sleepscheduler hot paths
+#
+# Times scheduling and removing tasks, encoding and decoding the RTC memory,
+# storing the tasks before deep sleep, waking up until the first task executed,
+# executing a task, one iteration of the scheduler loop and planning the next
+# wake for 1 to 10000 tasks and the boot that compiles and imports
+# sleepscheduler from source with the tasks that fit into the RTC memory. Runs
+# on the host with CPython and the fake modules of the simulator or with the
+# MicroPython unix port:
+#
+# python3 benchmark/benchmark_suite.py
+# micropython benchmark/benchmark_suite.py
+#
+# For the MicroPython run on a device, copy sleepscheduler.py and all the
+# sleepscheduler_*.py modules to it as well, they are imported on demand.
+#
+# Options:
+# --counts 1,10,100      task counts to measure
+# --output results.json  store the results as JSON
+# --compare baseline.json compare with stored results, exits with 1 when a
+#                        result is slower than the baseline by more than
+# --tolerance 0.5        this fraction
+# --import-baseline old.py compare the import of the modules compiled from
+#                        source on every wake with this sleepscheduler.py, e.g.
+#                        git show <commit>:sleepscheduler/sleepscheduler.py > old.py
+#
+# benchmark_suite_baseline.json contains the results of CPython on a
+# development machine, create a new one with --output on the machine to compare.
+
+import sys
+import json
+
+
+def _parent_dir(path):
+    index = path.rfind("/")
+    if index < 0:
+        return "."
+    if index == 0:
+        return "/"
+    return path[:index]
+
+
+BENCHMARK_DIR = _parent_dir(__file__)
+REPOSITORY_DIR = ".." if BENCHMARK_DIR == "." else _parent_dir(BENCHMARK_DIR)
+TASK_COUNTS = [1, 10, 100, 1000, 10000]
+"""Amount of scheduled tasks per measurement."""
+ROUNDS = 5
+"""Each measurement is repeated and the fastest round is reported."""
+PASSES = 3
+"""All measurements are repeated in passes to not report a result of a short slow period of the host."""
+CALLS = 100
+"""Calls per round for measurements of a single operation, fewer for operations on all tasks."""
+START_SEC = 700000000
+GROUPS = 10
+"""Tasks are spread over this amount of modules and function names each."""
+
+
+def _use_simulator_modules():
+    # the fake modules of the simulator replace machine, on CPython also utime
+    simulator_dir = REPOSITORY_DIR + "/simulator"
+    if sys.implementation.name == "micropython":
+        # built-in modules cannot be shadowed by files, replace it in sys.modules instead
+        namespace = {"__name__": "machine"}
+        with open(simulator_dir + "/machine.py") as f:
+            exec(f.read(), namespace)
+        sys.modules["machine"] = type("machine", (), namespace)
+    else:
+        sys.path.insert(0, simulator_dir)
+        import utime
+        utime._set_time(START_SEC)
+
+
+try:
+    import machine
+    machine.RTC
+except (ImportError, AttributeError):
+    _use_simulator_modules()
+
+sys.path.insert(0, REPOSITORY_DIR + "/sleepscheduler")
+import sleepscheduler as sl  # noqa: E402
+import sleepscheduler_encode  # noqa: E402
+heapq = sl.heapq
+
+try:
+    from time import perf_counter
+
+    def _now_us():
+        # the clock of the fake utime is virtual
+        return perf_counter() * 1000000
+
+    def _elapsed_us(start):
+        return _now_us() - start
+except ImportError:
+    import utime
+
+    def _now_us():
+        return utime.ticks_us()
+
+    def _elapsed_us(start):
+        return utime.ticks_diff(utime.ticks_us(), start)
+
+
+def _noop():
+    pass
+
+
+def _calibration_us():
+    # time of a fixed workload to compare results of machines with a different speed
+    def workload():
+        heap = []
+        for i in range(1000):
+            heapq.heappush(heap, (i * 7919 % 1000, i))
+        while heap:
+            heapq.heappop(heap)
+    return _measure(lambda: None, workload, 10)
+
+
+def _schedule_tasks(count, function=None, tolerance_sec=0):
+    # tasks due in the future, or in the past when the function is given to execute them
+    sl._clear_tasks()
+    now_sec = sl._epoch_ms() // 1000
+    for i in range(count):
+        if function:
+            sl.schedule_epoch_sec("benchmark_suite", function, now_sec - count + i, 60)
+        else:
+            sl.schedule_epoch_sec("module{}".format(i % GROUPS), "function{}".format(i // GROUPS % GROUPS),
+                                  now_sec + 60 + i % 3600, 60, tolerance_sec)
+
+
+def _measure(setup, function, calls, rounds=ROUNDS):
+    # returns the fastest time in us per call over all rounds
+    best_us = None
+    for _ in range(rounds):
+        setup()
+        start = _now_us()
+        for _ in range(calls):
+            function()
+        elapsed_us = _elapsed_us(start)
+        if best_us is None or elapsed_us < best_us:
+            best_us = elapsed_us
+    return best_us / calls
+
+
+def _measure_schedule(count):
+    now_sec = sl._epoch_ms() // 1000
+    best_us = None
+    for _ in range(ROUNDS):
+        sl._clear_tasks()
+        start = _now_us()
+        for i in range(count):
+            sl.schedule_epoch_sec("module", "function", now_sec + i * 7 % count, 60)
+        elapsed_us = _elapsed_us(start)
+        if best_us is None or elapsed_us < best_us:
+            best_us = elapsed_us
+    return best_us / count
+
+
+def _measure_remove(remove):
+    def measure(count):
+        # removing changes the tasks so only one call per round, but more rounds
+        return _measure(lambda: _schedule_tasks(count), remove, 1, ROUNDS * 4)
+    return measure
+
+
+def _calls_on_all_tasks(count):
+    return max(1, CALLS * 10 // count)
+
+
+def _measure_encode(count):
+    return _measure(lambda: _schedule_tasks(count), sleepscheduler_encode.encode_tasks, _calls_on_all_tasks(count))
+
+
+def _measure_decode(count):
+    _schedule_tasks(count)
+    encoded = bytes(sleepscheduler_encode.encode_tasks())
+    return _measure(lambda: None, lambda: sl._decode_tasks(encoded), _calls_on_all_tasks(count))
+
+
+def _enter_sleep():
+    # the path of a wake that executed the first task and stores the tasks before deep sleep
+    task = sl._pop_task()
+    sl._advance_task(task)
+    sl._push_task(task)
+    sleepscheduler_encode.encode_tasks()
+
+
+def _measure_sleep_entry(count):
+    def setup():
+        # the tasks are restored from the RTC memory like after a deep sleep
+        _schedule_tasks(count)
+        sl._decode_tasks(bytes(sleepscheduler_encode.encode_tasks()))
+    return _measure(setup, _enter_sleep, _calls_on_all_tasks(count))
+
+
+def _measure_wake(count):
+    # the path of the import of sleepscheduler after deep sleep until the first task executed
+    _schedule_tasks(count - 1)
+    sl.schedule_epoch_sec("benchmark_suite", _noop, sl._epoch_ms() // 1000)
+    encoded = bytes(sleepscheduler_encode.encode_tasks())
+
+    def wake():
+        sl._decode_tasks(encoded, sl._epoch_ms() // 1000)
+        sl._execute_task(sl._first_task())
+    return _measure(lambda: None, wake, _calls_on_all_tasks(count))
+
+
+def _measure_boot(count):
+    # the import of sleepscheduler after deep sleep when it is compiled from source on every wake
+    # and restores the tasks, the modules of optional features are imported when they are used
+    _schedule_tasks(count)
+    encoded = sleepscheduler_encode.encode_tasks()
+    if len(encoded) > sl.RTC_MEMORY_SIZE:
+        return None
+    with open(REPOSITORY_DIR + "/sleepscheduler/sleepscheduler.py") as f:
+        source = f.read()
+    rtc = sl.machine.RTC()
+    saved_rtc_memory = rtc.memory()
+    rtc.memory(encoded)
+
+    def boot():
+        exec(compile(source, "sleepscheduler.py", "exec"), {"__name__": "sleepscheduler"})
+    try:
+        return _measure(lambda: None, boot, 1)
+    finally:
+        rtc.memory(saved_rtc_memory)
+
+
+WAKE_MODULES = ["sleepscheduler.py", "sleepscheduler_encode.py"]
+"""Modules compiled from source on every wake, the others only when their feature is used."""
+
+
+def _measure_import(paths):
+    # compiles and imports the modules from source with empty RTC memory like on a wake after
+    # tasks were scheduled, returns the time in us and the size of the sources in bytes
+    sources = []
+    for path in paths:
+        with open(path) as f:
+            sources.append(f.read())
+    rtc = sl.machine.RTC()
+    saved_rtc_memory = rtc.memory()
+    rtc.memory(b"")
+
+    def load():
+        for source in sources:
+            exec(compile(source, "sleepscheduler.py", "exec"), {"__name__": "sleepscheduler"})
+    try:
+        return _measure(lambda: None, load, 1), sum([len(source) for source in sources])
+    finally:
+        rtc.memory(saved_rtc_memory)
+
+
+def compare_import(baseline_path):
+    """Print the import of the modules that are compiled on every wake relative to the given
+    version of sleepscheduler.py.
+
+    Args:
+        baseline_path (str): Path of the sleepscheduler.py to compare to
+    Returns:
+        float: Ratio of the import time to the one of the baseline
+    """
+    value, size = _measure_import(
+        [REPOSITORY_DIR + "/sleepscheduler/" + module for module in WAKE_MODULES])
+    baseline_value, baseline_size = _measure_import([baseline_path])
+    ratio = value / baseline_value
+    print("import {}: {:.2f} us, {} bytes, baseline {:.2f} us, {} bytes, {:.2f}x".format(
+        ", ".join(WAKE_MODULES), value, size, baseline_value, baseline_size, ratio))
+    return ratio
+
+
+def _measure_execute(count):
+    _schedule_tasks(count, _noop)
+    task = sl._first_task()
+    return _measure(lambda: None, lambda: sl._execute_task(task), CALLS)
+
+
+def _run_iteration():
+    # the path of _run_tasks() when the first task is due
+    first_task = sl._first_task()
+    if sl._task_due_ms(first_task) <= sl._epoch_ms():
+        sl._dispatch_first_task(first_task)
+
+
+def _measure_run_iteration(count):
+    return _measure(lambda: _schedule_tasks(count, _noop), _run_iteration, min(count, CALLS))
+
+
+def _plan_wake():
+    # the path of _run_tasks() when the first task is not due yet
+    wake_ms = sl._coalesced_wake_ms(sl._first_task(), sl._tasks)
+    sl._plan_wake(wake_ms // 1000)
+
+
+def _measure_plan_wake(count):
+    return _measure(lambda: _schedule_tasks(count, tolerance_sec=30), _plan_wake, CALLS)
+
+
+BENCHMARKS = [
+    ("schedule_epoch_sec", _measure_schedule),
+    ("remove_all", _measure_remove(
+        lambda: sl.remove_all("module1", "function1"))),
+    ("remove_all_by_function_name", _measure_remove(
+        lambda: sl.remove_all_by_function_name("function1"))),
+    ("remove_all_by_module_name", _measure_remove(
+        lambda: sl.remove_all_by_module_name("module1"))),
+    ("encode_tasks", _measure_encode),
+    ("decode_tasks", _measure_decode),
+    ("sleep_entry", _measure_sleep_entry),
+    ("wake", _measure_wake),
+    ("boot", _measure_boot),
+    ("execute_task", _measure_execute),
+    ("run_iteration", _measure_run_iteration),
+    ("plan_wake", _measure_plan_wake),
+]
+
+
+def run(counts=TASK_COUNTS):
+    """Run all benchmarks.
+
+    Args:
+        counts (list): Amounts of scheduled tasks to measure
+    Returns:
+        dict: The microseconds per operation by benchmark name and task count,
+            "calibration" contains the time of a fixed workload
+    """
+    saved_tasks = sl._sorted_tasks()
+    saved_rtc_memory_bytes = sl.rtc_memory_bytes
+    results = {"calibration": {}}
+    for name, _ in BENCHMARKS:
+        results[name] = {}
+    for _ in range(PASSES):
+        _keep_fastest(results["calibration"], "1", _calibration_us())
+        for name, measure in BENCHMARKS:
+            for count in counts:
+                try:
+                    value = measure(count)
+                    if value is not None:
+                        _keep_fastest(results[name], str(count), value)
+                except MemoryError:
+                    print("{}: {} tasks out of memory".format(name, count))
+                    break
+    sl._clear_tasks()
+    for task in saved_tasks:
+        sl._push_task(task)
+    sl.rtc_memory_bytes = saved_rtc_memory_bytes
+    return results
+
+
+def _keep_fastest(results, key, value):
+    if key not in results or value < results[key]:
+        results[key] = value
+
+
+def print_results(results, counts):
+    print("us per operation, tasks: {}".format(
+        ", ".join([str(count) for count in counts])))
+    for name, _ in BENCHMARKS:
+        values = [results[name].get(str(count)) for count in counts]
+        print("{}: {}".format(name, ", ".join(
+            ["-" if value is None else "{:.2f}".format(value) for value in values])))
+
+
+def compare(results, baseline, tolerance, scale=1):
+    """Print the results relative to the baseline.
+
+    Args:
+        results (dict): Results of run()
+        baseline (dict): Results of run() to compare to
+        tolerance (float): Fraction a result may be slower than the baseline
+        scale (float): Factor to multiply the baseline with
+    Returns:
+        int: Amount of results slower than the baseline by more than the tolerance
+    """
+    regressions = 0
+    for name, _ in BENCHMARKS:
+        for count, value in results.get(name, {}).items():
+            baseline_value = baseline.get(name, {}).get(count)
+            if not baseline_value:
+                continue
+            baseline_value = baseline_value * scale
+            ratio = value / baseline_value
+            regression = ratio > 1 + tolerance
+            if regression:
+                regressions = regressions + 1
+            print("{} {} tasks: {:.2f} us, baseline {:.2f} us, {:.2f}x{}".format(
+                name, count, value, baseline_value, ratio, " REGRESSION" if regression else ""))
+    return regressions
+
+
+def _option(args, name, default=None):
+    if name in args:
+        return args[args.index(name) + 1]
+    return default
+
+
+def main(args):
+    counts = [int(count) for count in _option(
+        args, "--counts", ",".join([str(count) for count in TASK_COUNTS])).split(",")]
+    output_path = _option(args, "--output")
+    baseline_path = _option(args, "--compare")
+    tolerance = float(_option(args, "--tolerance", "0.5"))
+    import_baseline_path = _option(args, "--import-baseline")
+
+    results = run(counts)
+    print_results(results, counts)
+    if import_baseline_path:
+        compare_import(import_baseline_path)
+    if output_path:
+        with open(output_path, "w") as f:
+            json.dump({"implementation": sys.implementation.name,
+                       "results": results}, f)
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        # scale the baseline to the speed of this machine
+        calibration_us = results["calibration"]["1"]
+        baseline_calibration_us = baseline["results"]["calibration"]["1"]
+        print("calibration {:.2f} us, baseline {:.2f} us".format(
+            calibration_us, baseline_calibration_us))
+        regressions = compare(results, baseline["results"],
+                              tolerance, calibration_us / baseline_calibration_us)
+        if baseline["implementation"] != sys.implementation.name:
+            print("baseline of '{}' compared with '{}'".format(
+                baseline["implementation"], sys.implementation.name))
+        if regressions:
+            print("{} regressions".format(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
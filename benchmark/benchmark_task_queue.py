@@ -0,0 +1,102 @@
+# Benchmark of the sleepscheduler task queue
+#
+# Compares the heap based task queue of sleepscheduler with the sorted list
+# that was used before. To run it, put sleepscheduler.py and this file onto
+# the ESP32 and execute:
+#
+# import benchmark_task_queue
+# benchmark_task_queue.run()
+
+import sleepscheduler as sl
+import utime
+import gc
+
+
+TASK_COUNTS = [10, 100, 1000, 10000]
+"""Amount of tasks to schedule per measurement."""
+
+
+def list_schedule_epoch_sec(tasks, module_name, function_name, seconds_since_epoch, repeat_after_sec=0):
+    # copy of the sorted list insert used before the heap
+    new_task = sl.Task(module_name, function_name,
+                       seconds_since_epoch, repeat_after_sec)
+    inserted = False
+    for i in range(len(tasks)):
+        task = tasks[i]
+        if (task.seconds_since_epoch > seconds_since_epoch):
+            tasks.insert(i, new_task)
+            inserted = True
+            break
+    if not inserted:
+        tasks.append(new_task)
+
+
+def list_run(tasks):
+    # pops all tasks like _run_tasks() did before the heap, repeats once
+    while tasks:
+        task = tasks.pop(0)
+        if task.repeat_after_sec != 0:
+            list_schedule_epoch_sec(tasks, task.module_name, task.function_name,
+                                    task.seconds_since_epoch + task.repeat_after_sec, 0)
+
+
+def heap_run():
+    while sl._first_task():
+        task = sl._pop_task()
+        if task.repeat_after_sec != 0:
+            sl.schedule_epoch_sec(task.module_name, task.function_name,
+                                  task.seconds_since_epoch + task.repeat_after_sec, 0)
+
+
+def times(count):
+    # pseudo random but reproducible times with many duplicates
+    value = 12345
+    result = []
+    for _ in range(count):
+        value = (value * 1103515245 + 12345) & 0x7FFFFFFF
+        result.append(value % (count * 4))
+    return result
+
+
+def measure_list(seconds):
+    tasks = []
+    start = utime.ticks_us()
+    for second in seconds:
+        list_schedule_epoch_sec(tasks, "module", "function", second, 60)
+    insert_us = utime.ticks_diff(utime.ticks_us(), start)
+    start = utime.ticks_us()
+    list_run(tasks)
+    run_us = utime.ticks_diff(utime.ticks_us(), start)
+    return insert_us, run_us
+
+
+def measure_heap(seconds):
+    sl._clear_tasks()
+    start = utime.ticks_us()
+    for second in seconds:
+        sl.schedule_epoch_sec("module", "function", second, 60)
+    insert_us = utime.ticks_diff(utime.ticks_us(), start)
+    start = utime.ticks_us()
+    heap_run()
+    run_us = utime.ticks_diff(utime.ticks_us(), start)
+    return insert_us, run_us
+
+
+def run():
+    saved_tasks = sl._sorted_tasks()
+    print("tasks, list insert us, list run us, heap insert us, heap run us")
+    for count in TASK_COUNTS:
+        seconds = times(count)
+        try:
+            gc.collect()
+            list_insert_us, list_run_us = measure_list(seconds)
+            gc.collect()
+            heap_insert_us, heap_run_us = measure_heap(seconds)
+        except MemoryError:
+            print("{}, out of memory".format(count))
+            break
+        print("{}, {}, {}, {}, {}".format(count, list_insert_us,
+                                          list_run_us, heap_insert_us, heap_run_us))
+    sl._clear_tasks()
+    for task in saved_tasks:
+        sl._push_task(task)
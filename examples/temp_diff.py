@@ -9,8 +9,6 @@
 # sl.run_forever()
 
 import sleepscheduler as sl
-import network
-import utime
 from machine import Pin
 import dht
 import urequests
@@ -26,27 +24,21 @@ APP_ID = "yourOpenWeatherMapToken"
 CITY = "Affoltern am Albis"
 URL = "https://api.openweathermap.org/data/2.5/weather?q={}&units=metric&appid={}"
 on_cold_boot = False
+# sleepscheduler connects to the WLAN for check_temp()
+sl.wlan_ssid = WIFI_SSID
+sl.wlan_password = WIFI_PASSWORD
 
 
 def init_on_cold_boot():
-    sl.schedule_immediately(__name__, check_temp, sl.SECONDS_PER_MINUTE * 10)
+    task = sl.schedule_immediately(__name__, check_temp, sl.SECONDS_PER_MINUTE * 10)
+    # retry after 30 s, 60 s and 120 s when e.g. the WLAN is not available
+    sl.set_retry(task, 3, 30)
+    sl.set_needs_network(task)
     global on_cold_boot
     on_cold_boot = True
 
 
 def check_temp():
-    # configure and connect WLAN
-    wlan = network.WLAN(network.STA_IF)
-    if not wlan.isconnected():
-        print("connecting to network")
-        wlan.active(True)
-        wlan.connect(WIFI_SSID, WIFI_PASSWORD)
-        while not wlan.isconnected():
-            print(".", end="")
-            utime.sleep(1)
-    print()
-    print('network config:', wlan.ifconfig())
-
     inside_temp = read_dht_temp()
     outside_temp = get_outside_temp()
     print("inside: {}ºC, outside: {}ºC".format(inside_temp, outside_temp))
@@ -76,7 +68,6 @@ def read_dht_temp():
 
 
 def get_outside_temp():
-    # connect Wifi
     # import upip
     # upip.install('urequests')
     response = urequests.get(URL.format(CITY, APP_ID))
@@ -2,3 +2,16 @@
 export PORT=/dev/cu.SLAB_USBtoUART
 ampy --port $PORT put main.py
 ampy --port $PORT put sleepscheduler/sleepscheduler.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_async.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_budget.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_cron.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_debug.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_encode.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_energy.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_legacy.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_overflow.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_plan.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_ring.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_slots.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_stats.py
+ampy --port $PORT put sleepscheduler/sleepscheduler_wlan.py
@@ -0,0 +1,162 @@
+# Fake machine module of the sleepscheduler host simulator
+#
+# Provides the parts of the MicroPython machine module that sleepscheduler and
+# the examples use. machine.deepsleep() advances the virtual clock and raises
+# DeepSleepReset, the simulator then starts the next boot with the content of
+# the RTC memory kept. The same is done when the timeout of WDT passes.
+
+import utime
+
+PWRON_RESET = 1
+HARD_RESET = 2
+WDT_RESET = 3
+DEEPSLEEP_RESET = 4
+SOFT_RESET = 5
+
+RTC_MEMORY_SIZE = 2048
+
+_reset_cause = PWRON_RESET
+_rtc_memory = b""
+_deep_sleeps = 0
+_deep_sleep_ns = 0
+_light_sleeps = 0
+_light_sleep_ns = 0
+_watchdog_timeout_ms = 0
+_watchdog_resets = 0
+
+
+class DeepSleepReset(BaseException):
+    """Raised by deepsleep() to end the current boot.
+
+    Args:
+        ms (int): Duration of the deep sleep, None to deep sleep infinitely
+    """
+
+    def __init__(self, ms):
+        BaseException.__init__(self, ms)
+        self.ms = ms
+
+
+def _power_on():
+    global _reset_cause, _rtc_memory, _deep_sleeps, _deep_sleep_ns, _light_sleeps, _light_sleep_ns, _watchdog_resets
+    _stop_watchdog()
+    _watchdog_resets = 0
+    _reset_cause = PWRON_RESET
+    _rtc_memory = b""
+    _deep_sleeps = 0
+    _deep_sleep_ns = 0
+    _light_sleeps = 0
+    _light_sleep_ns = 0
+
+
+def _stop_watchdog():
+    utime._watchdog_ns = None
+    utime._watchdog_expired = False
+
+
+def _watchdog_reset():
+    # called by the simulator for utime.WatchdogTimeout, the RTC memory is kept
+    global _reset_cause, _watchdog_resets
+    _stop_watchdog()
+    _watchdog_resets = _watchdog_resets + 1
+    _reset_cause = WDT_RESET
+
+
+def _sleep_ns(ms):
+    # advances the clock, also up to the end of the simulation, and returns the slept time
+    start_ns = utime.time_ns()
+    try:
+        utime.sleep_ms(ms)
+    except utime.SimulationEnd as e:
+        e.slept_ns = utime.time_ns() - start_ns
+        raise
+    return utime.time_ns() - start_ns
+
+
+def reset_cause():
+    return _reset_cause
+
+
+def wake_reason():
+    return _reset_cause
+
+
+def deepsleep(ms=None):
+    global _reset_cause, _deep_sleeps, _deep_sleep_ns
+    utime._check_watchdog()
+    # the watchdog does not run during deep sleep and not after the reset
+    _stop_watchdog()
+    _deep_sleeps = _deep_sleeps + 1
+    if ms is None or ms <= 0:
+        # no wake up source is simulated
+        raise DeepSleepReset(None)
+    try:
+        _deep_sleep_ns = _deep_sleep_ns + _sleep_ns(ms)
+    except utime.SimulationEnd as e:
+        _deep_sleep_ns = _deep_sleep_ns + e.slept_ns
+        raise
+    _reset_cause = DEEPSLEEP_RESET
+    raise DeepSleepReset(ms)
+
+
+def lightsleep(ms=None):
+    global _light_sleeps, _light_sleep_ns
+    _light_sleeps = _light_sleeps + 1
+    try:
+        _light_sleep_ns = _light_sleep_ns + _sleep_ns(ms)
+    except utime.SimulationEnd as e:
+        _light_sleep_ns = _light_sleep_ns + e.slept_ns
+        raise
+
+
+class WDT:
+    """Resets the CPU when it is not fed within the timeout. Like on the ESP32 it cannot be stopped,
+    creating it again changes the timeout.
+
+    Args:
+        id (int): Only 0 is available
+        timeout (int): Milliseconds until the reset
+    """
+
+    def __init__(self, id=0, timeout=5000):
+        global _watchdog_timeout_ms
+        _watchdog_timeout_ms = timeout
+        self.feed()
+
+    def feed(self):
+        utime._check_watchdog()
+        utime._watchdog_ns = utime.time_ns() + _watchdog_timeout_ms * 1000000
+
+
+class RTC:
+    def memory(self, data=None):
+        global _rtc_memory
+        # nothing is written anymore after the watchdog reset the CPU
+        utime._check_watchdog()
+        if data is None:
+            return _rtc_memory
+        if len(data) > RTC_MEMORY_SIZE:
+            raise ValueError("buffer too long")
+        _rtc_memory = bytes(data)
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self._value = value or 0
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = 1 if value else 0
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
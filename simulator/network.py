@@ -0,0 +1,92 @@
+# Fake network module of the sleepscheduler host simulator
+#
+# Provides network.WLAN in station mode with one access point. Connecting
+# takes virtual time, less when the BSSID of the access point is given. The
+# radio is off after every boot like after a reset of the ESP32.
+
+import utime
+
+STA_IF = 0
+AP_IF = 1
+
+SSID = b"simulator"
+BSSID = b"\x02\x00\x00\x00\x00\x01"
+CHANNEL = 6
+CONNECT_MS = 3000
+"""Time to connect by scanning all channels for the access point."""
+CONNECT_BSSID_MS = 1000
+"""Time to connect to a given access point."""
+SCAN_MS = 2000
+IFCONFIG = ("192.168.4.2", "255.255.255.0", "192.168.4.1", "192.168.4.1")
+
+_active = False
+_connected_ns = None
+"""Virtual time when the pending connection is established, None when not connecting."""
+_connects = 0
+_connected_total_ns = 0
+_connected_since_ns = None
+
+
+def _power_on():
+    global _connects, _connected_total_ns
+    _reset()
+    _connects = 0
+    _connected_total_ns = 0
+
+
+def _reset():
+    # the radio is off after a deep sleep, the time connected until then is counted
+    global _active
+    _disconnect()
+    _active = False
+
+
+def _disconnect():
+    global _connected_ns, _connected_since_ns, _connected_total_ns
+    if _connected_since_ns is not None:
+        _connected_total_ns = _connected_total_ns + utime.time_ns() - _connected_since_ns
+    _connected_ns = None
+    _connected_since_ns = None
+
+
+class WLAN:
+    def __init__(self, interface_id=STA_IF):
+        self.interface_id = interface_id
+        self._ifconfig = IFCONFIG
+
+    def active(self, is_active=None):
+        global _active
+        if is_active is None:
+            return _active
+        if not is_active:
+            _disconnect()
+        _active = bool(is_active)
+
+    def scan(self):
+        utime.sleep_ms(SCAN_MS)
+        return [(SSID, BSSID, CHANNEL, -60, 3, False)]
+
+    def connect(self, ssid=None, key=None, bssid=None):
+        global _connected_ns, _connects
+        if not _active:
+            raise OSError("WLAN not active")
+        _disconnect()
+        _connects = _connects + 1
+        delay_ms = CONNECT_BSSID_MS if bssid == BSSID else CONNECT_MS
+        _connected_ns = utime.time_ns() + delay_ms * 1000000
+
+    def disconnect(self):
+        _disconnect()
+
+    def isconnected(self):
+        global _connected_since_ns
+        if _connected_ns is None or utime.time_ns() < _connected_ns:
+            return False
+        if _connected_since_ns is None:
+            _connected_since_ns = _connected_ns
+        return True
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return self._ifconfig
+        self._ifconfig = tuple(config)
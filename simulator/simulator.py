@@ -0,0 +1,204 @@
+# Host simulator of sleepscheduler
+#
+# Runs a main.py with CPython on the fake machine, network, uasyncio and utime
+# modules of this directory. The clock is virtual and every deep sleep restarts
+# main.py like a reset of the ESP32: all modules are imported again and only the
+# RTC memory and the files are kept. The files are written to an empty temporary
+# directory that is the working directory during the simulation. This way days
+# of schedule are simulated in seconds.
+#
+# Execute the test (main.py of the repository runs test/test.py):
+#
+# python3 simulator/simulator.py
+#
+# Simulate a week of an example with the output suppressed:
+#
+# python3 simulator/simulator.py --days 7 --quiet my_main.py
+#
+# Modules are imported from the directory of main.py and the directories
+# sleepscheduler, test and examples before the module search path.
+
+import argparse
+import contextlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import time
+
+SIMULATOR_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(SIMULATOR_DIR)
+MODULE_DIRS = [os.path.join(REPOSITORY_DIR, name)
+               for name in ("sleepscheduler", "test", "examples")]
+
+# the fake modules need to be found before any others
+sys.path.insert(0, SIMULATOR_DIR)
+import machine  # noqa: E402
+import network  # noqa: E402
+import utime  # noqa: E402
+
+
+_code_cache = {}
+"""Compiled code by path, modules are imported again on every boot."""
+
+
+class _CachingLoader(importlib.machinery.SourceFileLoader):
+    def get_code(self, fullname):
+        code = _code_cache.get(self.path)
+        if code is None:
+            code = importlib.machinery.SourceFileLoader.get_code(self, fullname)
+            _code_cache[self.path] = code
+        return code
+
+
+class _BootFinder(importlib.abc.MetaPathFinder):
+    # imports the modules of the given directories and remembers them to unload them on reset
+
+    def __init__(self, module_dirs):
+        self.module_dirs = module_dirs
+        self.loaded_names = set()
+
+    def find_spec(self, fullname, path, target=None):
+        if path is not None:
+            return None
+        for module_dir in self.module_dirs:
+            module_path = os.path.join(module_dir, fullname + ".py")
+            if os.path.isfile(module_path):
+                self.loaded_names.add(fullname)
+                return importlib.util.spec_from_file_location(
+                    fullname, module_path, loader=_CachingLoader(fullname, module_path))
+        return None
+
+    def unload_modules(self):
+        for name in self.loaded_names:
+            sys.modules.pop(name, None)
+        self.loaded_names.clear()
+
+
+def _main_code(main_path):
+    code = _code_cache.get(main_path)
+    if code is None:
+        with open(main_path) as f:
+            code = compile(f.read(), main_path, "exec")
+        _code_cache[main_path] = code
+    return code
+
+
+def run(main_path, duration_sec=None, start_sec=0, wakeup_latency_ms=0, quiet=False):
+    """Simulate the ESP32 executing main_path from power on.
+
+    Args:
+        main_path (str): Path of the main.py to execute on every boot
+        duration_sec (int): Seconds to simulate, None to simulate until main.py returns
+            or deep sleeps infinitely
+        start_sec (int): Seconds since epoch of the clock at power on
+        wakeup_latency_ms (int): Time added to the clock when waking up from deep sleep
+        quiet (bool): Suppress the output of main.py
+    Returns:
+        dict: The simulation result with the boots, the simulated times and the output
+    """
+    main_path = os.path.abspath(main_path)
+    finder = _BootFinder([os.path.dirname(main_path)] + MODULE_DIRS)
+    sys.meta_path.insert(0, finder)
+
+    end_sec = None if duration_sec is None else start_sec + duration_sec
+    utime._set_time(start_sec, end_sec)
+    machine._power_on()
+    network._power_on()
+    output = io.StringIO()
+    boots = 0
+    host_start = time.perf_counter()
+    # the internal filesystem of the ESP32
+    filesystem = tempfile.TemporaryDirectory()
+    working_dir = os.getcwd()
+    os.chdir(filesystem.name)
+    try:
+        while True:
+            boots = boots + 1
+            network._reset()
+            finder.unload_modules()
+            main_globals = {"__name__": "__main__", "__file__": main_path}
+            try:
+                if quiet:
+                    with contextlib.redirect_stdout(output):
+                        exec(_main_code(main_path), main_globals)
+                else:
+                    exec(_main_code(main_path), main_globals)
+                break
+            except machine.DeepSleepReset as e:
+                if e.ms is None:
+                    break
+                try:
+                    utime.sleep_ms(wakeup_latency_ms)
+                except utime.SimulationEnd:
+                    break
+            except utime.WatchdogTimeout:
+                machine._watchdog_reset()
+            except utime.SimulationEnd:
+                break
+    finally:
+        network._reset()
+        finder.unload_modules()
+        sys.meta_path.remove(finder)
+        os.chdir(working_dir)
+        filesystem.cleanup()
+    host_sec = time.perf_counter() - host_start
+
+    simulated_ns = utime.time_ns() - start_sec * 1000000000
+    return {
+        "boots": boots,
+        "simulated_sec": simulated_ns / 1000000000,
+        "deep_sleeps": machine._deep_sleeps,
+        "deep_sleep_sec": machine._deep_sleep_ns / 1000000000,
+        "light_sleeps": machine._light_sleeps,
+        "light_sleep_sec": machine._light_sleep_ns / 1000000000,
+        "watchdog_resets": machine._watchdog_resets,
+        "awake_sec": (simulated_ns - machine._deep_sleep_ns - machine._light_sleep_ns) / 1000000000,
+        "wlan_connects": network._connects,
+        "wlan_connected_sec": network._connected_total_ns / 1000000000,
+        "host_sec": host_sec,
+        "output": output.getvalue(),
+    }
+
+
+def print_result(result):
+    simulated_sec = result["simulated_sec"]
+    print("simulator: simulated {:.3f} s in {:.3f} s, boots: {}, watchdog resets: {}".format(
+        simulated_sec, result["host_sec"], result["boots"], result["watchdog_resets"]))
+    for name in ("deep_sleep", "light_sleep", "awake"):
+        share = 0
+        if simulated_sec > 0:
+            share = 100 * result[name + "_sec"] / simulated_sec
+        print("simulator: {}: {:.3f} s ({:.2f}%)".format(
+            name.replace("_", " "), result[name + "_sec"], share))
+    print("simulator: wlan connects: {}, connected: {:.3f} s".format(
+        result["wlan_connects"], result["wlan_connected_sec"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate sleepscheduler on the host with a virtual clock.")
+    parser.add_argument("main", nargs="?", default=os.path.join(REPOSITORY_DIR, "main.py"),
+                        help="main.py to execute on every boot")
+    parser.add_argument("--days", type=float,
+                        help="days to simulate, by default until main.py returns")
+    parser.add_argument("--start-sec", type=int, default=0,
+                        help="seconds since 2000-01-01 at power on")
+    parser.add_argument("--wakeup-latency-ms", type=int, default=0,
+                        help="time to start up from deep sleep")
+    parser.add_argument("--quiet", action="store_true",
+                        help="suppress the output of main.py")
+    args = parser.parse_args()
+    duration_sec = None
+    if args.days is not None:
+        duration_sec = int(args.days * 86400)
+    result = run(args.main, duration_sec, args.start_sec,
+                 args.wakeup_latency_ms, args.quiet)
+    print_result(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# Fake uasyncio module of the sleepscheduler host simulator
+#
+# Runs the coroutines with the asyncio module of the host in an event loop
+# backed by the virtual clock of the fake utime module. Waiting for the next
+# timer advances the clock immediately instead of blocking, like utime.sleep().
+
+import asyncio
+import math
+import selectors
+from asyncio import *  # noqa: F401,F403
+
+import utime
+
+
+class _VirtualClockSelector(selectors.SelectSelector):
+    # the timeout of the event loop is the time until its next timer
+
+    def select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError("simulator: uasyncio waits without a timer, nothing can wake it")
+        if timeout > 0:
+            utime._advance_ns(math.ceil(timeout * 1000000000))
+        return []
+
+
+class _VirtualClockEventLoop(asyncio.SelectorEventLoop):
+
+    def __init__(self):
+        asyncio.SelectorEventLoop.__init__(self, _VirtualClockSelector())
+        self._clock_resolution = 0.000001
+
+    def time(self):
+        return utime.time_ns() / 1000000000
+
+
+def run(coroutine):
+    loop = _VirtualClockEventLoop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
@@ -0,0 +1,115 @@
+# Fake utime module of the sleepscheduler host simulator
+#
+# Provides the functions of the MicroPython utime module backed by a virtual
+# clock. Sleeping advances the clock immediately, so days of schedule can be
+# simulated in seconds. The epoch is 2000-01-01 like on the ESP32.
+
+import calendar
+import time as _host_time
+
+_EPOCH_OFFSET_SEC = 946684800
+"""Seconds from 1970-01-01 to 2000-01-01."""
+_TICKS_PERIOD = 0x40000000
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALF_PERIOD = _TICKS_PERIOD // 2
+
+_now_ns = 0
+_end_ns = None
+"""Virtual time when the simulation ends, None to run until the end of the schedule."""
+_watchdog_ns = None
+"""Virtual time when machine.WDT resets the CPU, None when it is not running."""
+_watchdog_expired = False
+
+
+class SimulationEnd(BaseException):
+    """Raised when the virtual clock reaches the end of the simulation."""
+
+
+class WatchdogTimeout(BaseException):
+    """Raised when the virtual clock reaches the timeout of machine.WDT. The CPU does not
+    continue, so every later call of the clock raises it again until the simulator resets."""
+
+
+def _set_time(seconds_since_epoch, end_seconds_since_epoch=None):
+    global _now_ns, _end_ns
+    _now_ns = seconds_since_epoch * 1000000000
+    _end_ns = None
+    if end_seconds_since_epoch is not None:
+        _end_ns = end_seconds_since_epoch * 1000000000
+
+
+def _check_watchdog():
+    if _watchdog_expired:
+        raise WatchdogTimeout("reset by the watchdog")
+
+
+def _advance_ns(ns):
+    global _now_ns, _watchdog_expired
+    _check_watchdog()
+    _now_ns = _now_ns + max(0, int(ns))
+    if _watchdog_ns is not None and _now_ns >= _watchdog_ns and (_end_ns is None or _watchdog_ns < _end_ns):
+        _now_ns = _watchdog_ns
+        _watchdog_expired = True
+        raise WatchdogTimeout("reset by the watchdog")
+    if _end_ns is not None and _now_ns >= _end_ns:
+        _now_ns = _end_ns
+        raise SimulationEnd()
+
+
+def time():
+    _check_watchdog()
+    return _now_ns // 1000000000
+
+
+def time_ns():
+    _check_watchdog()
+    return _now_ns
+
+
+def ticks_ms():
+    _check_watchdog()
+    return (_now_ns // 1000000) & _TICKS_MAX
+
+
+def ticks_us():
+    _check_watchdog()
+    return (_now_ns // 1000) & _TICKS_MAX
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    return ((ticks1 - ticks2 + _TICKS_HALF_PERIOD) & _TICKS_MAX) - _TICKS_HALF_PERIOD
+
+
+def sleep(seconds):
+    _advance_ns(seconds * 1000000000)
+
+
+def sleep_ms(ms):
+    _advance_ns(ms * 1000000)
+
+
+def sleep_us(us):
+    _advance_ns(us * 1000)
+
+
+def gmtime(seconds_since_epoch=None):
+    if seconds_since_epoch is None:
+        seconds_since_epoch = time()
+    t = _host_time.gmtime(seconds_since_epoch + _EPOCH_OFFSET_SEC)
+    return (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec, t.tm_wday, t.tm_yday)
+
+
+localtime = gmtime
+
+
+def mktime(local_time):
+    return calendar.timegm((local_time[0], local_time[1], local_time[2],
+                            local_time[3], local_time[4], local_time[5], 0, 0, 0)) - _EPOCH_OFFSET_SEC
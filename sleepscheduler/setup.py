@@ -19,5 +19,8 @@ setup(name='micropython-sleepscheduler',
       platforms=['esp32'],
       license='Apache License, Version 2.0',
       cmdclass={'sdist': sdist_upip.sdist},
-      py_modules=['sleepscheduler'],
+      py_modules=['sleepscheduler', 'sleepscheduler_async', 'sleepscheduler_budget', 'sleepscheduler_cron', 'sleepscheduler_debug',
+                  'sleepscheduler_encode', 'sleepscheduler_energy', 'sleepscheduler_legacy', 'sleepscheduler_overflow',
+                  'sleepscheduler_plan', 'sleepscheduler_ring', 'sleepscheduler_slots', 'sleepscheduler_stats',
+                  'sleepscheduler_wlan'],
 )
@@ -1,5 +1,27 @@
 import machine
 import utime
+try:
+    import sys
+except ImportError:
+    import usys as sys
+try:
+    import heapq
+except ImportError:
+    import uheapq as heapq
+try:
+    import binascii
+except ImportError:
+    import ubinascii as binascii
+try:
+    import struct
+except ImportError:
+    import ustruct as struct
+try:
+    import os
+except ImportError:
+    import uos as os
+_HAS_TIME_NS = hasattr(utime, "time_ns")
+_HAS_LIGHT_SLEEP = hasattr(machine, "lightsleep")
 
 
 # -------------------------------------------------------------------------------------------------
@@ -9,9 +31,25 @@ SECONDS_PER_MINUTE = 60
 SECONDS_PER_HOUR = 3600
 SECONDS_PER_DAY = 86400
 
+CATCH_UP_RUN_ALL = 0
+"""A repeating task executes once for every missed execution."""
+CATCH_UP_RUN_ONCE_THEN_ALIGN = 1
+"""A repeating task executes once for all missed executions and continues with the next one in the future."""
+CATCH_UP_SKIP = 2
+"""A repeating task does not execute missed executions and continues with the next one in the future."""
+
+LOG_LEVEL_NONE = 0
+LOG_LEVEL_ERROR = 1
+"""Only errors are printed."""
+LOG_LEVEL_INFO = 2
+"""Errors and what the scheduler does, e.g. sleeping, are printed."""
+LOG_LEVEL_DEBUG = 3
+"""Additionally, the restored tasks are printed on every wake."""
+
 DEEP_SLEEP_WAKEUP_DELAY_SEC = 2
 """Time in seconds to wake up from deep sleep before the next task is due to account for
-the time to start up from deep sleep."""
+the time to start up from deep sleep. Deep sleep is only done when the next task is due later than that.
+The time to wake up early is measured on each wake and the measured value is used instead."""
 
 initial_deep_sleep_delay_sec = 20
 """Prevents deep sleep within the given amount of seconds after the CPU started from
@@ -19,15 +57,181 @@ hard reset. This gives the user time to press ctrl+t followed by ctrl+c to stop
 upload new files."""
 allow_deep_sleep = True
 """Controls if deep sleep is done or not."""
+allow_light_sleep = False
+"""Controls if machine.lightsleep() is used instead of utime.sleep_ms() while waiting for the next task
+when the port provides it. The REPL and USB do not respond during light sleep, so only enable it
+when the device is not stopped with ctrl+c, e.g. when allow_deep_sleep is False in the field."""
+log_level = LOG_LEVEL_INFO
+"""Controls the output of sleepscheduler, one of the LOG_LEVEL_* values. The print_*() functions
+print regardless. Printing takes time on every wake, so a lower level wakes faster."""
+store_task_stats = False
+"""Controls if the statistics of the executed tasks are kept in RTC memory during deep sleep.
+They are reset on every wake otherwise."""
+budget_watchdog = True
+"""Controls if a function with a budget, see set_budget(), runs with machine.WDT set to its budget
+so that a hung function resets the CPU. The tasks are stored before and continue after the reset
+like after deep sleep. The watchdog cannot be stopped, it is fed until the next deep sleep and
+then also resets a function without budget that runs longer than 10 minutes. When False or when
+the port has no machine.WDT, the overrun of a function is only detected after it returned."""
+wlan_ssid = None
+"""SSID of the WLAN that sleepscheduler connects to for the tasks that need the network, see set_needs_network()."""
+wlan_password = None
+wlan_connect_timeout_sec = 15
+network_group_sec = 0
+"""While connected, tasks that need the network and are due within the given seconds are executed
+early to use the same connection instead of connecting again in a later wake. 0 executes no task
+early, only set it for tasks that may run that much before their time."""
+reuse_wlan_ip = False
+"""Configures the IP address of the first DHCP lease statically on later connects to skip DHCP.
+Only enable it when the router keeps the address for the device."""
 rtc_memory_bytes = bytearray()
 """This library uses machine.RTC().memory() to store the list of tasks while the CPU is in deep sleep.
 When a task stores some data there too, it will be overwritten by sleepscheduler.
 A task can put data to rtc_memory_bytes instead and sleepscheduler will store and restore
 that data before and after deep sleep."""
 
+RTC_MEMORY_SIZE = 2048
+"""Size in bytes of machine.RTC().memory() that is shared by the scheduled tasks and rtc_memory_bytes."""
+overflow_file = "sleepscheduler_tasks.bin"
+"""File on the internal filesystem that keeps the tasks due last when not all tasks fit into RTC memory.
+It is only read when the tasks in RTC memory are done, None to not move tasks to a file."""
+
+current_executing_ma = 50
+"""Current in mA while tasks are executed, used by print_energy() to estimate the consumed charge."""
+current_idle_ma = 30
+"""Current in mA while the CPU is awake but does not execute tasks, e.g. while booting, waiting with
+utime.sleep() or busy waiting."""
+current_sleep_ma = 0.8
+"""Current in mA during machine.lightsleep(), see allow_light_sleep."""
+current_deep_sleep_ma = 0.01
+"""Current in mA during deep sleep."""
+
 # private variables
+_RTC_FORMAT_VERSION = 5
+_TASK_FLAG_TOLERANCE = 0x01
+_TASK_FLAG_MS = 0x02
+_TASK_FLAG_CATCH_UP = 0x04
+_TASK_FLAG_CRON = 0x08
+_TASK_FLAG_BUDGET = 0x10
+_TASK_FLAG_RETRY = 0x20
+_TASK_FLAG_NETWORK = 0x40
+_CRON_MAXIMUMS = (59, 59, 23, 6)
+"""Largest value of the cron fields second, minute, hour and weekday."""
+_SECOND_START_GUARD_MS = 5
+_RTC_SECTION_SAVED_WAKES = 1
+_RTC_SECTION_WAKEUP_LATENCY = 2
+_RTC_SECTION_TASK_STATS = 3
+_RTC_SECTION_ENERGY = 4
+_RTC_SECTION_WLAN = 5
+_RTC_SECTION_OVERFLOW = 6
+_RTC_SECTION_OVERFLOW_REMOVALS = 7
+_RTC_SECTION_BUDGET_RUN = 8
+_ENERGY_EXECUTING = 0
+_ENERGY_IDLE = 1
+_ENERGY_SLEEP = 2
+_ENERGY_DEEP_SLEEP = 3
+_TASK_STATS_SIZE = 9
+"""Values per task in _task_stats, see _record_task_run()."""
+_RTC_HEADER_SIZE = 5
+_TASK_COPIED_FIELDS = ("ms", "repeat_after_ms", "catch_up", "cron", "budget_ms", "backoff_sec", "retry_attempts",
+                       "retry_delay_sec", "retry_multiplier", "attempt", "needs_network")
+"""Fields of a Task besides the ones of its constructor that are copied by _copy_task()."""
+_WATCHDOG_FEED_MS = 60000
+"""Longest sleep without feeding the watchdog, see budget_watchdog."""
+_MAX_TASK_RUNS = 8
+"""Maximum amount of runs of task records in the RTC memory, see sleepscheduler_encode."""
+_string_table = []
+"""Strings of the RTC memory in the order of their index. They keep their index between restoring
+and storing so that the records of tasks that did not change can be copied."""
+_string_table_indexes = {}
+_restored_bytes = None
+"""RTC memory the tasks were restored from, None after the string table was rebuilt."""
+_resolved_functions = {}
+"""Cache of (module_name, function_name) to (module, function) of the executed tasks."""
+_saved_wakes = 0
+"""Amount of wakes that were saved by executing tasks within their tolerance in a shared wake."""
+_saved_wakes_since_sec = utime.time()
+_wake_sec = 0
+"""Time the scheduler last planned to wake up, tasks due until then share the wake."""
+_last_executed_sec = None
+_wakeup_latency_ms = DEEP_SLEEP_WAKEUP_DELAY_SEC * 1000
+"""Smoothed time from the requested end of deep sleep until tasks can be executed."""
+_wakeup_latency_deviation_ms = 0
+_wakeup_latency_measured = 0
+"""1 when the latency was measured, the first measurement replaces the initial values."""
+_requested_wakeup_ms = 0
+"""Time when the current deep sleep was requested to end, 0 if not measured."""
+_late_wakes = 0
+_late_wakes_total_ms = 0
+_late_wakes_max_ms = 0
+_early_wakes = 0
+_early_wakes_total_ms = 0
+_energy_ms = [0, 0, 0, 0]
+"""Time in ms spent in each of the _ENERGY_* states."""
+_energy_ticks_ms = utime.ticks_ms()
+"""ticks_ms() when the time was last added to _energy_ms."""
+_boots = 0
+_task_stats = {}
+"""Statistics of the executed tasks as (module_name, function_name) to list of runs, failures,
+total_ms, max_ms, last_ms, late_total_ms, late_max_ms, last_late_ms."""
+_second_start_sec = 0
+_second_start_ticks_ms = None
+"""ticks_ms() when utime.time() changed to _second_start_sec, used when utime.time_ns() is not available."""
+_read_index = 0
 _start_seconds_since_epoch = utime.time()
 _tasks = []
+"""Binary heap of (seconds_since_epoch, ms, sequence, task) entries. The sequence keeps tasks
+with the same time in the order they were scheduled."""
+_task_sequence = 0
+_cancelled_task_count = 0
+"""Amount of cancelled entries that are still in _tasks and are skipped when they reach the top."""
+_tasks_by_module_function = {}
+_tasks_by_function_name = {}
+_tasks_by_module_name = {}
+_budgeted_tasks = set()
+"""Scheduled tasks that have a budget."""
+_network_tasks = set()
+"""Scheduled tasks that need the network."""
+_executing_tasks = set()
+"""Repeating tasks with a budget that execute, their entries are pushed after the execution so that
+an overrun moves them by the backoff, see _dispatch_first_task()."""
+_watchdog = None
+"""machine.WDT once a function with a budget executed, see budget_watchdog."""
+_budget_run = None
+"""(module name, function name, budget in ms) of the function that executes with the watchdog
+set to its budget, kept in RTC memory to detect when the watchdog reset it."""
+_watchdog_reset = False
+"""If the watchdog reset a function with a budget, the tasks were restored like after deep sleep."""
+_wlan = None
+"""network.WLAN while connected by sleepscheduler."""
+_ring_buffers = {}
+"""RingBuffer by name."""
+_slot_groups = {}
+"""[layout, bytearray, accessor] of the slots by name, the accessor is None until rtc_slots() is called."""
+_overflow_sec = None
+"""Tasks due at or after this second may be in overflow_file, None when the file has no tasks."""
+_overflow_task_count = 0
+_overflow_size = 0
+"""Length of overflow_file in bytes."""
+_overflow_removals = {}
+"""(module_name, function_name) to the length of overflow_file when the tasks were removed, None
+for any name. The tasks of the chunks before it are dropped when the file is read."""
+_stored_size = 0
+"""Length of the RTC memory when it was last stored or restored."""
+_pending_runs = []
+"""[count, index, end, seconds_since_epoch, next_sec, sequence] of the runs of task records in the
+restored RTC memory with records that are not decoded yet, oldest first. index is the start of the
+next record that is due at next_sec, seconds_since_epoch is the time of the decoded record before
+it, 0 for none, and sequence the one reserved for it."""
+_pending_count = 0
+"""Amount of task records in the restored RTC memory that are not decoded yet."""
+_pending_sec = 0
+"""Time of the first record that is not decoded yet, all decoded records are due before it."""
+_deferred_sec = None
+"""Tasks due at or after this second may not be decoded or in overflow_file, None when all tasks are loaded."""
+_wlan_cache = [0, 0, 0, 0, 0, 0]
+"""BSSID and channel of the access point and IP address, netmask, gateway and DNS server
+of the DHCP lease as ints, 0 when not known."""
 
 
 # -------------------------------------------------------------------------------------------------
@@ -35,14 +239,14 @@ _tasks = []
 # -------------------------------------------------------------------------------------------------
 def schedule_on_cold_boot(function):
     global _start_seconds_since_epoch
-    if not machine.wake_reason() is machine.DEEPSLEEP_RESET:
-        print("sleepscheduler: schedule_on_cold_boot()")
+    if not _is_wake():
+        _log(LOG_LEVEL_INFO, "schedule_on_cold_boot()")
         function()
         # set _start_seconds_since_epoch in case func() set the time
         _start_seconds_since_epoch = utime.time()
 
 
-def schedule(module_name, function, hour, minute, second, repeat_after_sec=0):
+def schedule(module_name, function, hour, minute, second, repeat_after_sec=0, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
     """Schedule a function at the given hour and optional minute and second.
 
     Args:
@@ -52,8 +256,11 @@ def schedule(module_name, function, hour, minute, second, repeat_after_sec=0):
         minute(int): The minute 0-59 to schedule the function
         second(int): The second 0-59 to schedule the function
         repeat_after_sec (int): Repeat the function every given seconds afterwards
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
     Returns:
-        None
+        Task: Handle of the scheduled task that can be passed to `cancel()`
     """
     local_time = list(utime.localtime())
     # http://docs.micropython.org/en/latest/library/utime.html?highlight=localtime#utime.localtime
@@ -65,23 +272,26 @@ def schedule(module_name, function, hour, minute, second, repeat_after_sec=0):
         # move to next day
         epoch_time = epoch_time + SECONDS_PER_DAY
 
-    schedule_epoch_sec(module_name, function, epoch_time, repeat_after_sec)
+    return schedule_epoch_sec(module_name, function, epoch_time, repeat_after_sec, tolerance_sec, catch_up)
 
 
-def schedule_immediately(module_name, function, repeat_after_sec=0):
+def schedule_immediately(module_name, function, repeat_after_sec=0, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
     """Schedule a function as soon as possible.
 
     Args:
         module_name (str): Module where the function is defined
         function (callable/str): Function to be called. Can either be a function of a string with the fuction name
         repeat_after_sec (int): Repeat the function every given seconds
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
     Returns:
-        None
+        Task: Handle of the scheduled task that can be passed to `cancel()`
     """
-    schedule_epoch_sec(module_name, function, utime.time(), repeat_after_sec)
+    return schedule_epoch_sec(module_name, function, utime.time(), repeat_after_sec, tolerance_sec, catch_up)
 
 
-def schedule_delayed(module_name, function, seconds, repeat_after_sec=0):
+def schedule_delayed(module_name, function, seconds, repeat_after_sec=0, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
     """Schedule a function in `seconds` from now.
 
     Args:
@@ -89,22 +299,28 @@ def schedule_delayed(module_name, function, seconds, repeat_after_sec=0):
         function (callable/str): Function to be called. Can either be a function of a string with the fuction name
         seconds(int): Amount of seconds counted from now until the function is executed.
         repeat_after_sec (int): Repeat the function every given seconds
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
     Returns:
-        None
+        Task: Handle of the scheduled task that can be passed to `cancel()`
     """
-    schedule_epoch_sec(module_name, function,
-                       utime.time() + seconds, repeat_after_sec)
+    return schedule_epoch_sec(module_name, function,
+                              utime.time() + seconds, repeat_after_sec, tolerance_sec, catch_up)
 
 
-def schedule_next_full_minute(module_name, function, repeat_after_sec=0):
+def schedule_next_full_minute(module_name, function, repeat_after_sec=0, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
     """Schedule a function at the next full minute.
 
     Args:
         module_name (str): Module where the function is defined
         function (callable/str): Function to be called. Can either be a function of a string with the fuction name
         repeat_after_sec (int): Repeat the function every given seconds afterwards
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
     Returns:
-        None
+        Task: Handle of the scheduled task that can be passed to `cancel()`
     """
     local_time = list(utime.localtime())
     # set back to the minute just passed
@@ -112,18 +328,21 @@ def schedule_next_full_minute(module_name, function, repeat_after_sec=0):
     epoch_time = utime.mktime(local_time)
     # increment to the next full minute
     epoch_time = epoch_time + SECONDS_PER_MINUTE
-    schedule_epoch_sec(module_name, function, epoch_time, repeat_after_sec)
+    return schedule_epoch_sec(module_name, function, epoch_time, repeat_after_sec, tolerance_sec, catch_up)
 
 
-def schedule_next_full_hour(module_name, function, repeat_after_sec=0):
+def schedule_next_full_hour(module_name, function, repeat_after_sec=0, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
     """Schedule a function at the next full hour.
 
     Args:
         module_name (str): Module where the function is defined
         function (callable/str): Function to be called. Can either be a function of a string with the fuction name
         repeat_after_sec (int): Repeat the function every given seconds afterwards
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
     Returns:
-        None
+        Task: Handle of the scheduled task that can be passed to `cancel()`
     """
     local_time = list(utime.localtime())
     # set back to the hour just passed
@@ -131,10 +350,10 @@ def schedule_next_full_hour(module_name, function, repeat_after_sec=0):
     epoch_time = utime.mktime(local_time)
     # increment to the next full hour
     epoch_time = epoch_time + SECONDS_PER_HOUR
-    schedule_epoch_sec(module_name, function, epoch_time, repeat_after_sec)
+    return schedule_epoch_sec(module_name, function, epoch_time, repeat_after_sec, tolerance_sec, catch_up)
 
 
-def schedule_epoch_sec(module_name, function, seconds_since_epoch, repeat_after_sec=0):
+def schedule_epoch_sec(module_name, function, seconds_since_epoch, repeat_after_sec=0, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
     """Schedule a function at seconds since Epoch.
 
     Schedule the `function` at `seconds_since_epoch` since Unix Epoch in seconds.
@@ -144,24 +363,82 @@ def schedule_epoch_sec(module_name, function, seconds_since_epoch, repeat_after_
         function (callable/str): Function to be called. Can either be a function of a string with the fuction name
         seconds_since_epoch (int): Seconds since Epoch when the function is executed
         repeat_after_sec (int): Repeat the function every given seconds
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
     Returns:
-        None
+        Task: Handle of the scheduled task that can be passed to `cancel()`
     """
-    if callable(function):
-        function_name = function.__name__
-    else:
-        function_name = function
-    new_task = Task(module_name, function_name,
-                    seconds_since_epoch, repeat_after_sec)
-    inserted = False
-    for i in range(len(_tasks)):
-        task = _tasks[i]
-        if (task.seconds_since_epoch > seconds_since_epoch):
-            _tasks.insert(i, new_task)
-            inserted = True
-            break
-    if not inserted:
-        _tasks.append(new_task)
+    task = Task(module_name, None, seconds_since_epoch,
+                repeat_after_sec, None, tolerance_sec)
+    task.catch_up = catch_up
+    return _schedule_task(task, function)
+
+
+def schedule_delayed_ms(module_name, function, delay_ms, repeat_after_ms=0, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
+    """Schedule a function in `delay_ms` milliseconds from now.
+
+    Args:
+        module_name (str): Module where the function is defined
+        function (callable/str): Function to be called. Can either be a function of a string with the fuction name
+        delay_ms (int): Amount of milliseconds counted from now until the function is executed.
+        repeat_after_ms (int): Repeat the function every given milliseconds
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
+    Returns:
+        Task: Handle of the scheduled task that can be passed to `cancel()`
+    """
+    return schedule_epoch_ms(module_name, function, _epoch_ms() + delay_ms, repeat_after_ms, tolerance_sec, catch_up)
+
+
+def schedule_epoch_ms(module_name, function, ms_since_epoch, repeat_after_ms=0, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
+    """Schedule a function at milliseconds since Epoch.
+
+    Args:
+        module_name (str): Module where the function is defined
+        function (callable/str): Function to be called. Can either be a function of a string with the fuction name
+        ms_since_epoch (int): Milliseconds since Epoch when the function is executed
+        repeat_after_ms (int): Repeat the function every given milliseconds
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
+    Returns:
+        Task: Handle of the scheduled task that can be passed to `cancel()`
+    """
+    task = Task(module_name, None, ms_since_epoch // 1000, repeat_after_ms // 1000,
+                None, tolerance_sec)
+    task.ms = ms_since_epoch % 1000
+    task.repeat_after_ms = repeat_after_ms % 1000
+    task.catch_up = catch_up
+    return _schedule_task(task, function)
+
+
+def schedule_cron(module_name, function, spec, tolerance_sec=0, catch_up=CATCH_UP_RUN_ALL):
+    """Schedule a function repeatedly at the times matching a cron-like `spec`.
+
+    The spec has the fields "second minute hour weekday" separated by spaces, e.g.
+    "0 */15 6-21 0-4" is every 15 minutes between 06:00 and 22:00 from Monday to Friday.
+    Each field is `*`, a value or a range `a-b`, optionally followed by a step `/n`, and
+    multiple of them separated by commas. Weekdays are 0-6 from Monday as in `utime.localtime()`.
+
+    Args:
+        module_name (str): Module where the function is defined
+        function (callable/str): Function to be called. Can either be a function of a string with the fuction name
+        spec (str): Times to execute the function
+        tolerance_sec (int): The function may be executed up to the given seconds later to share a wake up with other tasks
+        catch_up (int): What to do when executions were missed, e.g. after the time was set forward:
+            CATCH_UP_RUN_ALL, CATCH_UP_RUN_ONCE_THEN_ALIGN or CATCH_UP_SKIP
+    Returns:
+        Task: Handle of the scheduled task that can be passed to `cancel()`
+    """
+    import sleepscheduler_cron
+    cron = sleepscheduler_cron.parse(spec)
+    task = Task(module_name, None, sleepscheduler_cron.next_sec(cron, utime.time() - 1),
+                0, None, tolerance_sec)
+    task.cron = cron
+    task.catch_up = catch_up
+    return _schedule_task(task, function)
 
 
 def remove_all(module_name, function):
@@ -177,12 +454,9 @@ def remove_all(module_name, function):
         function_name = function.__name__
     else:
         function_name = function
-    global _tasks
-    temp_tasks = []
-    for task in _tasks:
-        if task.function_name != function_name or task.module_name != module_name:
-            temp_tasks.append(task)
-    _tasks = temp_tasks
+    _decode_pending_tasks()
+    _cancel_tasks(_tasks_by_module_function.get((module_name, function_name)))
+    _remove_overflow_tasks(module_name, function_name)
 
 
 def remove_all_by_function_name(function):
@@ -197,12 +471,9 @@ def remove_all_by_function_name(function):
         function_name = function.__name__
     else:
         function_name = function
-    global _tasks
-    temp_tasks = []
-    for task in _tasks:
-        if task.function_name != function_name:
-            temp_tasks.append(task)
-    _tasks = temp_tasks
+    _decode_pending_tasks()
+    _cancel_tasks(_tasks_by_function_name.get(function_name))
+    _remove_overflow_tasks(None, function_name)
 
 
 def remove_all_by_module_name(module_name):
@@ -213,12 +484,87 @@ def remove_all_by_module_name(module_name):
     Returns:
         None
     """
-    global _tasks
-    temp_tasks = []
-    for task in _tasks:
-        if task.module_name != module_name:
-            temp_tasks.append(task)
-    _tasks = temp_tasks
+    _decode_pending_tasks()
+    _cancel_tasks(_tasks_by_module_name.get(module_name))
+    _remove_overflow_tasks(module_name, None)
+
+
+def cancel(task):
+    """Cancels a single scheduled task.
+
+    Args:
+        task (Task): Handle returned by one of the schedule functions
+    Returns:
+        None
+    """
+    _cancel_task(task)
+
+
+def set_budget(task, budget_ms, backoff_sec=0):
+    """Sets the time budget of a scheduled task.
+
+    A function that reaches the budget is reset by the watchdog, see budget_watchdog. A coroutine
+    returned by the function is cancelled when it reaches the budget. The overrun is counted in the
+    task statistics and a repeating task is moved by the backoff. When several tasks are due, the ones
+    with smaller budgets are executed first and tasks without a budget last.
+
+    Args:
+        task (Task): Handle returned by one of the schedule functions
+        budget_ms (int): Maximum execution time in milliseconds, 0 for no budget
+        backoff_sec (int): A repeating task that exceeded its budget continues with its first execution
+            at least the given seconds later
+    Returns:
+        None
+    """
+    task.budget_ms = budget_ms
+    task.backoff_sec = backoff_sec
+    task.record = None
+    if budget_ms and task in _tasks_by_module_function.get((task.module_name, task.function_name), ()):
+        _budgeted_tasks.add(task)
+    else:
+        _budgeted_tasks.discard(task)
+
+
+def set_retry(task, max_attempts, delay_sec, multiplier=2):
+    """Retries failed executions of a scheduled task instead of removing it when it is repeating.
+
+    The n-th retry of a failed execution is done `delay_sec * multiplier ** (n - 1)` seconds after
+    the failure, at most after the repeat period. Retries are only done before the next regular
+    execution of a repeating task, which starts new retries when it fails.
+
+    Args:
+        task (Task): Handle returned by one of the schedule functions
+        max_attempts (int): Maximum amount of retries of a failed execution, 0 to remove a failing repeating task
+        delay_sec (int): Seconds until the first retry
+        multiplier (int): Factor the delay grows with on every retry
+    Returns:
+        None
+    """
+    task.retry_attempts = max_attempts
+    task.retry_delay_sec = delay_sec
+    task.retry_multiplier = multiplier
+    task.record = None
+
+
+def set_needs_network(task, needs_network=True):
+    """Marks a scheduled task to need the network.
+
+    sleepscheduler connects to `wlan_ssid` before the first of these tasks of a wake, keeps the
+    connection for the others and disconnects before sleeping. The access point is remembered in
+    RTC memory to connect faster after deep sleep.
+
+    Args:
+        task (Task): Handle returned by one of the schedule functions
+        needs_network (bool): If the task needs the network
+    Returns:
+        None
+    """
+    task.needs_network = needs_network
+    task.record = None
+    if needs_network and task in _tasks_by_module_function.get((task.module_name, task.function_name), ()):
+        _network_tasks.add(task)
+    else:
+        _network_tasks.discard(task)
 
 
 def run_until_complete():
@@ -243,6 +589,21 @@ def run_forever():
     _run_tasks(True)
 
 
+def run_forever_async():
+    """Run the scheduler with uasyncio until the CPU performs a hard reset.
+    Functions of tasks can be coroutines (async def) which run concurrently while
+    the scheduler waits for the next task. Deep sleep is only done when no coroutine
+    of a task is running anymore.
+
+    Args:
+        None
+    Returns:
+        Will not return
+    """
+    import sleepscheduler_async
+    _import_asyncio().run(sleepscheduler_async.run_tasks(True))
+
+
 def print_tasks():
     """Prints all scheduled tasks. For debug purpose only.
 
@@ -251,221 +612,1330 @@ def print_tasks():
     Returns:
         None
     """
-    for task in _tasks:
-        print("sleepscheduler: print_tasks() { \"module_name\": \"" + task.module_name + "\", \"function_name\": \"" + task.function_name +
-              "\", \"seconds_since_epoch\": " + str(task.seconds_since_epoch) + ", \"repeat_after_sec\": " + str(task.repeat_after_sec) + "}")
+    import sleepscheduler_debug
+    sleepscheduler_debug.print_tasks()
+
+
+def plan(horizon_sec, max_wakes=20):
+    """Predicts the wakes within the given seconds without executing any task. It follows the
+    rules of run_forever() for deep sleep, the initial deep sleep delay and tolerance windows and
+    assumes that tasks execute without taking time. The wakes are simulated until max_wakes are
+    listed, the executions within the horizon are counted per task without simulating them.
+    Neither the scheduled tasks nor overflow_file are changed.
+
+    Args:
+        horizon_sec (int): Seconds from now to predict
+        max_wakes (int): Maximum amount of wakes to list
+    Returns:
+        dict: "wakes" as list of (seconds_since_epoch, ms, deep_sleep, list of (module_name, function_name)),
+            deep_sleep tells if the sleep before the wake is a deep sleep, tasks that are due now are
+            listed as first wake without sleep. "executions" counts the executions that are due within
+            the horizon. "wake_count" and "deep_sleeps" count all wakes within the horizon, they are
+            None when the horizon has more than max_wakes wakes.
+    """
+    import sleepscheduler_plan
+    return sleepscheduler_plan.plan(horizon_sec, max_wakes)
+
+
+def print_plan(horizon_sec, max_wakes=20):
+    """Prints the wakes predicted by plan(). For debug purpose only.
+
+    Args:
+        horizon_sec (int): Seconds from now to predict
+        max_wakes (int): Maximum amount of wakes to print
+    Returns:
+        None
+    """
+    import sleepscheduler_plan
+    sleepscheduler_plan.print_plan(horizon_sec, max_wakes)
+
+
+def print_saved_wakes():
+    """Prints how many wakes were saved by executing tasks within their tolerance. For debug purpose only.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    import sleepscheduler_debug
+    sleepscheduler_debug.print_saved_wakes()
+
+
+def print_wakeup_latency():
+    """Prints the measured time to wake up from deep sleep and how late or early the wakes were. For debug purpose only.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    import sleepscheduler_debug
+    sleepscheduler_debug.print_wakeup_latency()
+
+
+def get_task_stats(module_name, function):
+    """Returns the statistics of the executed tasks of the given function. The execution time of
+    coroutines started by run_forever_async() is measured until they finished, including the time
+    they waited.
+
+    Args:
+        module_name (str): Module where the function is defined
+        function (callable/str): Function of the tasks. Can either be a function of a string with the fuction name
+    Returns:
+        dict: runs, failures, total_ms, max_ms and last_ms of the execution, late_total_ms, late_max_ms
+            and last_late_ms after the due time and overruns of the budget or None if no task of the function
+            was executed
+    """
+    import sleepscheduler_stats
+    return sleepscheduler_stats.get_task_stats(module_name, function)
+
+
+def reset_task_stats():
+    """Resets the statistics of all executed tasks.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    _task_stats.clear()
+
+
+def print_task_stats():
+    """Prints the statistics of the executed tasks, one line per function. For debug purpose only.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    import sleepscheduler_stats
+    sleepscheduler_stats.print_task_stats()
+
+
+def get_energy():
+    """Returns the time spent in each state since power on or reset_energy() and the estimated
+    consumed charge using current_executing_ma, current_idle_ma, current_sleep_ma and current_deep_sleep_ma.
+
+    Args:
+        None
+    Returns:
+        dict: boots, executing_ms, idle_ms, sleep_ms, deep_sleep_ms, total_ms, mah and average_ma
+    """
+    import sleepscheduler_energy
+    return sleepscheduler_energy.get_energy()
+
+
+def reset_energy():
+    """Resets the time spent in each state and the amount of boots.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    import sleepscheduler_energy
+    sleepscheduler_energy.reset_energy()
+
+
+def print_energy():
+    """Prints the time spent in each state and the estimated consumed charge. For debug purpose only.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    import sleepscheduler_energy
+    sleepscheduler_energy.print_energy()
+
+
+def ring_buffer(name, record_format, capacity):
+    """Returns the ring buffer with the given name whose records are kept in RTC memory during deep sleep.
+
+    A new empty ring buffer is created when there is none with the name or it has a different format
+    or capacity. The records and their format use RTC memory like the tasks, see print_rtc_memory_usage().
+
+    Args:
+        name (str): Name of the ring buffer
+        record_format (str): struct format of a record, e.g. "<Ihh" for a timestamp and two int16
+        capacity (int): Maximum amount of records, the oldest record is overwritten when full
+    Returns:
+        RingBuffer: The ring buffer
+    """
+    ring = _ring_buffers.get(name)
+    if ring is None or ring.record_format != record_format or ring.capacity != capacity:
+        if ring is not None:
+            _log(LOG_LEVEL_INFO, "Ring buffer '{}' changed, {} records dropped", name, len(ring))
+        import sleepscheduler_ring
+        ring = sleepscheduler_ring.RingBuffer(name, record_format, capacity)
+        _ring_buffers[name] = ring
+    return ring
+
+
+def remove_ring_buffer(name):
+    """Removes the ring buffer with the given name and frees its RTC memory.
+
+    Args:
+        name (str): Name of the ring buffer
+    Returns:
+        None
+    """
+    _ring_buffers.pop(name, None)
+
+
+def rtc_slots(name, fields):
+    """Returns named and typed fields that are kept in RTC memory during deep sleep.
+
+    The fields are attributes of the returned object, e.g. `slots.counter = slots.counter + 1`.
+    They are read and written in place without allocating where uctypes is available. Each name
+    has its own memory, so modules using different names do not overwrite each other. The fields
+    are zero when they were not stored before or the fields of the name changed, e.g. after a
+    firmware update. An unknown type raises ValueError and keeps the stored values.
+
+    Args:
+        name (str): Name of the slots, e.g. the module name
+        fields (tuple): (field name, type) with the types "u8", "i8", "u16", "i16", "u32", "i32" and "float"
+    Returns:
+        object: Object with the fields as attributes
+    """
+    import sleepscheduler_slots
+    return sleepscheduler_slots.rtc_slots(name, fields)
+
+
+def remove_rtc_slots(name):
+    """Removes the slots with the given name and frees their RTC memory.
+
+    Args:
+        name (str): Name of the slots
+    Returns:
+        None
+    """
+    _slot_groups.pop(name, None)
+
+
+def print_rtc_memory_usage():
+    """Prints how much of the RTC memory is used and how many more tasks fit. For debug purpose only.
+
+    The amount of additional tasks is estimated with the average size of the currently
+    scheduled tasks, assuming they use functions that are already scheduled.
+
+    Args:
+        None
+    Returns:
+        None
+    """
+    import sleepscheduler_debug
+    sleepscheduler_debug.print_rtc_memory_usage()
 
 
 # -------------------------------------------------------------------------------------------------
 # Definitions
 # -------------------------------------------------------------------------------------------------
 class Task:
-    def __init__(self, module_name, function_name, seconds_since_epoch, repeat_after_sec):
+    # Rarely used fields are class attributes, an instance only gets its own attribute when the
+    # value is set, what keeps the instances of many tasks small.
+    # ms after seconds_since_epoch and ms added to repeat_after_sec, both 0-999
+    ms = 0
+    repeat_after_ms = 0
+    catch_up = CATCH_UP_RUN_ALL
+    # masks of the allowed second, minute, hour and weekday of a task scheduled by schedule_cron()
+    cron = None
+    # maximum execution time, see set_budget()
+    budget_ms = 0
+    backoff_sec = 0
+    # retry policy, see set_retry(), and the retry a task is executed for or 0 for a regular execution
+    retry_attempts = 0
+    retry_delay_sec = 0
+    retry_multiplier = 2
+    attempt = 0
+    needs_network = False
+    cancelled = False
+    # (delta_sec, ms, start, end, bytes) of the record in the RTC memory the task was restored from
+    record = None
+
+    def __init__(self, module_name, function_name, seconds_since_epoch, repeat_after_sec, function=None, tolerance_sec=0):
         self.module_name = module_name
         self.function_name = function_name
+        # callable given to the schedule functions, not available anymore after deep sleep
+        self.function = function
         self.seconds_since_epoch = seconds_since_epoch
         self.repeat_after_sec = repeat_after_sec
+        self.tolerance_sec = tolerance_sec
 
     def __str__(self):
         return self.__dict__
 
 
+class TaskBudgetExceeded(BaseException):
+    """Raised when the coroutine of a task is cancelled because it reached its budget. It is no
+    Exception so that the handlers of the task do not catch it."""
+    pass
+
+
 # -------------------------------------------------------------------------------------------------
 # Encoding/Decoding
 # -------------------------------------------------------------------------------------------------
-def _encode_task(task):
-    bytes = task.module_name.encode() + "\0" + task.function_name.encode() + "\0" + \
-        task.seconds_since_epoch.to_bytes(
-            4, 'big') + task.repeat_after_sec.to_bytes(4, 'big')
-    return bytes
-
-
-def _decode_task(bytes, start_index, tasks):
-    for i in range(start_index, len(bytes)):
-        if bytes[i] == 0:
-            module_name = bytes[start_index:i].decode()
-            end_index = i + 1  # +1 for \0
-            break
-
-    start_index = end_index
-    for i in range(start_index, len(bytes)):
-        if bytes[i] == 0:
-            function_name = bytes[start_index:i].decode()
-            end_index = i + 1  # +1 for \0
-            break
-
-    start_index = end_index
-    end_index = start_index + 4
-    seconds_since_epoch = int.from_bytes(bytes[start_index:end_index], 'big')
-
-    start_index = end_index
-    end_index = start_index + 4
-    repeat_after_sec = int.from_bytes(bytes[start_index:end_index], 'big')
-
+# Format of the RTC memory (version 5), all integers are unsigned LEB128 varints unless noted:
+#   version (1 byte), CRC32 of everything after the CRC (4 bytes, big endian)
+#   string count, followed by each string as length and UTF-8 bytes
+#   section count, followed by each section as tag, value count and values (_RTC_SECTION_*)
+#   ring buffer count, followed by each ring buffer as name index, format index, capacity,
+#     record count, dropped records and the records oldest first as packed by struct
+#   slots count, followed by each slots of rtc_slots() as name index, fields index, size and bytes
+#   length of rtc_memory_bytes, followed by its bytes
+#   run count, followed by each run as task count, length in bytes and the tasks of the run in
+#     the order of execution as
+#     flags, module name index, function name index,
+#     seconds since the previous task of the run (the first task since Epoch), repeat_after_sec,
+#     the optional fields that are present according to the flags (_TASK_FLAG_*)
+# The tasks are last so that only the ones due first are decoded on wake. The records that were
+# not decoded are copied as a run when storing again, the tasks of the same second are executed
+# in the order of the runs.
+# Version 4 has the tasks after the strings and rtc_memory_bytes until the end. Version 3
+# is the same without the slots, version 2 also without the ring buffers and version 1
+# also without the sections.
+# The legacy format (version 0) starts with a 4 byte task count what always has 0 in its first byte.
+def _read_task_record(buffer, strings, previous_seconds_since_epoch):
+    flags = _read_varint(buffer)
+    module_name = strings[_read_varint(buffer)]
+    function_name = strings[_read_varint(buffer)]
+    seconds_since_epoch = previous_seconds_since_epoch + _read_varint(buffer)
     task = Task(module_name, function_name,
-                seconds_since_epoch, repeat_after_sec)
-    tasks.append(task)
-    return end_index
-
-
-def _encode_tasks():
-    bytes = len(_tasks).to_bytes(4, 'big')
-    for task in _tasks:
-        task_bytes = _encode_task(task)
-        bytes = bytes + task_bytes
-
-    # add potential rtc_memory_bytes
-    try:
-        bytes = bytes + rtc_memory_bytes
-    except TypeError as e:
-        print("sleepscheduler: ERROR: Cannot store rtc_memory_bytes to RTC memory due to '{}'".format(e))
-
-    # print(bytes)
-    return bytes
-
-
-def _decode_tasks(bytes):
-    task_count = int.from_bytes(bytes[0:4], 'big')
-
-    tasks = list()
-    start_index = 4
-    for _ in range(0, task_count):
-        start_index = _decode_task(bytes, start_index, tasks)
-
-    global _tasks
-    _tasks = tasks
-
-    # restore potential rtc_memory_bytes
-    global rtc_memory_bytes
-    rtc_memory_bytes = bytearray(bytes[start_index:len(bytes)])
+                seconds_since_epoch, _read_varint(buffer))
+    if flags & _TASK_FLAG_TOLERANCE:
+        task.tolerance_sec = _read_varint(buffer)
+    if flags & _TASK_FLAG_MS:
+        task.ms = _read_varint(buffer)
+        task.repeat_after_ms = _read_varint(buffer)
+    if flags & _TASK_FLAG_CATCH_UP:
+        task.catch_up = _read_varint(buffer)
+    if flags & _TASK_FLAG_CRON:
+        task.cron = tuple([_read_varint(buffer) or _cron_full_mask(maximum)
+                           for maximum in _CRON_MAXIMUMS])
+    if flags & _TASK_FLAG_BUDGET:
+        task.budget_ms = _read_varint(buffer)
+        task.backoff_sec = _read_varint(buffer)
+    if flags & _TASK_FLAG_RETRY:
+        task.retry_attempts = _read_varint(buffer)
+        task.retry_delay_sec = _read_varint(buffer)
+        task.retry_multiplier = _read_varint(buffer)
+        task.attempt = _read_varint(buffer)
+    if flags & _TASK_FLAG_NETWORK:
+        task.needs_network = True
+    return task
+
+
+def _cron_full_mask(maximum):
+    return (1 << (maximum + 1)) - 1
+
+
+def _restore_rtc_sections(sections, strings):
+    global _saved_wakes, _saved_wakes_since_sec, _wake_sec
+    values = sections.get(_RTC_SECTION_SAVED_WAKES)
+    if values and len(values) >= 3:
+        _saved_wakes, _saved_wakes_since_sec, _wake_sec = values[0:3]
+
+    global _wakeup_latency_ms, _wakeup_latency_deviation_ms, _requested_wakeup_ms
+    global _late_wakes, _late_wakes_total_ms, _late_wakes_max_ms, _early_wakes, _early_wakes_total_ms
+    global _wakeup_latency_measured
+    values = sections.get(_RTC_SECTION_WAKEUP_LATENCY)
+    if values and len(values) >= 8:
+        _wakeup_latency_ms, _wakeup_latency_deviation_ms, _requested_wakeup_ms = values[0:3]
+        _late_wakes, _late_wakes_total_ms, _late_wakes_max_ms = values[3:6]
+        _early_wakes, _early_wakes_total_ms = values[6:8]
+        # stored without the flag the values were already updated by measurements
+        _wakeup_latency_measured = values[8] if len(values) >= 9 else 1
+
+    global _boots
+    values = sections.get(_RTC_SECTION_ENERGY)
+    if values and len(values) >= 5:
+        _boots = values[0]
+        _energy_ms[0:4] = values[1:5]
+
+    values = sections.get(_RTC_SECTION_WLAN)
+    if values and len(values) >= 6:
+        _wlan_cache[0:6] = values[0:6]
+
+    global _overflow_sec, _overflow_task_count, _overflow_size
+    values = sections.get(_RTC_SECTION_OVERFLOW)
+    if values and len(values) >= 3:
+        _overflow_sec, _overflow_task_count, _overflow_size = values[0:3]
+        _update_deferred_sec()
+
+    values = sections.get(_RTC_SECTION_OVERFLOW_REMOVALS)
+    if values:
+        for i in range(0, len(values) - 2, 3):
+            _overflow_removals[(strings[values[i] - 1] if values[i] else None,
+                                strings[values[i + 1] - 1] if values[i + 1] else None)] = values[i + 2]
+
+    global _budget_run
+    values = sections.get(_RTC_SECTION_BUDGET_RUN)
+    if values and len(values) >= 3:
+        _budget_run = (strings[values[0]], strings[values[1]], values[2])
+
+    values = sections.get(_RTC_SECTION_TASK_STATS)
+    if values:
+        import sleepscheduler_stats
+        sleepscheduler_stats.restore(values, strings)
+
+
+def _read_varint(buffer):
+    # reads at _read_index and moves it behind the varint, avoids allocating a tuple per value
+    global _read_index
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[_read_index]
+        _read_index = _read_index + 1
+        value = value | ((byte & 0x7F) << shift)
+        if byte < 0x80:
+            return value
+        shift = shift + 7
+
+
+def _decode_tasks(bytes, until_sec=None):
+    # Restores the scheduler state and decodes the tasks due until until_sec and the next one,
+    # the others are decoded by _decode_pending_tasks() when needed. None decodes all tasks.
+    _clear_tasks()
+    _ring_buffers.clear()
+    _slot_groups.clear()
+    _string_table.clear()
+    _string_table_indexes.clear()
+    global rtc_memory_bytes, _read_index, _restored_bytes, _overflow_sec, _overflow_task_count, _overflow_size
+    global _pending_count, _task_sequence
+    rtc_memory_bytes = bytearray()
+    _restored_bytes = None
+    _overflow_sec = None
+    _overflow_task_count = 0
+    _overflow_size = 0
+    _overflow_removals.clear()
+    _pending_count = 0
+    _update_deferred_sec()
+    if not bytes:
+        # nothing stored, e.g. after power on, a file of tasks from before is outdated
+        _remove_overflow_file()
+        return
+
+    version = bytes[0]
+    if version > _RTC_FORMAT_VERSION or (version and len(bytes) < _RTC_HEADER_SIZE):
+        _log(LOG_LEVEL_ERROR, "ERROR: Unsupported RTC memory format version '{}'", version)
+        return
+    if version < _RTC_FORMAT_VERSION:
+        # only read once after an update of sleepscheduler
+        import sleepscheduler_legacy
+        sleepscheduler_legacy.decode_tasks(bytes, version)
+        return
+    # a memoryview allows to slice without copying
+    bytes = memoryview(bytes)
+    if not _crc_matches(bytes):
+        return
+    _read_index = _RTC_HEADER_SIZE
+    strings = _read_strings(bytes)
+    _restore_rtc_sections(_read_sections(bytes), strings)
+    _read_ring_buffers(bytes, strings)
+    _read_slot_groups(bytes, strings)
+    length = _read_varint(bytes)
+    rtc_memory_bytes = bytearray(bytes[_read_index:_read_index + length])
+    _read_index = _read_index + length
+    # the records of tasks that do not change are copied when storing
+    _restored_bytes = bytes
+    # the sequences of all records are reserved so that they keep their order to tasks that
+    # are scheduled before they are decoded
+    for _ in range(_read_varint(bytes)):
+        count = _read_varint(bytes)
+        end = _read_varint(bytes) + _read_index
+        if count:
+            _pending_runs.append([count, _read_index, end, 0, _peek_record_sec(bytes, _read_index, 0), _pending_count])
+            _pending_count = _pending_count + count
+        _read_index = end
+    _task_sequence = _pending_count
+    _decode_pending_tasks(until_sec)
+
+
+def _crc_matches(bytes):
+    crc = struct.unpack_from(">I", bytes, 1)[0]
+    if crc != binascii.crc32(bytes[_RTC_HEADER_SIZE:]):
+        _log(LOG_LEVEL_ERROR, "ERROR: RTC memory is corrupt, CRC does not match")
+        _remove_overflow_file()
+        return False
+    return True
+
+
+def _read_strings(bytes):
+    global _read_index
+    strings = _string_table
+    for _ in range(_read_varint(bytes)):
+        length = _read_varint(bytes)
+        string = str(bytes[_read_index:_read_index + length], "utf-8")
+        _string_table_indexes[string] = len(strings)
+        strings.append(string)
+        _read_index = _read_index + length
+    return strings
+
+
+def _read_sections(bytes):
+    sections = {}
+    for _ in range(_read_varint(bytes)):
+        tag = _read_varint(bytes)
+        sections[tag] = [_read_varint(bytes)
+                         for _ in range(_read_varint(bytes))]
+    return sections
+
+
+def _read_ring_buffers(bytes, strings):
+    global _read_index
+    ring_count = _read_varint(bytes)
+    if ring_count:
+        import sleepscheduler_ring
+    for _ in range(ring_count):
+        ring = sleepscheduler_ring.RingBuffer(strings[_read_varint(bytes)], strings[_read_varint(bytes)], _read_varint(bytes))
+        ring.count = _read_varint(bytes)
+        ring.dropped = _read_varint(bytes)
+        length = ring.count * ring.record_size
+        ring.buffer[0:length] = bytes[_read_index:_read_index + length]
+        _read_index = _read_index + length
+        _ring_buffers[ring.name] = ring
+
+
+def _read_slot_groups(bytes, strings):
+    global _read_index
+    for _ in range(_read_varint(bytes)):
+        name = strings[_read_varint(bytes)]
+        layout = strings[_read_varint(bytes)]
+        length = _read_varint(bytes)
+        # the fields are checked when the slots are requested by rtc_slots()
+        _slot_groups[name] = [layout, bytearray(bytes[_read_index:_read_index + length]), None]
+        _read_index = _read_index + length
+
+
+def _decode_pending_tasks(until_sec=None, first_run=0):
+    # Decodes the deferred task records of the restored RTC memory that are due until until_sec,
+    # all for None, of the runs from first_run on.
+    global _read_index, _pending_count, _pending_sec
+    if not _pending_count:
+        return
+    bytes = _restored_bytes
+    strings = _string_table
+    for run in _pending_runs[first_run:]:
+        count, index, _, seconds_since_epoch, next_sec, sequence = run
+        while count and (until_sec is None or next_sec <= until_sec):
+            _read_index = index
+            task = _read_task_record(bytes, strings, seconds_since_epoch)
+            task.record = (task.seconds_since_epoch - seconds_since_epoch, task.ms, index, _read_index, bytes)
+            index = _read_index
+            seconds_since_epoch = task.seconds_since_epoch
+            count = count - 1
+            _push_task(task, sequence)
+            sequence = sequence + 1
+            if count and until_sec is not None:
+                next_sec = _peek_record_sec(bytes, index, seconds_since_epoch)
+        _pending_count = _pending_count - (run[0] - count)
+        run[0] = count
+        run[1] = index
+        run[3] = seconds_since_epoch
+        run[4] = next_sec
+        run[5] = sequence
+    _pending_runs[:] = [run for run in _pending_runs if run[0]]
+    if _pending_runs:
+        _pending_sec = min([run[4] for run in _pending_runs])
+    _update_deferred_sec()
+
+
+def _peek_record_sec(bytes, index, previous_seconds_since_epoch):
+    # time of the task record at index without decoding it
+    global _read_index
+    _read_index = index
+    _read_varint(bytes)
+    _read_varint(bytes)
+    _read_varint(bytes)
+    return previous_seconds_since_epoch + _read_varint(bytes)
+
+
+def _update_deferred_sec():
+    global _deferred_sec
+    _deferred_sec = _overflow_sec
+    if _pending_count and (_deferred_sec is None or _pending_sec < _deferred_sec):
+        _deferred_sec = _pending_sec
+
+
+def _load_tasks(until_sec=None):
+    # Decodes the deferred records of the RTC memory and loads overflow_file when tasks due until
+    # until_sec may be in it. None loads all tasks.
+    _decode_pending_tasks(until_sec)
+    if _overflow_sec is not None and (until_sec is None or until_sec >= _overflow_sec):
+        import sleepscheduler_overflow
+        sleepscheduler_overflow.load(until_sec)
 
 
 # -------------------------------------------------------------------------------------------------
 # Store/Restore to/from RTC-Memory
 # -------------------------------------------------------------------------------------------------
 def _store():
-    bytes = _encode_tasks()
+    global _stored_size
+    import sleepscheduler_encode
+    bytes = sleepscheduler_encode.encode_tasks()
+    if len(bytes) > RTC_MEMORY_SIZE and overflow_file:
+        import sleepscheduler_overflow
+        bytes = sleepscheduler_overflow.spill_tasks(bytes)
+    _stored_size = len(bytes)
     rtc = machine.RTC()
     rtc.memory(bytes)
 
 
+def _remove_overflow_tasks(module_name, function_name):
+    # The tasks in overflow_file are dropped when it is read instead of rewriting it now. Only the
+    # chunks written until now are affected, not the ones of tasks scheduled later.
+    if _overflow_sec is not None:
+        _overflow_removals[(module_name, function_name)] = _overflow_size
+
+
+def _remove_overflow_file():
+    if overflow_file:
+        for path in (overflow_file, overflow_file + ".tmp"):
+            try:
+                os.remove(path)
+            except OSError:
+                # not existing
+                pass
+
+
 def _restore_from_rtc_memory():
-    print("sleepscheduler: Restore from rtc memory")
+    # runs on import before main.py can change log_level, so it is not printed by default
+    _log(LOG_LEVEL_DEBUG, "Restore from rtc memory")
     rtc = machine.RTC()
     bytes = rtc.memory()
-    _decode_tasks(bytes)
-    print_tasks()
+    # only the tasks due now and the next one are decoded before the first task executes
+    _decode_tasks(bytes, utime.time())
+    global _boots, _stored_size
+    _stored_size = len(bytes)
+    _boots = _boots + 1
+    if _budget_run is not None:
+        import sleepscheduler_budget
+        sleepscheduler_budget.restore()
+    if log_level >= LOG_LEVEL_DEBUG:
+        print_tasks()
 
 
 # -------------------------------------------------------------------------------------------------
 # Helper functions
 # -------------------------------------------------------------------------------------------------
-def _deep_sleep_sec(durationSec):
+def _log(level, message, *args):
+    # the message is only formatted when it is printed
+    if log_level >= level:
+        print("sleepscheduler: " + message.format(*args))
+
+
+def _precise_epoch_ms():
+    # None when only the seconds are known
+    global _second_start_ticks_ms
+    if _HAS_TIME_NS:
+        return utime.time_ns() // 1000000
+    if _second_start_ticks_ms is None:
+        return None
+    # ticks_diff() handles the wraparound of ticks_ms()
+    elapsed_ms = utime.ticks_diff(utime.ticks_ms(), _second_start_ticks_ms)
+    if elapsed_ms < 0 or _second_start_sec + elapsed_ms // 1000 != utime.time():
+        # the ticks drifted too far from the RTC or wrapped more than once
+        _second_start_ticks_ms = None
+        return None
+    return _second_start_sec * 1000 + elapsed_ms
+
+
+def _epoch_ms():
+    now_ms = _precise_epoch_ms()
+    if now_ms is None:
+        return utime.time() * 1000
+    return now_ms
+
+
+def _account_energy(state):
+    # adds the time since the previous call to the given state
+    global _energy_ticks_ms
+    now_ticks_ms = utime.ticks_ms()
+    _energy_ms[state] = _energy_ms[state] + \
+        max(0, utime.ticks_diff(now_ticks_ms, _energy_ticks_ms))
+    _energy_ticks_ms = now_ticks_ms
+
+
+def _feed_watchdog():
+    if _watchdog is not None:
+        _watchdog.feed()
+
+
+def _sleep_ms(duration_ms):
+    while _watchdog is not None and duration_ms > _WATCHDOG_FEED_MS:
+        # the watchdog cannot be stopped, so it is fed in between
+        _sleep_ms(_WATCHDOG_FEED_MS)
+        duration_ms = duration_ms - _WATCHDOG_FEED_MS
+    _feed_watchdog()
+    if allow_light_sleep and _HAS_LIGHT_SLEEP:
+        _account_energy(_ENERGY_IDLE)
+        machine.lightsleep(duration_ms)
+        _account_energy(_ENERGY_SLEEP)
+    else:
+        # the CPU stays awake in utime.sleep_ms(), so it is accounted as idle
+        utime.sleep_ms(duration_ms)
+        _account_energy(_ENERGY_IDLE)
+
+
+def _sleep_sec(seconds):
+    # sleeps without light sleep so that the REPL stays responsive, e.g. on cold boot
+    while _watchdog is not None and seconds > _WATCHDOG_FEED_MS // 1000:
+        _sleep_sec(_WATCHDOG_FEED_MS // 1000)
+        seconds = seconds - _WATCHDOG_FEED_MS // 1000
+    _feed_watchdog()
+    utime.sleep(seconds)
+    _account_energy(_ENERGY_IDLE)
+
+
+def _deep_sleep(duration_ms=None):
+    _disconnect_network()
+    # the deep sleep is accounted before as the time is lost on wake
+    _account_energy(_ENERGY_IDLE)
+    if duration_ms:
+        _energy_ms[_ENERGY_DEEP_SLEEP] = _energy_ms[_ENERGY_DEEP_SLEEP] + duration_ms
     _store()
-    print("sleepscheduler: Deep sleep for {} seconds".format(durationSec))
-    machine.deepsleep(durationSec * 1000)
+    if duration_ms:
+        _log(LOG_LEVEL_INFO, "Deep sleep for {} ms", duration_ms)
+        machine.deepsleep(duration_ms)
+    else:
+        _log(LOG_LEVEL_INFO, "Deep sleep infinitely")
+        machine.deepsleep()
+
+
+def _sleep_until_ms(wake_ms):
+    # Sleeps once until wake_ms. Returns the amount of 1 ms polls that were needed to find the
+    # start of a second, what is only the case when utime.time_ns() is not available.
+    global _second_start_sec, _second_start_ticks_ms
+    now_ms = _precise_epoch_ms()
+    if _HAS_TIME_NS or (now_ms is not None and wake_ms % 1000):
+        if wake_ms > now_ms:
+            _sleep_ms(wake_ms - now_ms)
+        return 0
+
+    if now_ms is not None:
+        # wake up a few ms early as the ticks drift against the RTC and poll the start of the second
+        if wake_ms - now_ms > _SECOND_START_GUARD_MS:
+            _sleep_ms(wake_ms - now_ms - _SECOND_START_GUARD_MS)
+        sync_sec = wake_ms // 1000
+    else:
+        # the ms within the current second are unknown, poll the start of a second to know them
+        sync_sec = max(wake_ms // 1000, utime.time() + 1)
+        if sync_sec - utime.time() > 1:
+            _sleep_ms((sync_sec - utime.time() - 1) * 1000)
+
+    polls = 0
+    while sync_sec - utime.time() > 0:
+        utime.sleep_ms(1)
+        polls = polls + 1
+    if polls:
+        # the second just started, remember when
+        _second_start_sec = sync_sec
+        _second_start_ticks_ms = utime.ticks_ms()
+        if wake_ms > sync_sec * 1000:
+            _sleep_ms(wake_ms - sync_sec * 1000)
+    return polls
+
+
+def _disconnect_network():
+    global _wlan
+    if _wlan is not None:
+        _log(LOG_LEVEL_INFO, "Disconnect from '{}'", wlan_ssid)
+        _wlan.disconnect()
+        _wlan.active(False)
+        _wlan = None
+
+
+def _dispatch_early_network_task(first_task, start_coroutine=None):
+    # executes a task early to use the connection of this wake, False if there is none
+    if not network_group_sec or not _network_tasks or _wlan is None:
+        return False
+    import sleepscheduler_wlan
+    return sleepscheduler_wlan.dispatch_early_task(first_task, start_coroutine)
+
+
+def _wakeup_lead_ms():
+    # wake up early by the smoothed latency plus twice its deviation so that most wakes are in time
+    return _wakeup_latency_ms + 2 * _wakeup_latency_deviation_ms
+
+
+def _deep_sleep_threshold_sec():
+    return max(DEEP_SLEEP_WAKEUP_DELAY_SEC, (_wakeup_lead_ms() + 999) // 1000)
+
+
+def _deep_sleep_until_ms(wake_ms):
+    global _requested_wakeup_ms
+    now_ms = _epoch_ms()
+    duration_ms = max(1, wake_ms - _wakeup_lead_ms() - now_ms)
+    _requested_wakeup_ms = now_ms + duration_ms
+    _deep_sleep(duration_ms)
+
+
+def _measure_wakeup():
+    # Called when the scheduler starts after deep sleep. Updates the smoothed wakeup latency
+    # like the TCP round trip time estimation of RFC 6298: the first measurement replaces the
+    # initial values, the following ones are added with gains of 1/8 and 1/4.
+    global _requested_wakeup_ms, _wakeup_latency_ms, _wakeup_latency_deviation_ms, _wakeup_latency_measured
+    global _late_wakes, _late_wakes_total_ms, _late_wakes_max_ms, _early_wakes, _early_wakes_total_ms
+    if not _requested_wakeup_ms or machine.wake_reason() != machine.DEEPSLEEP_RESET:
+        return
+    now_ms = _epoch_ms()
+    latency_ms = max(0, now_ms - _requested_wakeup_ms)
+    _requested_wakeup_ms = 0
+    # the CPU was booting during the latency, the time since the import is part of it
+    global _energy_ticks_ms
+    _energy_ms[_ENERGY_IDLE] = _energy_ms[_ENERGY_IDLE] + latency_ms
+    _energy_ticks_ms = utime.ticks_ms()
+    if _wakeup_latency_measured:
+        error_ms = latency_ms - _wakeup_latency_ms
+        _wakeup_latency_ms = _wakeup_latency_ms + error_ms // 8
+        _wakeup_latency_deviation_ms = _wakeup_latency_deviation_ms + \
+            (abs(error_ms) - _wakeup_latency_deviation_ms) // 4
+    else:
+        _wakeup_latency_ms = latency_ms
+        _wakeup_latency_deviation_ms = latency_ms // 2
+        _wakeup_latency_measured = 1
+
+    wake_ms = _wake_sec * 1000
+    if now_ms > wake_ms:
+        _late_wakes = _late_wakes + 1
+        _late_wakes_total_ms = _late_wakes_total_ms + now_ms - wake_ms
+        _late_wakes_max_ms = max(_late_wakes_max_ms, now_ms - wake_ms)
+    else:
+        _early_wakes = _early_wakes + 1
+        _early_wakes_total_ms = _early_wakes_total_ms + wake_ms - now_ms
+
+
+def _schedule_task(task, function):
+    if callable(function):
+        task.function_name = function.__name__
+        task.function = function
+    else:
+        task.function_name = function
+    _push_task(task)
+    return task
+
+
+def _push_task(task, sequence=None):
+    _push_entry(task, sequence)
+    _add_to_indexes(task)
+
+
+def _add_to_indexes(task):
+    if task.budget_ms:
+        _budgeted_tasks.add(task)
+    if task.needs_network:
+        _network_tasks.add(task)
+    _add_to_index(_tasks_by_module_function,
+                  (task.module_name, task.function_name), task)
+    _add_to_index(_tasks_by_function_name, task.function_name, task)
+    _add_to_index(_tasks_by_module_name, task.module_name, task)
+
+
+def _push_executed_task(task):
+    # pushes the entry of a repeating task with a budget after it executed, unless it was cancelled
+    if task in _executing_tasks:
+        _executing_tasks.remove(task)
+        _push_entry(task)
+
+
+def _push_entry(task, sequence=None):
+    global _task_sequence
+    if sequence is None:
+        sequence = _task_sequence
+        _task_sequence = _task_sequence + 1
+    heapq.heappush(_tasks, (task.seconds_since_epoch,
+                            task.ms, sequence, task))
+
+
+def _first_task():
+    # drop cancelled entries from the top so that the first entry is a scheduled task
+    global _cancelled_task_count
+    while _tasks:
+        task = _tasks[0][3]
+        if not task.cancelled:
+            if _deferred_sec is not None and task.seconds_since_epoch + task.tolerance_sec >= _deferred_sec:
+                # tasks that are not loaded yet may be due before it or within its tolerance
+                _load_tasks(task.seconds_since_epoch + task.tolerance_sec)
+                continue
+            return task
+        heapq.heappop(_tasks)
+        _cancelled_task_count = _cancelled_task_count - 1
+    if _deferred_sec is not None:
+        _load_tasks(_deferred_sec)
+        return _first_task()
+    return None
+
+
+def _pop_task(index=0):
+    if index:
+        task = _remove_entry(_tasks, index)[3]
+    else:
+        task = heapq.heappop(_tasks)[3]
+    _remove_from_indexes(task)
+    return task
+
+
+def _remove_entry(heap, index):
+    # heapq cannot remove at an index, the last entry takes the place and moves
+    # up or down to where it belongs
+    entry = heap[index]
+    last = heap.pop()
+    if index == len(heap):
+        return entry
+    while index > 0 and last < heap[(index - 1) // 2]:
+        heap[index] = heap[(index - 1) // 2]
+        index = (index - 1) // 2
+    while True:
+        child = 2 * index + 1
+        if child >= len(heap):
+            break
+        if child + 1 < len(heap) and heap[child + 1] < heap[child]:
+            child = child + 1
+        if not heap[child] < last:
+            break
+        heap[index] = heap[child]
+        index = child
+    heap[index] = last
+    return entry
+
+
+def _cancel_task(task):
+    global _cancelled_task_count
+    tasks = _tasks_by_module_function.get((task.module_name, task.function_name))
+    if task.cancelled or not tasks or task not in tasks:
+        # not scheduled (anymore)
+        return
+    task.cancelled = True
+    _remove_from_indexes(task)
+    if task in _executing_tasks:
+        # its entry is not pushed again
+        _executing_tasks.remove(task)
+        return
+    _cancelled_task_count = _cancelled_task_count + 1
+    if _cancelled_task_count > len(_tasks) // 2:
+        _compact_tasks()
+
+
+def _cancel_tasks(tasks):
+    if tasks:
+        # copy as _cancel_task() removes the task from the index set
+        for task in list(tasks):
+            _cancel_task(task)
+
+
+def _compact_tasks():
+    global _tasks, _cancelled_task_count
+    _tasks = [entry for entry in _tasks if not entry[3].cancelled]
+    heapq.heapify(_tasks)
+    _cancelled_task_count = 0
+
+
+def _clear_tasks():
+    global _tasks, _task_sequence, _cancelled_task_count, _pending_count
+    _tasks = []
+    _task_sequence = 0
+    _cancelled_task_count = 0
+    _pending_count = 0
+    _pending_runs.clear()
+    _update_deferred_sec()
+    _tasks_by_module_function.clear()
+    _tasks_by_function_name.clear()
+    _tasks_by_module_name.clear()
+    _budgeted_tasks.clear()
+    _network_tasks.clear()
+    _executing_tasks.clear()
+
+
+def _add_to_index(index, key, task):
+    tasks = index.get(key)
+    if tasks is None:
+        tasks = set()
+        index[key] = tasks
+    tasks.add(task)
+
+
+def _remove_from_index(index, key, task):
+    tasks = index[key]
+    tasks.remove(task)
+    if not tasks:
+        del index[key]
+
+
+def _remove_from_indexes(task):
+    _remove_from_index(_tasks_by_module_function,
+                       (task.module_name, task.function_name), task)
+    _remove_from_index(_tasks_by_function_name, task.function_name, task)
+    _remove_from_index(_tasks_by_module_name, task.module_name, task)
+    _budgeted_tasks.discard(task)
+    _network_tasks.discard(task)
+
+
+def _task_due_ms(task):
+    return task.seconds_since_epoch * 1000 + task.ms
+
+
+def _is_repeating(task):
+    # a retry is executed once, it keeps the schedule of the task for the period
+    return task.attempt == 0 and (task.repeat_after_sec != 0 or task.repeat_after_ms != 0 or task.cron is not None)
+
+
+def _advance_task(task):
+    if task.cron:
+        import sleepscheduler_cron
+        task.seconds_since_epoch = sleepscheduler_cron.next_sec(task.cron, task.seconds_since_epoch)
+        task.ms = 0
+        return
+    # computed from the previous time and not from now so that repeating tasks do not drift
+    ms = task.ms + task.repeat_after_ms
+    task.seconds_since_epoch = task.seconds_since_epoch + \
+        task.repeat_after_sec + ms // 1000
+    task.ms = ms % 1000
+
+
+def _reschedule_task(task, now_ms):
+    # Advances a repeating task to its next execution according to its catch-up policy.
+    # Returns False when the due execution is skipped.
+    _advance_task(task)
+    due_ms = _task_due_ms(task)
+    if task.catch_up == CATCH_UP_RUN_ALL or due_ms > now_ms:
+        return True
+    # the next execution is due already, so the due one was missed
+    _skip_task_until(task, now_ms)
+    return task.catch_up != CATCH_UP_SKIP
+
+
+def _skip_task_until(task, until_ms):
+    # moves a repeating task to its first execution after until_ms on its schedule
+    if task.cron:
+        import sleepscheduler_cron
+        task.seconds_since_epoch = sleepscheduler_cron.next_sec(task.cron, until_ms // 1000)
+        task.ms = 0
+        return
+    due_ms = _task_due_ms(task)
+    if due_ms > until_ms:
+        return
+    period_ms = _task_period_ms(task)
+    due_ms = due_ms + ((until_ms - due_ms) // period_ms + 1) * period_ms
+    task.seconds_since_epoch = due_ms // 1000
+    task.ms = due_ms % 1000
+
+
+def _coalesced_wake_ms(first_task, tasks):
+    # Greedy interval stabbing: Waking up at the earliest end of all tolerance windows
+    # executes every task that is due until then in the same wake. Only entries due before
+    # the current result can lower it and entries below a later entry are due even later,
+    # so those sub-trees of the heap are skipped.
+    wake_ms = _task_due_ms(first_task) + first_task.tolerance_sec * 1000
+    if not first_task.tolerance_sec:
+        return wake_ms
+    pending = [0]
+    while pending:
+        i = pending.pop()
+        seconds_since_epoch, ms, _, task = tasks[i]
+        due_ms = seconds_since_epoch * 1000 + ms
+        if due_ms >= wake_ms:
+            continue
+        if not task.cancelled and due_ms + task.tolerance_sec * 1000 < wake_ms:
+            wake_ms = due_ms + task.tolerance_sec * 1000
+        for child in (2 * i + 1, 2 * i + 2):
+            if child < len(tasks):
+                pending.append(child)
+    return wake_ms
+
+
+def _task_period_ms(task):
+    if task.cron:
+        import sleepscheduler_cron
+        return sleepscheduler_cron.period_sec(task.cron) * 1000
+    return task.repeat_after_sec * 1000 + task.repeat_after_ms
+
+
+def _copy_task(task):
+    copy = Task(task.module_name, task.function_name, task.seconds_since_epoch,
+                task.repeat_after_sec, task.function, task.tolerance_sec)
+    # only the fields that differ from the class attributes
+    for name in _TASK_COPIED_FIELDS:
+        value = getattr(task, name)
+        if value != getattr(Task, name):
+            setattr(copy, name, value)
+    return copy
+
+
+def _plan_wake(wake_sec):
+    # planning the same wake again, e.g. after waking up early from deep sleep, continues it
+    global _wake_sec, _last_executed_sec
+    if wake_sec != _wake_sec:
+        _wake_sec = wake_sec
+        _last_executed_sec = None
+
+
+def _count_saved_wake(task):
+    # a task due at a later second than the previous one in the same wake would have needed its own wake
+    global _saved_wakes, _last_executed_sec
+    seconds_since_epoch = task.seconds_since_epoch
+    if seconds_since_epoch <= _wake_sec:
+        if _last_executed_sec is not None and seconds_since_epoch != _last_executed_sec:
+            _saved_wakes = _saved_wakes + 1
+        _last_executed_sec = seconds_since_epoch
+
+
+def _sorted_tasks():
+    _decode_pending_tasks()
+    return [entry[3] for entry in sorted(_tasks) if not entry[3].cancelled]
+
+
+def _resolve_function(task):
+    if task.function is not None:
+        return task.function
+    key = (task.module_name, task.function_name)
+    resolved = _resolved_functions.get(key)
+    module = sys.modules.get(task.module_name)
+    # a module that was removed or imported again is resolved again
+    if resolved is not None and resolved[0] is module:
+        return resolved[1]
+    func = getattr(__import__(task.module_name), task.function_name)
+    _resolved_functions[key] = (sys.modules.get(task.module_name), func)
+    return func
+
+
+def _import_asyncio():
+    # imported only when needed to not use RAM when running without coroutines
+    try:
+        import uasyncio as asyncio
+    except ImportError:
+        import asyncio
+    return asyncio
 
 
-def _execute_task(task):
+def _is_coroutine(result):
+    # coroutines are generators on MicroPython
+    return hasattr(result, "send")
+
+
+def _execute_task(task, start_coroutine=None, late_ms=0):
+    # start_coroutine(task, coroutine, late_ms) is called for a coroutine returned by the function,
+    # which records the run when the coroutine finished, None is returned then. Otherwise the
+    # coroutine is run until complete.
     try:
-        module = __import__(task.module_name)
-        func = getattr(module, task.function_name)
-        func()
+        func = _resolve_function(task)
+        if task.budget_ms and budget_watchdog:
+            # a hung function is reset by the watchdog
+            import sleepscheduler_budget
+            sleepscheduler_budget.arm(task)
+            try:
+                result = func()
+            finally:
+                sleepscheduler_budget.disarm()
+        else:
+            result = func()
+        if _is_coroutine(result):
+            if start_coroutine:
+                start_coroutine(task, result, late_ms)
+                return None
+            else:
+                import sleepscheduler_async
+                _import_asyncio().run(sleepscheduler_async.await_with_budget(task, result))
+        return True
+    except TaskBudgetExceeded:
+        # not a failure, the task is executed again and the overrun is counted by _record_task_run()
+        _log(LOG_LEVEL_ERROR, "ERROR: Task of function '{}' in module '{}' exceeded its budget of {} ms.",
+            task.function_name, task.module_name, task.budget_ms)
         return True
     except ImportError:
-        print("sleepscheduler: ERROR: Cannot schedule task, module '{}' not found.".format(
-            task.module_name))
+        _log(LOG_LEVEL_ERROR, "ERROR: Cannot schedule task, module '{}' not found.", task.module_name)
     except AttributeError:
-        print("sleepscheduler: ERROR: Cannot schedule task, function '{}' not found in module '{}'.".format(
-            task.function_name, task.module_name))
+        _log(LOG_LEVEL_ERROR, "ERROR: Cannot schedule task, function '{}' not found in module '{}'.",
+            task.function_name, task.module_name)
     except SyntaxError:
-        print("sleepscheduler: ERROR: Task of function '{}' in module '{}' failed due to syntax error.".format(
-            task.function_name, task.module_name))
+        _log(LOG_LEVEL_ERROR, "ERROR: Task of function '{}' in module '{}' failed due to syntax error.",
+            task.function_name, task.module_name)
     except BaseException as e:
-        print("sleepscheduler: ERROR: Task of function '{}' in module '{}' failed due to '{}'".format(
-            task.function_name, task.module_name, e))
+        _log(LOG_LEVEL_ERROR, "ERROR: Task of function '{}' in module '{}' failed due to '{}'",
+            task.function_name, task.module_name, e)
     except:
-        print("sleepscheduler: ERROR: Task of function '{}' in module '{}' failed due to unknown failure in function.".format(
-            task.function_name, task.module_name))
+        _log(LOG_LEVEL_ERROR, "ERROR: Task of function '{}' in module '{}' failed due to unknown failure in function.",
+            task.function_name, task.module_name)
     return False
 
 
+def _task_finished(task, successful):
+    if successful:
+        return
+    stats = _task_stats.get((task.module_name, task.function_name))
+    if stats is not None:
+        stats[1] = stats[1] + 1
+    if task.retry_attempts:
+        _schedule_retry(task)
+    elif _is_repeating(task):
+        # the task was added already so on failure we remove it
+        remove_all(task.module_name, task.function_name)
+
+
+def _schedule_retry(task):
+    # The retry is a one-time copy of the task so that a repeating task keeps its schedule
+    # and the attempt is stored with it during deep sleep.
+    attempt = task.attempt + 1
+    if attempt > task.retry_attempts:
+        _log(LOG_LEVEL_ERROR, "ERROR: Task of function '{}' in module '{}' failed after {} retries.",
+            task.function_name, task.module_name, task.retry_attempts)
+        return
+    delay_ms = task.retry_delay_sec * 1000 * task.retry_multiplier ** (attempt - 1)
+    period_ms = _task_period_ms(task)
+    if period_ms:
+        delay_ms = min(delay_ms, period_ms)
+    retry_ms = _epoch_ms() + delay_ms
+    _decode_pending_tasks()
+    for other in _tasks_by_module_function.get((task.module_name, task.function_name), ()):
+        if _is_repeating(other) and _task_due_ms(other) <= retry_ms:
+            # the next regular execution is due first
+            return
+    retry = _copy_task(task)
+    retry.seconds_since_epoch = retry_ms // 1000
+    retry.ms = retry_ms % 1000
+    retry.attempt = attempt
+    _log(LOG_LEVEL_INFO, "Retry {} of function '{}' in module '{}' in {} ms",
+        attempt, task.function_name, task.module_name, delay_ms)
+    _push_task(retry)
+
+
+def _is_wake():
+    # the tasks were restored after deep sleep or after the watchdog reset a function with a budget
+    return _watchdog_reset or machine.wake_reason() == machine.DEEPSLEEP_RESET
+
+
+def _cold_boot_remaining_sec():
+    # seconds until deep sleep is allowed after a cold boot, 0 when allowed
+    if _is_wake():
+        return 0
+    return max(0, _start_seconds_since_epoch + initial_deep_sleep_delay_sec - utime.time())
+
+
+def _record_task_run(task, duration_ms, late_ms):
+    key = (task.module_name, task.function_name)
+    stats = _task_stats.get(key)
+    if stats is None:
+        stats = [0] * _TASK_STATS_SIZE
+        _task_stats[key] = stats
+    stats[0] = stats[0] + 1
+    stats[2] = stats[2] + duration_ms
+    stats[3] = max(stats[3], duration_ms)
+    stats[4] = duration_ms
+    stats[5] = stats[5] + late_ms
+    stats[6] = max(stats[6], late_ms)
+    stats[7] = late_ms
+    # Without the watchdog the overrun of a function is detected after it returned.
+    # A cancelled coroutine ran at least its budget.
+    if task.budget_ms and duration_ms >= task.budget_ms:
+        import sleepscheduler_budget
+        sleepscheduler_budget.overrun(task)
+
+
+def _dispatch_first_task(first_task, start_coroutine=None, index=None):
+    # index of a task to execute early instead of the first task
+    now_ms = _epoch_ms()
+    # remove the first task from the heap, of the due tasks the one with the smallest budget
+    if index is None and _budgeted_tasks:
+        import sleepscheduler_budget
+        index = sleepscheduler_budget.smallest_budget_index(now_ms)
+    if index:
+        first_task = _pop_task(index)
+    else:
+        _pop_task()
+    _count_saved_wake(first_task)
+    late_ms = max(0, now_ms - _task_due_ms(first_task))
+    # Schedule the task at the next execution time if it is a repeating task.
+    # This needs to be done before executing the task so that it can remove itself
+    # from the scheduled tasks if it wants to. The same task object is scheduled
+    # again so that handles returned by the schedule functions stay valid.
+    if _is_repeating(first_task):
+        execute = _reschedule_task(first_task, now_ms)
+        if execute and first_task.budget_ms:
+            # the entry is pushed after the execution so that an overrun only moves the task
+            _add_to_indexes(first_task)
+            _executing_tasks.add(first_task)
+        else:
+            _push_task(first_task)
+        if not execute:
+            return
+    _account_energy(_ENERGY_IDLE)
+    if first_task.needs_network:
+        # the connect is accounted as execution but not counted in the task statistics
+        import sleepscheduler_wlan
+        sleepscheduler_wlan.connect()
+        _account_energy(_ENERGY_EXECUTING)
+    _feed_watchdog()
+    start_ticks_ms = _energy_ticks_ms
+    successful = _execute_task(first_task, start_coroutine, late_ms)
+    _account_energy(_ENERGY_EXECUTING)
+    if successful is None:
+        # the coroutine is still running
+        return
+    _record_task_run(first_task, max(0, utime.ticks_diff(
+        _energy_ticks_ms, start_ticks_ms)), late_ms)
+    _push_executed_task(first_task)
+    _task_finished(first_task, successful)
+
+
 def _run_tasks(forever):
+    _measure_wakeup()
     while True:
-        if _tasks:
-            first_task = _tasks[0]
-            time_until_first_task = first_task.seconds_since_epoch - utime.time()
-            if time_until_first_task <= 0:
-                # remove the first task from the list
-                _tasks.pop(0)
-                # Schedule the task at the next execution time if it is a repeating task.
-                # This needs to be done before executing the task so that it can remove itself
-                # from the scheduled tasks if it wants to.
-                if first_task.repeat_after_sec != 0:
-                    schedule_epoch_sec(
-                        first_task.module_name,
-                        first_task.function_name,
-                        first_task.seconds_since_epoch + first_task.repeat_after_sec,
-                        first_task.repeat_after_sec
-                    )
-                successful = _execute_task(first_task)
-                if not successful and first_task.repeat_after_sec != 0:
-                    # the task was added already so on failure we remove it
-                    remove_all(first_task.module_name,
-                               first_task.function_name)
-            else:
-                # Wake up from light sleep 1 sec before the next task executes
+        _feed_watchdog()
+        first_task = _first_task()
+        if first_task:
+            if _task_due_ms(first_task) <= _epoch_ms():
+                _dispatch_first_task(first_task)
+            elif not _dispatch_early_network_task(first_task):
+                _disconnect_network()
+                # Wake up when the first tolerance window ends, all tasks due until then
+                # are executed in the same wake.
+                wake_ms = _coalesced_wake_ms(first_task, _tasks)
+                _plan_wake(wake_ms // 1000)
+                time_until_first_task = wake_ms // 1000 - utime.time()
+                # Wake up from the sleep on cold boot 1 sec before the next task executes
                 # to allow sleeping milliseconds in order to execute the task on time.
                 WAKE_UP_SEC_BEFORE_TASK_EXECUTES = 1
-                if allow_deep_sleep and time_until_first_task > DEEP_SLEEP_WAKEUP_DELAY_SEC:
-                    if (not machine.wake_reason() == machine.DEEPSLEEP_RESET
+                if allow_deep_sleep and time_until_first_task > _deep_sleep_threshold_sec():
+                    if (not _is_wake()
                             and utime.time() < _start_seconds_since_epoch + initial_deep_sleep_delay_sec):
                         # initial deep sleep delay
                         remaining_no_deep_sleep_sec = (
                             _start_seconds_since_epoch + initial_deep_sleep_delay_sec) - utime.time()
                         if (time_until_first_task - WAKE_UP_SEC_BEFORE_TASK_EXECUTES > remaining_no_deep_sleep_sec):
                             # deep sleep prevention on cold boot
-                            print("sleepscheduler: sleep({}) due to cold boot".format(
-                                remaining_no_deep_sleep_sec))
-                            utime.sleep(remaining_no_deep_sleep_sec)
+                            _log(LOG_LEVEL_INFO, "sleep({}) due to cold boot", remaining_no_deep_sleep_sec)
+                            _sleep_sec(remaining_no_deep_sleep_sec)
                         else:
-                            print("sleepscheduler: sleep({}) due to cold boot".format(
-                                time_until_first_task - WAKE_UP_SEC_BEFORE_TASK_EXECUTES))
-                            utime.sleep(time_until_first_task -
-                                        WAKE_UP_SEC_BEFORE_TASK_EXECUTES)
+                            _log(LOG_LEVEL_INFO, "sleep({}) due to cold boot",
+                                time_until_first_task - WAKE_UP_SEC_BEFORE_TASK_EXECUTES)
+                            _sleep_sec(time_until_first_task -
+                                       WAKE_UP_SEC_BEFORE_TASK_EXECUTES)
                     else:
-                        _deep_sleep_sec(time_until_first_task -
-                                        DEEP_SLEEP_WAKEUP_DELAY_SEC)
+                        _deep_sleep_until_ms(wake_ms)
                 else:
                     if time_until_first_task > WAKE_UP_SEC_BEFORE_TASK_EXECUTES:
-                        print("sleepscheduler: sleep({})".format(
-                            time_until_first_task - WAKE_UP_SEC_BEFORE_TASK_EXECUTES))
-                        utime.sleep(time_until_first_task -
-                                    WAKE_UP_SEC_BEFORE_TASK_EXECUTES)
-                    else:
-                        # wait in ms to execute the task when the next second starts
-                        first_task_seconds_since_epoch = first_task.seconds_since_epoch
-                        while first_task_seconds_since_epoch - utime.time() > 0:
-                            utime.sleep_ms(1)
+                        _log(LOG_LEVEL_INFO, "sleep({})", time_until_first_task)
+                    # sleep in ms to execute the task on time
+                    _sleep_until_ms(wake_ms)
         else:
             if forever:
-                if (not machine.wake_reason() == machine.DEEPSLEEP_RESET
+                if (not _is_wake()
                         and utime.time() < _start_seconds_since_epoch + initial_deep_sleep_delay_sec):
                     # initial deep sleep delay
                     remaining_no_deep_sleep_sec = (
                         _start_seconds_since_epoch + initial_deep_sleep_delay_sec) - utime.time()
                     # deep sleep prevention on cold boot
-                    print("sleepscheduler: sleep({}) due to cold boot".format(
-                        remaining_no_deep_sleep_sec))
-                    utime.sleep(remaining_no_deep_sleep_sec)
+                    _log(LOG_LEVEL_INFO, "sleep({}) due to cold boot", remaining_no_deep_sleep_sec)
+                    _sleep_sec(remaining_no_deep_sleep_sec)
                 else:
                     # deep sleep until an external interrupt occurs (if configured)
-                    _store()
-                    print("sleepscheduler: Deep sleep infinitely")
                     # TODO delay if within first 20 seconds
-                    machine.deepsleep()
+                    _deep_sleep()
             else:
-                print("sleepscheduler: All tasks finished, exiting sleepscheduler.")
+                _disconnect_network()
+                _log(LOG_LEVEL_INFO, "All tasks finished, exiting sleepscheduler.")
                 break
 
 
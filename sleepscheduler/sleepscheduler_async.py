@@ -0,0 +1,124 @@
+# Runner of sleepscheduler.run_forever_async() and the budget of coroutines, imported by
+# sleepscheduler when a task returns a coroutine so that the module is not compiled otherwise.
+import utime
+import sleepscheduler as sl
+
+_coroutines_in_flight = 0
+"""Amount of coroutines of tasks that were started by run_forever_async() and did not finish yet."""
+_coroutines_idle = None
+
+
+async def await_with_budget(task, coroutine):
+    if not task.budget_ms:
+        await coroutine
+        return
+    asyncio = sl._import_asyncio()
+    try:
+        await asyncio.wait_for(coroutine, task.budget_ms / 1000)
+    except asyncio.TimeoutError:
+        raise sl.TaskBudgetExceeded()
+
+
+def _start_coroutine(task, coroutine, late_ms):
+    global _coroutines_in_flight
+    _coroutines_in_flight = _coroutines_in_flight + 1
+    _coroutines_idle.clear()
+    sl._import_asyncio().create_task(_await_coroutine(task, coroutine, late_ms, utime.ticks_ms()))
+
+
+async def _await_coroutine(task, coroutine, late_ms, start_ticks_ms):
+    global _coroutines_in_flight
+    successful = False
+    exceeded = False
+    try:
+        await await_with_budget(task, coroutine)
+        successful = True
+    except sl.TaskBudgetExceeded:
+        sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Task of function '{}' in module '{}' exceeded its budget of {} ms.",
+            task.function_name, task.module_name, task.budget_ms)
+        successful = True
+        exceeded = True
+    except Exception as e:
+        sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Task of function '{}' in module '{}' failed due to '{}'",
+            task.function_name, task.module_name, e)
+    _coroutines_in_flight = _coroutines_in_flight - 1
+    if _coroutines_in_flight == 0:
+        _coroutines_idle.set()
+    # from the start until the coroutine finished, a cancelled coroutine ran its budget
+    duration_ms = max(0, utime.ticks_diff(utime.ticks_ms(), start_ticks_ms))
+    if exceeded:
+        duration_ms = max(duration_ms, task.budget_ms)
+    sl._record_task_run(task, duration_ms, late_ms)
+    sl._push_executed_task(task)
+    sl._task_finished(task, successful)
+
+
+def _feed_interval_ms(timeout_ms):
+    # the watchdog cannot be stopped, so the loop wakes up in between to feed it
+    if sl._watchdog is not None:
+        return min(timeout_ms, sl._WATCHDOG_FEED_MS)
+    return timeout_ms
+
+
+async def _wait_ms(asyncio, timeout_ms):
+    # waits until the timeout passed or the coroutines of the tasks are idle
+    try:
+        await asyncio.wait_for(_coroutines_idle.wait(), timeout_ms / 1000)
+    except asyncio.TimeoutError:
+        pass
+
+
+async def run_tasks(forever):
+    global _coroutines_idle
+    asyncio = sl._import_asyncio()
+    _coroutines_idle = asyncio.Event()
+    _coroutines_idle.set()
+    sl._measure_wakeup()
+    while True:
+        sl._feed_watchdog()
+        first_task = sl._first_task()
+        if first_task:
+            if sl._task_due_ms(first_task) <= sl._epoch_ms():
+                sl._dispatch_first_task(first_task, _start_coroutine)
+                # let the started coroutines run before the next task
+                await asyncio.sleep(0)
+            elif sl._dispatch_early_network_task(first_task, _start_coroutine):
+                await asyncio.sleep(0)
+            else:
+                if _coroutines_in_flight == 0:
+                    sl._disconnect_network()
+                wake_ms = sl._coalesced_wake_ms(first_task, sl._tasks)
+                sl._plan_wake(wake_ms // 1000)
+                time_until_first_task = wake_ms // 1000 - utime.time()
+                if (_coroutines_in_flight == 0 and sl.allow_deep_sleep
+                        and time_until_first_task > sl._deep_sleep_threshold_sec()
+                        and sl._cold_boot_remaining_sec() == 0):
+                    sl._deep_sleep_until_ms(wake_ms)
+                elif _coroutines_in_flight == 0:
+                    # nothing runs until the task is due or deep sleep is allowed again
+                    remaining_ms = wake_ms - sl._epoch_ms()
+                    cold_boot_remaining_ms = sl._cold_boot_remaining_sec() * 1000
+                    if 0 < cold_boot_remaining_ms < remaining_ms:
+                        remaining_ms = cold_boot_remaining_ms
+                    await asyncio.sleep(_feed_interval_ms(max(0, remaining_ms)) / 1000)
+                else:
+                    # wake up when the task is due or the coroutines finished to deep sleep
+                    await _wait_ms(asyncio, _feed_interval_ms(max(0, wake_ms - sl._epoch_ms())))
+        elif _coroutines_in_flight > 0:
+            if sl._watchdog is not None:
+                await _wait_ms(asyncio, sl._WATCHDOG_FEED_MS)
+            else:
+                await _coroutines_idle.wait()
+        elif forever:
+            remaining_no_deep_sleep_sec = sl._cold_boot_remaining_sec()
+            if remaining_no_deep_sleep_sec > 0:
+                # deep sleep prevention on cold boot
+                sl._log(sl.LOG_LEVEL_INFO, "sleep({}) due to cold boot", remaining_no_deep_sleep_sec)
+                await asyncio.sleep(_feed_interval_ms(remaining_no_deep_sleep_sec * 1000) / 1000)
+            else:
+                # deep sleep until an external interrupt occurs (if configured)
+                sl._deep_sleep()
+        else:
+            sl._disconnect_network()
+            sl._log(sl.LOG_LEVEL_INFO, "All tasks finished, exiting sleepscheduler.")
+            break
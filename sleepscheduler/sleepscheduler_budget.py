@@ -0,0 +1,94 @@
+# Budgets of tasks and the watchdog of functions, imported by sleepscheduler when a task with a
+# budget is due or the watchdog reset one so that the module is not compiled otherwise.
+import machine
+import sleepscheduler as sl
+
+_HAS_WDT = hasattr(machine, "WDT")
+_IDLE_TIMEOUT_MS = 600000
+"""Timeout of the watchdog while no function with a budget executes, it cannot be stopped."""
+
+
+def arm(task):
+    # Stores the tasks as if the function exceeds its budget and sets the watchdog to the budget,
+    # so that after a reset the run is counted and the task continues after its backoff. The
+    # repeating tasks that execute have no entry, they are pushed for the store and removed again.
+    if not _HAS_WDT:
+        return
+    seconds_since_epoch = task.seconds_since_epoch
+    ms = task.ms
+    if task.backoff_sec and task in sl._executing_tasks:
+        sl._skip_task_until(task, sl._epoch_ms() + task.backoff_sec * 1000)
+    for executing in sl._executing_tasks:
+        sl._push_entry(executing)
+    sl._budget_run = (task.module_name, task.function_name, task.budget_ms)
+    sl._store()
+    task.seconds_since_epoch = seconds_since_epoch
+    task.ms = ms
+    # _store() sorted the entries, removing some keeps them sorted and so a valid heap
+    tasks = sl._tasks
+    kept = 0
+    for entry in tasks:
+        if entry[3] not in sl._executing_tasks:
+            tasks[kept] = entry
+            kept = kept + 1
+    del tasks[kept:]
+    for executing in list(sl._executing_tasks):
+        if executing not in sl._tasks_by_module_function.get((executing.module_name, executing.function_name), ()):
+            # moved to overflow_file by _store(), the armed task with its backoff
+            sl._executing_tasks.remove(executing)
+    sl._watchdog = machine.WDT(timeout=task.budget_ms)
+
+
+def disarm():
+    if sl._budget_run is None:
+        return
+    sl._budget_run = None
+    sl._watchdog = machine.WDT(timeout=_IDLE_TIMEOUT_MS)
+
+
+def restore():
+    # called on boot when the tasks were stored during a function with a budget
+    module_name, function_name, budget_ms = sl._budget_run
+    sl._budget_run = None
+    if machine.reset_cause() != machine.WDT_RESET:
+        return
+    sl._watchdog_reset = True
+    sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Task of function '{}' in module '{}' exceeded its budget of {} ms and was reset.",
+        function_name, module_name, budget_ms)
+    # counted like a run of the budget, the task was moved by its backoff before
+    task = sl.Task(module_name, function_name, 0, 0)
+    task.budget_ms = budget_ms
+    sl._record_task_run(task, budget_ms, 0)
+
+
+def smallest_budget_index(now_ms):
+    # Index of the due task with the smallest budget or 0 for the first task when no due task
+    # has a budget. Like in _coalesced_wake_ms(), sub-trees of entries that are not due are skipped.
+    sl._decode_pending_tasks(now_ms // 1000)
+    tasks = sl._tasks
+    best_index = 0
+    best_key = None
+    pending = [0]
+    while pending:
+        i = pending.pop()
+        seconds_since_epoch, ms, sequence, task = tasks[i]
+        if seconds_since_epoch * 1000 + ms > now_ms:
+            continue
+        if task.budget_ms and not task.cancelled:
+            key = (task.budget_ms, seconds_since_epoch, ms, sequence)
+            if best_key is None or key < best_key:
+                best_index = i
+                best_key = key
+        for child in (2 * i + 1, 2 * i + 2):
+            if child < len(tasks):
+                pending.append(child)
+    return best_index
+
+
+def overrun(task):
+    stats = sl._task_stats.get((task.module_name, task.function_name))
+    if stats is not None:
+        stats[8] = stats[8] + 1
+    if task.backoff_sec and task in sl._executing_tasks:
+        # the entry is pushed after the execution, so it is only moved
+        sl._skip_task_until(task, sl._epoch_ms() + task.backoff_sec * 1000)
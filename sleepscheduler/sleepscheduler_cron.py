@@ -0,0 +1,126 @@
+# Cron schedules of sleepscheduler.schedule_cron(), imported by sleepscheduler when a task
+# with a cron schedule is scheduled or advanced so that the module is not compiled otherwise.
+import utime
+import sleepscheduler as sl
+
+_FIELD_SEC = (60, sl.SECONDS_PER_HOUR, sl.SECONDS_PER_DAY, 7 * sl.SECONDS_PER_DAY)
+"""Seconds after which a cron field repeats."""
+_EPOCH_WEEKDAY = utime.localtime(0)[6]
+
+
+def parse(spec):
+    fields = spec.split()
+    if len(fields) != len(sl._CRON_MAXIMUMS):
+        raise ValueError("cron spec needs the fields second minute hour weekday: '{}'".format(spec))
+    return tuple([_parse_field(field, maximum)
+                  for field, maximum in zip(fields, sl._CRON_MAXIMUMS)])
+
+
+def _parse_field(field, maximum):
+    # bit i of the mask is set when value i is allowed
+    mask = 0
+    for part in field.split(","):
+        step = None
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part == "*":
+            first, last = 0, maximum
+        elif "-" in part:
+            first, last = [int(value) for value in part.split("-")]
+        else:
+            first = int(part)
+            # "a/n" counts from a to the end
+            last = maximum if step is not None else first
+        if step is None:
+            step = 1
+        if not 0 <= first <= last <= maximum or step < 1:
+            raise ValueError("invalid cron field '{}'".format(field))
+        for value in range(first, last + 1, step):
+            mask = mask | (1 << value)
+    return mask
+
+
+def period_sec(cron):
+    # the times repeat with the largest field that does not allow all values
+    result = 1
+    for mask, maximum, field_sec in zip(cron, sl._CRON_MAXIMUMS, _FIELD_SEC):
+        if mask != sl._cron_full_mask(maximum):
+            result = field_sec
+    return result
+
+
+def _lowest_bit(mask):
+    # index of the lowest set bit of a non-zero mask of up to 64 bits by halving
+    index = 0
+    for width in (32, 16, 8, 4, 2, 1):
+        if not mask & ((1 << width) - 1):
+            mask = mask >> width
+            index = index + width
+    return index
+
+
+def _next_bit(mask, start):
+    # smallest set bit index >= start, -1 if there is none
+    mask = mask >> start
+    if not mask:
+        return -1
+    return start + _lowest_bit(mask)
+
+
+def next_sec(cron, after_sec):
+    # First second after after_sec that matches the masks. Each field jumps to its next
+    # allowed value and resets the smaller fields, a field without one carries over to
+    # the next larger field. This needs a few steps per field instead of iterating the time.
+    second_mask, minute_mask, hour_mask, weekday_mask = cron
+    day, second_of_day = divmod(after_sec + 1, sl.SECONDS_PER_DAY)
+    hour = second_of_day // sl.SECONDS_PER_HOUR
+    minute = second_of_day // sl.SECONDS_PER_MINUTE % 60
+    second = second_of_day % 60
+    while True:
+        weekday = (day + _EPOCH_WEEKDAY) % 7
+        next_weekday = _next_bit(weekday_mask, weekday)
+        if next_weekday < 0:
+            next_weekday = _next_bit(weekday_mask, 0) + 7
+        if next_weekday != weekday:
+            day = day + next_weekday - weekday
+            hour, minute, second = 0, 0, 0
+        next_hour = _next_bit(hour_mask, hour)
+        if next_hour < 0:
+            day = day + 1
+            hour, minute, second = 0, 0, 0
+            continue
+        if next_hour != hour:
+            hour, minute, second = next_hour, 0, 0
+        next_minute = _next_bit(minute_mask, minute)
+        if next_minute < 0:
+            hour, minute, second = hour + 1, 0, 0
+            continue
+        if next_minute != minute:
+            minute, second = next_minute, 0
+        next_second = _next_bit(second_mask, second)
+        if next_second < 0:
+            minute, second = minute + 1, 0
+            continue
+        return day * sl.SECONDS_PER_DAY + hour * sl.SECONDS_PER_HOUR + minute * sl.SECONDS_PER_MINUTE + next_second
+
+
+def count(cron, sec):
+    # Amount of matching seconds before sec since the start of the week of the Epoch. The
+    # fields are counted like the digits of a number, largest first, without iterating the time.
+    second_mask, minute_mask, hour_mask, weekday_mask = cron
+    day, second_of_day = divmod(sec, sl.SECONDS_PER_DAY)
+    weeks, weekday = divmod(day + _EPOCH_WEEKDAY, 7)
+    masks = (weekday_mask, hour_mask, minute_mask, second_mask)
+    values = (weekday, second_of_day // sl.SECONDS_PER_HOUR, second_of_day // sl.SECONDS_PER_MINUTE % 60, second_of_day % 60)
+    sizes = [bin(mask).count("1") for mask in masks]
+    per_week = sizes[0] * sizes[1] * sizes[2] * sizes[3]
+    result = weeks * per_week
+    combinations = per_week
+    for i in range(len(masks)):
+        # combinations of the smaller fields for each smaller value of this field
+        combinations = combinations // sizes[i]
+        result = result + bin(masks[i] & ((1 << values[i]) - 1)).count("1") * combinations
+        if not masks[i] >> values[i] & 1:
+            break
+    return result
@@ -0,0 +1,58 @@
+# Output of the print functions of sleepscheduler that are for debug purpose only, imported by
+# sleepscheduler when one is called so that the module is not compiled otherwise.
+import utime
+import sleepscheduler as sl
+
+
+def print_tasks():
+    for task in sl._sorted_tasks():
+        print("sleepscheduler: print_tasks() { \"module_name\": \"" + task.module_name + "\", \"function_name\": \"" + task.function_name +
+              "\", \"seconds_since_epoch\": " + str(task.seconds_since_epoch) + ", \"repeat_after_sec\": " + str(task.repeat_after_sec) +
+              (", \"ms\": " + str(task.ms) + ", \"repeat_after_ms\": " + str(task.repeat_after_ms) if task.ms or task.repeat_after_ms else "") +
+              (", \"catch_up\": " + str(task.catch_up) if task.catch_up else "") +
+              (", \"cron\": " + str(list(task.cron)) if task.cron else "") +
+              (", \"budget_ms\": " + str(task.budget_ms) + ", \"backoff_sec\": " + str(task.backoff_sec) if task.budget_ms else "") +
+              (", \"retry_attempts\": " + str(task.retry_attempts) + ", \"retry_delay_sec\": " + str(task.retry_delay_sec) +
+               ", \"retry_multiplier\": " + str(task.retry_multiplier) + ", \"attempt\": " + str(task.attempt) if task.retry_attempts else "") +
+              (", \"needs_network\": true" if task.needs_network else "") + "}")
+    if sl._overflow_sec is not None:
+        # not loaded to keep the file unread until the tasks in RTC memory are done
+        print("sleepscheduler: print_tasks() { \"overflow_file\": \"" + sl.overflow_file + "\", \"tasks\": " + str(sl._overflow_task_count) +
+              ", \"seconds_since_epoch\": " + str(sl._overflow_sec) + "}")
+
+
+def print_saved_wakes():
+    elapsed_sec = max(1, utime.time() - sl._saved_wakes_since_sec)
+    print("sleepscheduler: print_saved_wakes() { \"saved_wakes\": " + str(sl._saved_wakes) + ", \"days\": " + str(elapsed_sec / sl.SECONDS_PER_DAY) +
+          ", \"saved_wakes_per_day\": " + str(sl._saved_wakes * sl.SECONDS_PER_DAY / elapsed_sec) + "}")
+
+
+def print_wakeup_latency():
+    print("sleepscheduler: print_wakeup_latency() { \"latency_ms\": " + str(sl._wakeup_latency_ms) + ", \"deviation_ms\": " + str(sl._wakeup_latency_deviation_ms) +
+          ", \"late_wakes\": " + str(sl._late_wakes) + ", \"late_total_ms\": " + str(sl._late_wakes_total_ms) + ", \"late_max_ms\": " + str(sl._late_wakes_max_ms) +
+          ", \"early_wakes\": " + str(sl._early_wakes) + ", \"early_total_ms\": " + str(sl._early_wakes_total_ms) + "}")
+
+
+def print_rtc_memory_usage():
+    import sleepscheduler_encode
+    used_bytes = len(sleepscheduler_encode.encode_tasks())
+    free_bytes = sl.RTC_MEMORY_SIZE - used_bytes
+    tasks = sl._sorted_tasks()
+    if tasks:
+        strings = []
+        string_indexes = {}
+        records_size = 0
+        previous_seconds_since_epoch = 0
+        for task in tasks:
+            module_index = sleepscheduler_encode.string_index(
+                strings, string_indexes, task.module_name)
+            function_index = sleepscheduler_encode.string_index(
+                strings, string_indexes, task.function_name)
+            records_size = records_size + sleepscheduler_encode.task_record_size(
+                task, module_index, function_index, task.seconds_since_epoch - previous_seconds_since_epoch)
+            previous_seconds_since_epoch = task.seconds_since_epoch
+        more_tasks = max(0, free_bytes * len(tasks) // records_size)
+    else:
+        more_tasks = "unknown"
+    print("sleepscheduler: print_rtc_memory_usage() { \"used_bytes\": " + str(used_bytes) + ", \"size_bytes\": " + str(sl.RTC_MEMORY_SIZE) +
+          ", \"rtc_memory_bytes\": " + str(len(sl.rtc_memory_bytes)) + ", \"tasks\": " + str(len(tasks)) + ", \"more_tasks\": " + str(more_tasks) + "}")
@@ -0,0 +1,359 @@
+# Encoding of the tasks and the scheduler state into the RTC memory, imported by sleepscheduler
+# when it stores them before deep sleep so that the module is not compiled before the first task
+# of a wake executed. The format is described in sleepscheduler, which decodes it.
+try:
+    import binascii
+except ImportError:
+    import ubinascii as binascii
+try:
+    import struct
+except ImportError:
+    import ustruct as struct
+import sleepscheduler as sl
+
+_buffer = bytearray()
+"""Reused by encode_tasks() to avoid allocating a new buffer on every store of a boot."""
+_encoded_strings = {}
+
+
+def encode_tasks():
+    # The records that were not decoded are copied as runs without decoding them, only the first
+    # record of a run is encoded again with its delta since Epoch. The scheduled tasks are encoded
+    # as the last run. The youngest runs are decoded and encoded with the scheduled tasks when they
+    # have not more records, like merging runs of similar sizes, so that there are only a few runs
+    # and each record is decoded a few times.
+    task_count = len(sl._tasks) - sl._cancelled_task_count
+    merged = len(sl._pending_runs)
+    merged_count = task_count
+    while merged > 0 and (sl._pending_runs[merged - 1][0] <= merged_count or merged >= sl._MAX_TASK_RUNS):
+        merged = merged - 1
+        merged_count = merged_count + sl._pending_runs[merged][0]
+    if merged < len(sl._pending_runs):
+        sl._decode_pending_tasks(None, merged)
+    # A sorted list is a valid heap, so sorting in place brings the tasks into
+    # execution order without allocating a new list.
+    sl._tasks.sort()
+    if not sl._pending_count:
+        # the string indexes of the pending records stay valid, so the table is only pruned without them
+        _prune_string_table()
+
+    # first pass to compute the exact size, the records of tasks that did not change since
+    # they were restored are copied instead of encoded again
+    strings = sl._string_table
+    string_indexes = sl._string_table_indexes
+    restored = sl._restored_bytes
+    # (first task, start of the records after it) of each pending run
+    run_heads = []
+    runs_size = 0
+    for count, index, end, seconds_since_epoch, _, _ in sl._pending_runs:
+        sl._read_index = index
+        task = sl._read_task_record(restored, strings, seconds_since_epoch)
+        run_heads.append((task, sl._read_index))
+        length = task_record_size(task, string_indexes[task.module_name], string_indexes[task.function_name],
+                                  task.seconds_since_epoch) + end - sl._read_index
+        runs_size = runs_size + varint_size(count) + varint_size(length) + length
+    tasks_size = 0
+    task_count = 0
+    previous_seconds_since_epoch = 0
+    for entry in sl._tasks:
+        task = entry[3]
+        if task.cancelled:
+            continue
+        delta_sec = task.seconds_since_epoch - previous_seconds_since_epoch
+        record = task.record
+        if record is not None and record[4] is restored and record[0] == delta_sec and record[1] == task.ms:
+            tasks_size = tasks_size + record[3] - record[2]
+        else:
+            tasks_size = tasks_size + task_record_size(
+                task,
+                string_index(strings, string_indexes, task.module_name),
+                string_index(strings, string_indexes, task.function_name),
+                delta_sec)
+        previous_seconds_since_epoch = task.seconds_since_epoch
+        task_count = task_count + 1
+    run_count = len(sl._pending_runs) + (1 if task_count else 0)
+    size = sl._RTC_HEADER_SIZE + varint_size(run_count) + runs_size
+    if task_count:
+        size = size + varint_size(task_count) + varint_size(tasks_size) + tasks_size
+    sections = _rtc_sections(strings, string_indexes)
+    size = size + varint_size(len(sections))
+    for tag, values in sections:
+        size = size + varint_size(tag) + varint_size(len(values))
+        for value in values:
+            size = size + varint_size(value)
+    size = size + varint_size(len(sl._ring_buffers))
+    for ring in sl._ring_buffers.values():
+        size = size + varint_size(string_index(strings, string_indexes, ring.name)) + \
+            varint_size(string_index(strings, string_indexes, ring.record_format)) + \
+            varint_size(ring.capacity) + varint_size(ring.count) + varint_size(ring.dropped) + \
+            ring.count * ring.record_size
+    size = size + varint_size(len(sl._slot_groups))
+    for name, (layout, slots_buffer, _) in sl._slot_groups.items():
+        size = size + varint_size(string_index(strings, string_indexes, name)) + \
+            varint_size(string_index(strings, string_indexes, layout)) + \
+            varint_size(len(slots_buffer)) + len(slots_buffer)
+    size = size + varint_size(len(strings))
+    for string in strings:
+        length = len(encoded_string(string))
+        size = size + varint_size(length) + length
+    try:
+        rtc_memory_bytes_size = len(sl.rtc_memory_bytes)
+    except TypeError as e:
+        sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Cannot store rtc_memory_bytes to RTC memory due to '{}'", e)
+        rtc_memory_bytes_size = 0
+    size = size + varint_size(rtc_memory_bytes_size) + rtc_memory_bytes_size
+
+    # second pass to write into the reused buffer
+    global _buffer
+    if len(_buffer) < size:
+        _buffer = bytearray(size)
+    buffer = _buffer
+    buffer[0] = sl._RTC_FORMAT_VERSION
+    index = write_varint(buffer, sl._RTC_HEADER_SIZE, len(strings))
+    for string in strings:
+        encoded = encoded_string(string)
+        index = write_varint(buffer, index, len(encoded))
+        buffer[index:index + len(encoded)] = encoded
+        index = index + len(encoded)
+
+    index = write_varint(buffer, index, len(sections))
+    for tag, values in sections:
+        index = write_varint(buffer, index, tag)
+        index = write_varint(buffer, index, len(values))
+        for value in values:
+            index = write_varint(buffer, index, value)
+
+    index = write_varint(buffer, index, len(sl._ring_buffers))
+    for ring in sl._ring_buffers.values():
+        index = write_varint(buffer, index, string_indexes[ring.name])
+        index = write_varint(buffer, index, string_indexes[ring.record_format])
+        index = write_varint(buffer, index, ring.capacity)
+        index = write_varint(buffer, index, ring.count)
+        index = write_varint(buffer, index, ring.dropped)
+        # the records are stored oldest first, in two parts when they wrap around
+        records = memoryview(ring.buffer)
+        first_count = min(ring.count, ring.capacity - ring.start)
+        for start, count in ((ring.start, first_count), (0, ring.count - first_count)):
+            length = count * ring.record_size
+            buffer[index:index + length] = records[start * ring.record_size:start * ring.record_size + length]
+            index = index + length
+
+    index = write_varint(buffer, index, len(sl._slot_groups))
+    for name, (layout, slots_buffer, _) in sl._slot_groups.items():
+        index = write_varint(buffer, index, string_indexes[name])
+        index = write_varint(buffer, index, string_indexes[layout])
+        index = write_varint(buffer, index, len(slots_buffer))
+        buffer[index:index + len(slots_buffer)] = slots_buffer
+        index = index + len(slots_buffer)
+
+    # add potential rtc_memory_bytes
+    index = write_varint(buffer, index, rtc_memory_bytes_size)
+    if rtc_memory_bytes_size:
+        buffer[index:index + rtc_memory_bytes_size] = sl.rtc_memory_bytes
+        index = index + rtc_memory_bytes_size
+
+    index = write_varint(buffer, index, run_count)
+    for run, (task, start) in zip(sl._pending_runs, run_heads):
+        end = run[2]
+        index = write_varint(buffer, index, run[0])
+        index = write_varint(buffer, index, task_record_size(
+            task, string_indexes[task.module_name], string_indexes[task.function_name],
+            task.seconds_since_epoch) + end - start)
+        index = write_task_record(buffer, index, task, string_indexes[task.module_name],
+                                  string_indexes[task.function_name], task.seconds_since_epoch)
+        buffer[index:index + end - start] = restored[start:end]
+        index = index + end - start
+    if task_count:
+        index = write_varint(buffer, index, task_count)
+        index = write_varint(buffer, index, tasks_size)
+    previous_seconds_since_epoch = 0
+    for entry in sl._tasks:
+        task = entry[3]
+        if task.cancelled:
+            continue
+        delta_sec = task.seconds_since_epoch - previous_seconds_since_epoch
+        record = task.record
+        if record is not None and record[4] is restored and record[0] == delta_sec and record[1] == task.ms:
+            length = record[3] - record[2]
+            buffer[index:index + length] = restored[record[2]:record[3]]
+            index = index + length
+        else:
+            index = write_task_record(buffer, index, task,
+                                      string_indexes[task.module_name],
+                                      string_indexes[task.function_name],
+                                      delta_sec)
+        previous_seconds_since_epoch = task.seconds_since_epoch
+
+    bytes = memoryview(buffer)[0:size]
+    struct.pack_into(">I", buffer, 1, binascii.crc32(
+        bytes[sl._RTC_HEADER_SIZE:size]))
+    return bytes
+
+
+def _prune_string_table():
+    # new strings are appended to the table, it is only rebuilt when strings are not used anymore
+    used = set(sl._tasks_by_module_name)
+    used.update(sl._tasks_by_function_name)
+    for ring in sl._ring_buffers.values():
+        used.add(ring.name)
+        used.add(ring.record_format)
+    for name, group in sl._slot_groups.items():
+        used.add(name)
+        used.add(group[0])
+    if sl.store_task_stats:
+        for module_name, function_name in sl._task_stats:
+            used.add(module_name)
+            used.add(function_name)
+    for module_name, function_name in sl._overflow_removals:
+        used.add(module_name)
+        used.add(function_name)
+    for string in sl._string_table:
+        if string not in used:
+            # the indexes change, so no record can be copied anymore
+            sl._string_table.clear()
+            sl._string_table_indexes.clear()
+            sl._restored_bytes = None
+            return
+
+
+def _rtc_sections(strings, string_indexes):
+    # scheduler state that is kept during deep sleep as tag and tuple of unsigned ints,
+    # names are added to the strings and stored as their index
+    sections = [(sl._RTC_SECTION_SAVED_WAKES, (sl._saved_wakes, sl._saved_wakes_since_sec, sl._wake_sec)),
+                (sl._RTC_SECTION_WAKEUP_LATENCY, (sl._wakeup_latency_ms, sl._wakeup_latency_deviation_ms,
+                                                  sl._requested_wakeup_ms, sl._late_wakes, sl._late_wakes_total_ms,
+                                                  sl._late_wakes_max_ms, sl._early_wakes, sl._early_wakes_total_ms,
+                                                  sl._wakeup_latency_measured)),
+                (sl._RTC_SECTION_ENERGY, [sl._boots] + sl._energy_ms)]
+    if sl._wlan_cache[0]:
+        sections.append((sl._RTC_SECTION_WLAN, sl._wlan_cache))
+    if sl._overflow_sec is not None:
+        sections.append((sl._RTC_SECTION_OVERFLOW, (sl._overflow_sec, sl._overflow_task_count, sl._overflow_size)))
+    if sl._budget_run is not None:
+        sections.append((sl._RTC_SECTION_BUDGET_RUN, (string_index(strings, string_indexes, sl._budget_run[0]),
+                                                      string_index(strings, string_indexes, sl._budget_run[1]),
+                                                      sl._budget_run[2])))
+    if sl._overflow_removals:
+        # names as string index + 1, 0 for any name
+        values = []
+        for (module_name, function_name), size in sl._overflow_removals.items():
+            values.append(0 if module_name is None else string_index(strings, string_indexes, module_name) + 1)
+            values.append(0 if function_name is None else string_index(strings, string_indexes, function_name) + 1)
+            values.append(size)
+        sections.append((sl._RTC_SECTION_OVERFLOW_REMOVALS, values))
+    if sl.store_task_stats and sl._task_stats:
+        # the size of the entries first to restore stats of other versions
+        values = [sl._TASK_STATS_SIZE]
+        for (module_name, function_name), stats in sl._task_stats.items():
+            values.append(string_index(strings, string_indexes, module_name))
+            values.append(string_index(strings, string_indexes, function_name))
+            values.extend(stats)
+        sections.append((sl._RTC_SECTION_TASK_STATS, values))
+    return sections
+
+
+def varint_size(value):
+    size = 1
+    while value > 0x7F:
+        value = value >> 7
+        size = size + 1
+    return size
+
+
+def write_varint(buffer, index, value):
+    while value > 0x7F:
+        buffer[index] = (value & 0x7F) | 0x80
+        index = index + 1
+        value = value >> 7
+    buffer[index] = value
+    return index + 1
+
+
+def _task_flags(task):
+    flags = 0
+    if task.tolerance_sec:
+        flags = flags | sl._TASK_FLAG_TOLERANCE
+    if task.ms or task.repeat_after_ms:
+        flags = flags | sl._TASK_FLAG_MS
+    if task.catch_up:
+        flags = flags | sl._TASK_FLAG_CATCH_UP
+    if task.cron:
+        flags = flags | sl._TASK_FLAG_CRON
+    if task.budget_ms:
+        flags = flags | sl._TASK_FLAG_BUDGET
+    if task.retry_attempts:
+        flags = flags | sl._TASK_FLAG_RETRY
+    if task.needs_network:
+        flags = flags | sl._TASK_FLAG_NETWORK
+    return flags
+
+
+def task_record_size(task, module_index, function_index, delta_sec):
+    size = varint_size(_task_flags(task)) + varint_size(module_index) + varint_size(function_index) + \
+        varint_size(delta_sec) + varint_size(task.repeat_after_sec)
+    if task.tolerance_sec:
+        size = size + varint_size(task.tolerance_sec)
+    if task.ms or task.repeat_after_ms:
+        size = size + varint_size(task.ms) + \
+            varint_size(task.repeat_after_ms)
+    if task.catch_up:
+        size = size + varint_size(task.catch_up)
+    if task.cron:
+        for mask, maximum in zip(task.cron, sl._CRON_MAXIMUMS):
+            size = size + varint_size(_cron_stored_mask(mask, maximum))
+    if task.budget_ms:
+        size = size + varint_size(task.budget_ms) + \
+            varint_size(task.backoff_sec)
+    if task.retry_attempts:
+        size = size + varint_size(task.retry_attempts) + varint_size(task.retry_delay_sec) + \
+            varint_size(task.retry_multiplier) + varint_size(task.attempt)
+    return size
+
+
+def write_task_record(buffer, index, task, module_index, function_index, delta_sec):
+    index = write_varint(buffer, index, _task_flags(task))
+    index = write_varint(buffer, index, module_index)
+    index = write_varint(buffer, index, function_index)
+    index = write_varint(buffer, index, delta_sec)
+    index = write_varint(buffer, index, task.repeat_after_sec)
+    if task.tolerance_sec:
+        index = write_varint(buffer, index, task.tolerance_sec)
+    if task.ms or task.repeat_after_ms:
+        index = write_varint(buffer, index, task.ms)
+        index = write_varint(buffer, index, task.repeat_after_ms)
+    if task.catch_up:
+        index = write_varint(buffer, index, task.catch_up)
+    if task.cron:
+        for mask, maximum in zip(task.cron, sl._CRON_MAXIMUMS):
+            index = write_varint(buffer, index, _cron_stored_mask(mask, maximum))
+    if task.budget_ms:
+        index = write_varint(buffer, index, task.budget_ms)
+        index = write_varint(buffer, index, task.backoff_sec)
+    if task.retry_attempts:
+        index = write_varint(buffer, index, task.retry_attempts)
+        index = write_varint(buffer, index, task.retry_delay_sec)
+        index = write_varint(buffer, index, task.retry_multiplier)
+        index = write_varint(buffer, index, task.attempt)
+    return index
+
+
+def _cron_stored_mask(mask, maximum):
+    # a field that allows all values is stored as 0 what takes a single byte
+    return 0 if mask == sl._cron_full_mask(maximum) else mask
+
+
+def string_index(strings, string_indexes, string):
+    index = string_indexes.get(string)
+    if index is None:
+        index = len(strings)
+        string_indexes[string] = index
+        strings.append(string)
+    return index
+
+
+def encoded_string(string):
+    encoded = _encoded_strings.get(string)
+    if encoded is None:
+        encoded = string.encode()
+        _encoded_strings[string] = encoded
+    return encoded
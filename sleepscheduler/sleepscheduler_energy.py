@@ -0,0 +1,29 @@
+# Energy report of sleepscheduler.get_energy(), imported by sleepscheduler when it is called so
+# that the module is not compiled otherwise. The time is accounted by sleepscheduler itself.
+import sleepscheduler as sl
+
+
+def get_energy():
+    sl._account_energy(sl._ENERGY_IDLE)
+    energy_ms = sl._energy_ms
+    total_ms = sum(energy_ms)
+    mah = (energy_ms[sl._ENERGY_EXECUTING] * sl.current_executing_ma + energy_ms[sl._ENERGY_IDLE] * sl.current_idle_ma +
+           energy_ms[sl._ENERGY_SLEEP] * sl.current_sleep_ma + energy_ms[sl._ENERGY_DEEP_SLEEP] * sl.current_deep_sleep_ma) / 3600000
+    return {"boots": sl._boots, "executing_ms": energy_ms[sl._ENERGY_EXECUTING], "idle_ms": energy_ms[sl._ENERGY_IDLE],
+            "sleep_ms": energy_ms[sl._ENERGY_SLEEP], "deep_sleep_ms": energy_ms[sl._ENERGY_DEEP_SLEEP],
+            "total_ms": total_ms, "mah": mah, "average_ma": mah * 3600000 / total_ms if total_ms else 0}
+
+
+def reset_energy():
+    sl._account_energy(sl._ENERGY_IDLE)
+    for state in range(len(sl._energy_ms)):
+        sl._energy_ms[state] = 0
+    sl._boots = 0
+
+
+def print_energy():
+    energy = get_energy()
+    print("sleepscheduler: print_energy() { \"boots\": " + str(energy["boots"]) + ", \"executing_ms\": " + str(energy["executing_ms"]) +
+          ", \"idle_ms\": " + str(energy["idle_ms"]) + ", \"sleep_ms\": " + str(energy["sleep_ms"]) +
+          ", \"deep_sleep_ms\": " + str(energy["deep_sleep_ms"]) + ", \"mah\": " + str(energy["mah"]) +
+          ", \"average_ma\": " + str(energy["average_ma"]) + "}")
@@ -0,0 +1,74 @@
+# RTC memory formats of older versions, imported by sleepscheduler when it restores one of them
+# once after an update so that the module is not compiled otherwise.
+import sleepscheduler as sl
+
+
+def decode_tasks(bytes, version):
+    if version == 0:
+        _decode_tasks_v0(bytes)
+        return
+    bytes = memoryview(bytes)
+    if not sl._crc_matches(bytes):
+        return
+    sl._read_index = sl._RTC_HEADER_SIZE
+    strings = sl._read_strings(bytes)
+    # the tasks before the state until version 4
+    seconds_since_epoch = 0
+    for _ in range(sl._read_varint(bytes)):
+        task = sl._read_task_record(bytes, strings, seconds_since_epoch)
+        seconds_since_epoch = task.seconds_since_epoch
+        sl._push_task(task)
+    if version >= 2:
+        sl._restore_rtc_sections(sl._read_sections(bytes), strings)
+    if version >= 3:
+        sl._read_ring_buffers(bytes, strings)
+    if version >= 4:
+        sl._read_slot_groups(bytes, strings)
+    # restore potential rtc_memory_bytes
+    sl.rtc_memory_bytes = bytearray(bytes[sl._read_index:])
+    sl._update_deferred_sec()
+
+
+def _decode_task_v0(bytes, start_index, tasks):
+    for i in range(start_index, len(bytes)):
+        if bytes[i] == 0:
+            module_name = bytes[start_index:i].decode()
+            end_index = i + 1  # +1 for \0
+            break
+
+    start_index = end_index
+    for i in range(start_index, len(bytes)):
+        if bytes[i] == 0:
+            function_name = bytes[start_index:i].decode()
+            end_index = i + 1  # +1 for \0
+            break
+
+    start_index = end_index
+    end_index = start_index + 4
+    seconds_since_epoch = int.from_bytes(bytes[start_index:end_index], 'big')
+
+    start_index = end_index
+    end_index = start_index + 4
+    repeat_after_sec = int.from_bytes(bytes[start_index:end_index], 'big')
+
+    task = sl.Task(module_name, function_name,
+                   seconds_since_epoch, repeat_after_sec)
+    tasks.append(task)
+    return end_index
+
+
+def _decode_tasks_v0(bytes):
+    # format used before version 1
+    sl._log(sl.LOG_LEVEL_INFO, "Restore legacy RTC memory format")
+    task_count = int.from_bytes(bytes[0:4], 'big')
+
+    tasks = list()
+    start_index = 4
+    for _ in range(0, task_count):
+        start_index = _decode_task_v0(bytes, start_index, tasks)
+
+    for task in tasks:
+        sl._push_task(task)
+
+    # restore potential rtc_memory_bytes
+    sl.rtc_memory_bytes = bytearray(bytes[start_index:len(bytes)])
@@ -0,0 +1,234 @@
+# Tasks that do not fit into the RTC memory, imported by sleepscheduler when overflow_file is
+# written or read so that the module is not compiled otherwise.
+try:
+    import binascii
+except ImportError:
+    import ubinascii as binascii
+try:
+    import struct
+except ImportError:
+    import ustruct as struct
+try:
+    import os
+except ImportError:
+    import uos as os
+import sleepscheduler as sl
+import sleepscheduler_encode
+
+_CHUNK_HEADER_SIZE = 12
+_FILL_PERCENT = 75
+"""Moving tasks to overflow_file fills the RTC memory up to this percentage. The rest is left for
+the tasks scheduled later so that not every wake writes to the file."""
+
+
+def spill_tasks(bytes):
+    # Moves the tasks due last to overflow_file until the others fill the RTC memory up to
+    # _FILL_PERCENT and returns their encoding. encode_tasks() sorted the tasks,
+    # so the kept ones remain a valid heap.
+    if sl._pending_count:
+        # the tasks due last may be in records that were not decoded
+        sl._decode_pending_tasks()
+        bytes = sleepscheduler_encode.encode_tasks()
+    fill_bytes = sl.RTC_MEMORY_SIZE * _FILL_PERCENT // 100
+    excess_bytes = len(bytes) - fill_bytes
+    end = len(sl._tasks)
+    while end > 0:
+        index = end
+        while index > 0 and excess_bytes > 0:
+            index = index - 1
+            task = sl._tasks[index][3]
+            if not task.cancelled:
+                excess_bytes = excess_bytes - sleepscheduler_encode.task_record_size(
+                    task, sl._string_table_indexes[task.module_name], sl._string_table_indexes[task.function_name],
+                    task.seconds_since_epoch - (sl._tasks[index - 1][0] if index else 0))
+        # tasks of the same second stay together, so all tasks in the file are due at or after it
+        while index > 0 and sl._tasks[index - 1][0] == sl._tasks[index][0]:
+            index = index - 1
+        spilled = []
+        for entry in sl._tasks[index:end]:
+            task = entry[3]
+            if task.cancelled:
+                sl._cancelled_task_count = sl._cancelled_task_count - 1
+            else:
+                sl._remove_from_indexes(task)
+                spilled.append(task)
+        if index < end:
+            if sl._overflow_sec is None or sl._tasks[index][0] < sl._overflow_sec:
+                sl._overflow_sec = sl._tasks[index][0]
+                sl._update_deferred_sec()
+            del sl._tasks[index:end]
+            if spilled:
+                sl._overflow_task_count = sl._overflow_task_count + len(spilled)
+                # appending does not rewrite the chunks of earlier deep sleeps
+                with open(sl.overflow_file, "ab") as f:
+                    sl._overflow_size = sl._overflow_size + _write_chunk(f, spilled)
+            sl._log(sl.LOG_LEVEL_INFO, "Moved {} tasks to {}", len(spilled), sl.overflow_file)
+        end = index
+        # the kept tasks are encoded again as strings may not be used anymore and the section changed
+        bytes = sleepscheduler_encode.encode_tasks()
+        excess_bytes = len(bytes) - fill_bytes
+        if excess_bytes <= 0:
+            break
+    return bytes
+
+
+def _write_chunk(f, tasks):
+    # Writes a chunk of the CRC32 and length of the encoded tasks and the time of the first task,
+    # followed by the string count, the strings, the task count and the task records like in RTC
+    # memory. The tasks are sorted. Returns the length of the chunk.
+    strings = []
+    string_indexes = {}
+    size = 0
+    previous_seconds_since_epoch = 0
+    for task in tasks:
+        size = size + sleepscheduler_encode.task_record_size(
+            task,
+            sleepscheduler_encode.string_index(strings, string_indexes, task.module_name),
+            sleepscheduler_encode.string_index(strings, string_indexes, task.function_name),
+            task.seconds_since_epoch - previous_seconds_since_epoch)
+        previous_seconds_since_epoch = task.seconds_since_epoch
+    size = size + sleepscheduler_encode.varint_size(len(strings)) + sleepscheduler_encode.varint_size(len(tasks))
+    for string in strings:
+        length = len(sleepscheduler_encode.encoded_string(string))
+        size = size + sleepscheduler_encode.varint_size(length) + length
+
+    buffer = bytearray(_CHUNK_HEADER_SIZE + size)
+    index = sleepscheduler_encode.write_varint(buffer, _CHUNK_HEADER_SIZE, len(strings))
+    for string in strings:
+        encoded = sleepscheduler_encode.encoded_string(string)
+        index = sleepscheduler_encode.write_varint(buffer, index, len(encoded))
+        buffer[index:index + len(encoded)] = encoded
+        index = index + len(encoded)
+    index = sleepscheduler_encode.write_varint(buffer, index, len(tasks))
+    previous_seconds_since_epoch = 0
+    for task in tasks:
+        index = sleepscheduler_encode.write_task_record(buffer, index, task,
+                                                        string_indexes[task.module_name],
+                                                        string_indexes[task.function_name],
+                                                        task.seconds_since_epoch - previous_seconds_since_epoch)
+        previous_seconds_since_epoch = task.seconds_since_epoch
+    struct.pack_into(">III", buffer, 0, binascii.crc32(
+        memoryview(buffer)[_CHUNK_HEADER_SIZE:]), size, tasks[0].seconds_since_epoch)
+    f.write(buffer)
+    return len(buffer)
+
+
+def _headers(f):
+    # (seconds_since_epoch of the first task, offset, length) of the chunks of overflow_file,
+    # only the headers are read
+    headers = []
+    offset = 0
+    while offset < sl._overflow_size:
+        f.seek(offset)
+        header = f.read(_CHUNK_HEADER_SIZE)
+        if len(header) < _CHUNK_HEADER_SIZE:
+            break
+        _, size, seconds_since_epoch = struct.unpack(">III", header)
+        headers.append((seconds_since_epoch, offset, _CHUNK_HEADER_SIZE + size))
+        offset = offset + _CHUNK_HEADER_SIZE + size
+    return headers
+
+
+def _read_chunk(f, offset):
+    # Decodes the tasks of the chunk at offset without the ones that were removed by name
+    # after it was written, None when it is corrupt.
+    f.seek(offset)
+    header = f.read(_CHUNK_HEADER_SIZE)
+    if len(header) < _CHUNK_HEADER_SIZE:
+        return None
+    crc, size, _ = struct.unpack(">III", header)
+    chunk = f.read(size)
+    if len(chunk) < size or binascii.crc32(chunk) != crc:
+        sl._log(sl.LOG_LEVEL_ERROR, "ERROR: {} is corrupt, CRC does not match", sl.overflow_file)
+        return None
+    sl._read_index = 0
+    strings = []
+    for _ in range(sl._read_varint(chunk)):
+        length = sl._read_varint(chunk)
+        strings.append(str(chunk[sl._read_index:sl._read_index + length], "utf-8"))
+        sl._read_index = sl._read_index + length
+    tasks = []
+    seconds_since_epoch = 0
+    for _ in range(sl._read_varint(chunk)):
+        task = sl._read_task_record(chunk, strings, seconds_since_epoch)
+        seconds_since_epoch = task.seconds_since_epoch
+        if not sl._overflow_removals or not _is_removed(task, offset):
+            tasks.append(task)
+    return tasks
+
+
+def _is_removed(task, offset):
+    for key in ((task.module_name, task.function_name), (None, task.function_name), (task.module_name, None)):
+        if sl._overflow_removals.get(key, 0) > offset:
+            return True
+    return False
+
+
+def load(until_sec=None):
+    # Pushes the tasks of the chunks of overflow_file that are due first, all chunks with tasks due
+    # until until_sec and more while they fit into the free RTC memory. The other chunks are written
+    # to a new file. Called when the tasks in RTC memory are done. None loads all chunks.
+    if sl._overflow_sec is None:
+        return
+    sl._log(sl.LOG_LEVEL_INFO, "Load tasks from {}", sl.overflow_file)
+    free_bytes = sl.RTC_MEMORY_SIZE * _FILL_PERCENT // 100 - sl._stored_size
+    kept = []
+    try:
+        with open(sl.overflow_file, "rb") as f:
+            # one chunk at a time in the order of their first task to not read the whole file into memory
+            headers = _headers(f)
+            headers.sort()
+            loaded = 0
+            for seconds_since_epoch, offset, size in headers:
+                if kept or (loaded and until_sec is not None and seconds_since_epoch > until_sec
+                            and size > free_bytes):
+                    kept.append(offset)
+                    continue
+                tasks = _read_chunk(f, offset)
+                if tasks:
+                    for task in tasks:
+                        sl._push_task(task)
+                    loaded = loaded + 1
+                free_bytes = free_bytes - size
+            if kept:
+                sl._overflow_sec, sl._overflow_task_count, sl._overflow_size = _rewrite(f, kept)
+    except OSError as e:
+        sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Cannot load tasks from {} due to '{}'", sl.overflow_file, e)
+        kept = []
+    sl._overflow_removals.clear()
+    if kept and sl._overflow_sec is not None:
+        sl._log(sl.LOG_LEVEL_INFO, "Kept {} tasks in {}", sl._overflow_task_count, sl.overflow_file)
+        os.remove(sl.overflow_file)
+        os.rename(sl.overflow_file + ".tmp", sl.overflow_file)
+    else:
+        sl._overflow_sec = None
+        sl._overflow_task_count = 0
+        sl._overflow_size = 0
+        sl._remove_overflow_file()
+    sl._update_deferred_sec()
+
+
+def _rewrite(f, offsets):
+    # Writes the chunks at the offsets without the removed tasks to overflow_file + ".tmp".
+    # Returns the overflow values of the new file, the first is None when it has no tasks.
+    first_sec = None
+    task_count = 0
+    size = 0
+    with open(sl.overflow_file + ".tmp", "wb") as out:
+        for offset in offsets:
+            tasks = _read_chunk(f, offset)
+            if tasks:
+                if first_sec is None or tasks[0].seconds_since_epoch < first_sec:
+                    first_sec = tasks[0].seconds_since_epoch
+                task_count = task_count + len(tasks)
+                size = size + _write_chunk(out, tasks)
+    return first_sec, task_count, size
+
+
+def chunks():
+    # Yields the decoded tasks of each chunk of overflow_file without loading them.
+    with open(sl.overflow_file, "rb") as f:
+        for _, offset, _ in _headers(f):
+            tasks = _read_chunk(f, offset)
+            if tasks:
+                yield tasks
@@ -0,0 +1,115 @@
+# Prediction of the wakes of sleepscheduler.plan() and sleepscheduler.print_plan(), imported
+# by sleepscheduler when they are called so that the module is not compiled otherwise.
+try:
+    import heapq
+except ImportError:
+    import uheapq as heapq
+import sleepscheduler as sl
+
+
+def plan(horizon_sec, max_wakes):
+    now_ms = sl._epoch_ms()
+    end_ms = now_ms + horizon_sec * 1000
+    # copies of the tasks as they are advanced
+    tasks = []
+    executions = 0
+    for task in _planned_tasks():
+        copy = sl._copy_task(task)
+        tasks.append((copy.seconds_since_epoch, copy.ms, len(tasks), copy))
+        executions = executions + _count_executions(sl._copy_task(task), now_ms, end_ms)
+    heapq.heapify(tasks)
+    sequence = len(tasks)
+    cold_boot_end_sec = None
+    if sl._cold_boot_remaining_sec() > 0:
+        cold_boot_end_sec = sl._start_seconds_since_epoch + sl.initial_deep_sleep_delay_sec
+    threshold_sec = sl._deep_sleep_threshold_sec()
+    lead_ms = sl._wakeup_lead_ms()
+
+    wakes = []
+    deep_sleeps = 0
+    complete = True
+    wake_tasks = None
+    wake_ms = None
+    deep_sleep = False
+    while tasks:
+        first_task = tasks[0][3]
+        if sl._task_due_ms(first_task) <= now_ms:
+            if wake_ms != now_ms and len(wakes) >= max_wakes:
+                complete = False
+                break
+            heapq.heappop(tasks)
+            if sl._is_repeating(first_task):
+                execute = sl._reschedule_task(first_task, now_ms)
+                heapq.heappush(tasks, (first_task.seconds_since_epoch, first_task.ms, sequence, first_task))
+                sequence = sequence + 1
+                if not execute:
+                    continue
+            if wake_ms != now_ms:
+                wake_ms = now_ms
+                wake_tasks = []
+                wakes.append((now_ms // 1000, now_ms % 1000, deep_sleep, wake_tasks))
+                deep_sleep = False
+            wake_tasks.append((first_task.module_name, first_task.function_name))
+            continue
+
+        next_wake_ms = sl._coalesced_wake_ms(first_task, tasks)
+        if next_wake_ms >= end_ms:
+            break
+        if cold_boot_end_sec is not None and now_ms // 1000 >= cold_boot_end_sec:
+            cold_boot_end_sec = None
+        time_until_sec = next_wake_ms // 1000 - now_ms // 1000
+        if sl.allow_deep_sleep and time_until_sec > threshold_sec:
+            if cold_boot_end_sec is None:
+                # the scheduler starts again when the estimated latency passed after the requested
+                # time and executes the tasks that are due by then
+                deep_sleeps = deep_sleeps + 1
+                deep_sleep = True
+                now_ms = max(now_ms + 1, next_wake_ms - lead_ms) + sl._wakeup_latency_ms
+                continue
+            # sleep until deep sleep is allowed or a second before the wake and decide again
+            now_ms = now_ms + min(cold_boot_end_sec - now_ms // 1000, time_until_sec - 1) * 1000
+            continue
+        now_ms = next_wake_ms
+    return {"wakes": wakes, "wake_count": len(wakes) if complete else None,
+            "deep_sleeps": deep_sleeps if complete else None, "executions": executions}
+
+
+def print_plan(horizon_sec, max_wakes):
+    result = plan(horizon_sec, max_wakes)
+    for seconds_since_epoch, ms, deep_sleep, tasks in result["wakes"]:
+        print("sleepscheduler: print_plan() { \"seconds_since_epoch\": " + str(seconds_since_epoch) + ", \"ms\": " + str(ms) +
+              ", \"deep_sleep\": " + str(deep_sleep) + ", \"tasks\": \"" +
+              ", ".join([module_name + "." + function_name for module_name, function_name in tasks]) + "\"}")
+    print("sleepscheduler: print_plan() { \"wake_count\": " + str(result["wake_count"]) + ", \"deep_sleeps\": " + str(result["deep_sleeps"]) +
+          ", \"executions\": " + str(result["executions"]) + "}")
+
+
+def _count_executions(task, now_ms, end_ms):
+    # executions of the task that are due before end_ms, the task is advanced
+    if not sl._is_repeating(task):
+        return 1 if sl._task_due_ms(task) < end_ms else 0
+    count = 0
+    while sl._task_due_ms(task) <= now_ms:
+        # due now, like in _dispatch_first_task() according to the catch-up policy
+        if sl._reschedule_task(task, now_ms):
+            count = count + 1
+    due_ms = sl._task_due_ms(task)
+    if due_ms >= end_ms:
+        return count
+    if task.cron:
+        import sleepscheduler_cron
+        return count + sleepscheduler_cron.count(task.cron, (end_ms - 1) // 1000 + 1) - sleepscheduler_cron.count(task.cron, due_ms // 1000)
+    return count + (end_ms - 1 - due_ms) // sl._task_period_ms(task) + 1
+
+
+def _planned_tasks():
+    # the scheduled tasks and the ones in overflow_file, which is read without loading it
+    tasks = sl._sorted_tasks()
+    if sl._overflow_sec is not None:
+        import sleepscheduler_overflow
+        try:
+            for chunk_tasks in sleepscheduler_overflow.chunks():
+                tasks.extend(chunk_tasks)
+        except OSError as e:
+            sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Cannot read tasks from {} due to '{}'", sl.overflow_file, e)
+    return tasks
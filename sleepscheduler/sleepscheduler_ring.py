@@ -0,0 +1,112 @@
+# Ring buffers of sleepscheduler.ring_buffer(), imported by sleepscheduler when a ring buffer is
+# requested or restored so that the module is not compiled otherwise.
+try:
+    import struct
+except ImportError:
+    import ustruct as struct
+import sleepscheduler as sl
+
+
+class RingBuffer:
+    """Buffer of a fixed amount of records of a struct format, get it with ring_buffer().
+
+    Records are packed in place into a preallocated bytearray and read oldest first by index.
+    """
+
+    def __init__(self, name, record_format, capacity):
+        self.name = name
+        self.record_format = record_format
+        self.capacity = capacity
+        self.record_size = struct.calcsize(record_format)
+        self.buffer = bytearray(capacity * self.record_size)
+        # index of the oldest record and amount of records
+        self.start = 0
+        self.count = 0
+        # amount of records overwritten when full
+        self.dropped = 0
+        # task scheduled when the buffer is filled to flush_percent, see flush_when()
+        self.flush_percent = 0
+        self.flush_module_name = None
+        self.flush_function = None
+        self.flush_needs_network = False
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index = index + self.count
+        if not 0 <= index < self.count:
+            raise IndexError("ring buffer index out of range")
+        return struct.unpack_from(self.record_format, self.buffer,
+                                  (self.start + index) % self.capacity * self.record_size)
+
+    def append(self, *values):
+        """Appends a record with the given values, overwrites the oldest record when full.
+
+        Args:
+            values: Values of the record according to the format
+        Returns:
+            None
+        """
+        index = self.start + self.count
+        if self.count == self.capacity:
+            self.start = (self.start + 1) % self.capacity
+            self.dropped = self.dropped + 1
+        else:
+            self.count = self.count + 1
+        struct.pack_into(self.record_format, self.buffer,
+                         index % self.capacity * self.record_size, *values)
+        if self.flush_percent and self.count * 100 >= self.flush_percent * self.capacity:
+            self._schedule_flush()
+
+    def remove(self, count):
+        """Removes the given amount of the oldest records, e.g. after they were uploaded.
+
+        Args:
+            count (int): Amount of records to remove
+        Returns:
+            None
+        """
+        count = min(count, self.count)
+        self.start = (self.start + count) % self.capacity
+        self.count = self.count - count
+
+    def clear(self):
+        """Removes all records.
+
+        Args:
+            None
+        Returns:
+            None
+        """
+        self.start = 0
+        self.count = 0
+
+    def flush_when(self, percent, module_name, function, needs_network=False):
+        """Schedules a task immediately when an append fills the buffer to the given percentage.
+        The task is not scheduled again while it is scheduled.
+
+        Args:
+            percent (int): Percentage of the capacity, 0 to disable
+            module_name (str): Module where the function is defined
+            function (callable/str): Function to be called, e.g. to upload and remove the records
+            needs_network (bool): If the task needs the network, see set_needs_network()
+        Returns:
+            None
+        """
+        self.flush_percent = percent
+        self.flush_module_name = module_name
+        self.flush_function = function
+        self.flush_needs_network = needs_network
+
+    def _schedule_flush(self):
+        function_name = self.flush_function
+        if callable(function_name):
+            function_name = function_name.__name__
+        sl._decode_pending_tasks()
+        if sl._tasks_by_module_function.get((self.flush_module_name, function_name)):
+            return
+        task = sl.schedule_immediately(self.flush_module_name, self.flush_function)
+        if self.flush_needs_network:
+            sl.set_needs_network(task)
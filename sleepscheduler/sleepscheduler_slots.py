@@ -0,0 +1,82 @@
+# Typed fields of sleepscheduler.rtc_slots(), imported by sleepscheduler when they are requested
+# so that the module is not compiled otherwise. The bytes of the slots are stored by sleepscheduler.
+try:
+    import struct
+except ImportError:
+    import ustruct as struct
+try:
+    import uctypes
+except ImportError:
+    uctypes = None
+import sleepscheduler as sl
+
+_slot_buffers = []
+"""Bytearrays of all accessors returned by rtc_slots() that use uctypes."""
+_SLOT_TYPES = {"u8": ("B", 1), "i8": ("b", 1), "u16": ("H", 2), "i16": ("h", 2),
+               "u32": ("I", 4), "i32": ("i", 4), "float": ("f", 4)}
+"""struct format and size by slot type."""
+
+
+def rtc_slots(name, fields):
+    # checked before the group is replaced, so that a typo does not reset the stored values
+    for field_name, field_type in fields:
+        if field_type not in _SLOT_TYPES:
+            raise ValueError("invalid type '{}' of field '{}' of slots '{}'".format(field_type, field_name, name))
+    layout = ",".join([field_name + ":" + field_type for field_name, field_type in fields])
+    group = sl._slot_groups.get(name)
+    if group is None or group[0] != layout:
+        if group is not None:
+            sl._log(sl.LOG_LEVEL_INFO, "Fields of slots '{}' changed, values reset", name)
+        group = [layout, None, None]
+        sl._slot_groups[name] = group
+    offsets = {}
+    size = 0
+    for field_name, field_type in fields:
+        field_size = _SLOT_TYPES[field_type][1]
+        # aligned to the size of the field
+        size = (size + field_size - 1) // field_size * field_size
+        offsets[field_name] = (field_type, size)
+        size = size + field_size
+    if group[1] is None or len(group[1]) != size:
+        group[1] = bytearray(size)
+    if group[2] is None:
+        group[2] = _slots_accessor(group[1], offsets)
+    return group[2]
+
+
+def _slots_accessor(buffer, offsets):
+    if uctypes is None:
+        return _StructSlots(buffer, offsets)
+    uctypes_types = {"u8": uctypes.UINT8, "i8": uctypes.INT8, "u16": uctypes.UINT16, "i16": uctypes.INT16,
+                     "u32": uctypes.UINT32, "i32": uctypes.INT32, "float": uctypes.FLOAT32}
+    layout = {}
+    for field_name, (field_type, offset) in offsets.items():
+        layout[field_name] = uctypes_types[field_type] | offset
+    # The struct only keeps the address, so the bytearray is kept alive for accessors that are
+    # still in use after their slots were replaced or removed.
+    _slot_buffers.append(buffer)
+    return uctypes.struct(uctypes.addressof(buffer), layout, uctypes.LITTLE_ENDIAN)
+
+
+class _StructSlots:
+    # fields of rtc_slots() read and written by struct where uctypes is not available
+
+    def __init__(self, buffer, offsets):
+        object.__setattr__(self, "_buffer", buffer)
+        # (format, offset) per field so that an access does not allocate the format
+        fields = {}
+        for field_name, (field_type, offset) in offsets.items():
+            fields[field_name] = ("<" + _SLOT_TYPES[field_type][0], offset)
+        object.__setattr__(self, "_fields", fields)
+
+    def __getattr__(self, name):
+        field = self._fields.get(name)
+        if field is None:
+            raise AttributeError(name)
+        return struct.unpack_from(field[0], self._buffer, field[1])[0]
+
+    def __setattr__(self, name, value):
+        field = self._fields.get(name)
+        if field is None:
+            raise AttributeError(name)
+        struct.pack_into(field[0], self._buffer, field[1], value)
@@ -0,0 +1,35 @@
+# Statistics of the executed tasks of sleepscheduler.get_task_stats(), imported by sleepscheduler
+# when they are requested or restored from the RTC memory so that the module is not compiled
+# otherwise. The runs are recorded by sleepscheduler itself.
+import sleepscheduler as sl
+
+
+def get_task_stats(module_name, function):
+    if callable(function):
+        function_name = function.__name__
+    else:
+        function_name = function
+    stats = sl._task_stats.get((module_name, function_name))
+    if stats is None:
+        return None
+    return {"runs": stats[0], "failures": stats[1], "total_ms": stats[2], "max_ms": stats[3], "last_ms": stats[4],
+            "late_total_ms": stats[5], "late_max_ms": stats[6], "last_late_ms": stats[7], "overruns": stats[8]}
+
+
+def print_task_stats():
+    for (module_name, function_name), stats in sl._task_stats.items():
+        print("sleepscheduler: print_task_stats() { \"module_name\": \"" + module_name + "\", \"function_name\": \"" + function_name +
+              "\", \"runs\": " + str(stats[0]) + ", \"failures\": " + str(stats[1]) +
+              ", \"total_ms\": " + str(stats[2]) + ", \"max_ms\": " + str(stats[3]) + ", \"last_ms\": " + str(stats[4]) +
+              ", \"late_total_ms\": " + str(stats[5]) + ", \"late_max_ms\": " + str(stats[6]) + ", \"last_late_ms\": " + str(stats[7]) +
+              ", \"overruns\": " + str(stats[8]) + "}")
+
+
+def restore(values, strings):
+    # the TASK_STATS section, entries of the module and function index and the stored amount of values
+    stats_size = values[0]
+    entry_size = 2 + stats_size
+    for i in range(1, len(values) - entry_size + 1, entry_size):
+        stats = values[i + 2:i + 2 + min(stats_size, sl._TASK_STATS_SIZE)]
+        sl._task_stats[(strings[values[i]], strings[values[i + 1]])] = stats + \
+            [0] * (sl._TASK_STATS_SIZE - len(stats))
@@ -0,0 +1,110 @@
+# Connection to the network of the tasks that need it and the early execution of those due while
+# connected, imported by sleepscheduler when such a task executes so that the module is not
+# compiled otherwise.
+import utime
+import sleepscheduler as sl
+
+
+def _ip_to_int(ip):
+    value = 0
+    for part in ip.split("."):
+        value = (value << 8) | int(part)
+    return value
+
+
+def _int_to_ip(value):
+    return ".".join([str((value >> shift) & 0xFF) for shift in (24, 16, 8, 0)])
+
+
+def _scan_access_point(wlan):
+    # the access point of wlan_ssid with the strongest signal as (bssid, channel) ints
+    best = None
+    for ssid, bssid, channel, rssi, *_ in wlan.scan():
+        if ssid == sl.wlan_ssid.encode() and (best is None or rssi > best[2]):
+            best = (int.from_bytes(bssid, "big"), channel, rssi)
+    return best
+
+
+def _wait_connected(wlan):
+    deadline_ms = utime.ticks_add(utime.ticks_ms(), sl.wlan_connect_timeout_sec * 1000)
+    while not wlan.isconnected():
+        if utime.ticks_diff(deadline_ms, utime.ticks_ms()) <= 0:
+            return False
+        utime.sleep_ms(50)
+    return True
+
+
+def connect():
+    # connects once per wake, a failed connect is tried again by the next task that needs the network
+    if sl._wlan is not None and sl._wlan.isconnected():
+        return
+    if sl.wlan_ssid is None:
+        sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Cannot connect to the network, wlan_ssid is not set.")
+        return
+    try:
+        import network
+    except ImportError:
+        sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Cannot connect to the network, module 'network' not found.")
+        return
+    wlan = network.WLAN(network.STA_IF)
+    wlan.active(True)
+    sl._wlan = wlan
+    if wlan.isconnected():
+        return
+    if not sl._wlan_cache[0]:
+        access_point = _scan_access_point(wlan)
+        if access_point:
+            sl._wlan_cache[0:2] = access_point[0:2]
+    if sl.reuse_wlan_ip and sl._wlan_cache[2]:
+        wlan.ifconfig(tuple([_int_to_ip(value) for value in sl._wlan_cache[2:6]]))
+    sl._log(sl.LOG_LEVEL_INFO, "Connect to '{}'", sl.wlan_ssid)
+    if sl._wlan_cache[0]:
+        wlan.connect(sl.wlan_ssid, sl.wlan_password, bssid=sl._wlan_cache[0].to_bytes(6, "big"))
+        if not _wait_connected(wlan):
+            # the access point or the address may have changed
+            sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Cannot connect to cached access point, connect without.")
+            sl._wlan_cache[0:6] = [0, 0, 0, 0, 0, 0]
+            wlan.disconnect()
+            if sl.reuse_wlan_ip:
+                wlan.ifconfig("dhcp")
+            wlan.connect(sl.wlan_ssid, sl.wlan_password)
+            _wait_connected(wlan)
+    else:
+        wlan.connect(sl.wlan_ssid, sl.wlan_password)
+        _wait_connected(wlan)
+    if wlan.isconnected():
+        if not sl._wlan_cache[2]:
+            sl._wlan_cache[2:6] = [_ip_to_int(ip) for ip in wlan.ifconfig()]
+    else:
+        sl._log(sl.LOG_LEVEL_ERROR, "ERROR: Cannot connect to '{}' within {} s.", sl.wlan_ssid, sl.wlan_connect_timeout_sec)
+
+
+def _network_task_index(now_ms):
+    # Index of the first task that needs the network and is due within network_group_sec while
+    # connected or -1. Like in _coalesced_wake_ms(), sub-trees of entries due later are skipped.
+    if not sl._wlan.isconnected():
+        return -1
+    until_ms = now_ms + sl.network_group_sec * 1000
+    sl._decode_pending_tasks(until_ms // 1000)
+    tasks = sl._tasks
+    best_index = -1
+    pending = [0]
+    while pending:
+        i = pending.pop()
+        entry = tasks[i]
+        if entry[0] * 1000 + entry[1] > until_ms:
+            continue
+        if entry[3].needs_network and not entry[3].cancelled and (best_index < 0 or entry < tasks[best_index]):
+            best_index = i
+        for child in (2 * i + 1, 2 * i + 2):
+            if child < len(tasks):
+                pending.append(child)
+    return best_index
+
+
+def dispatch_early_task(first_task, start_coroutine=None):
+    index = _network_task_index(sl._epoch_ms())
+    if index < 0:
+        return False
+    sl._dispatch_first_task(first_task, start_coroutine, index)
+    return True
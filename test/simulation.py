@@ -0,0 +1,57 @@
+# Helper of the host tests that run sleepscheduler in the simulator
+#
+# The tests write a main.py and the modules of their tasks to a temporary
+# directory and simulate them from power on with the virtual clock. The tasks
+# print what they observe and the tests check the output:
+#
+# python3 -m unittest discover -s test -p "test_*.py"
+# python3 -m pytest test
+
+import os
+import sys
+import tempfile
+import textwrap
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIR = os.path.dirname(TEST_DIR)
+sys.path.insert(0, os.path.join(REPOSITORY_DIR, "simulator"))
+import simulator  # noqa: E402
+
+
+def simulate(main_source, modules=None, duration_sec=None, start_sec=0, wakeup_latency_ms=0):
+    """Simulate main_source as main.py from power on with its output suppressed.
+
+    Args:
+        main_source (str): Source of main.py, it is dedented
+        modules (dict): Source of the modules next to main.py by module name
+        duration_sec (int): Seconds to simulate, None until main.py returns
+        start_sec (int): Seconds since epoch of the clock at power on
+        wakeup_latency_ms (int): Time added to the clock when waking up from deep sleep
+    Returns:
+        dict: The result of simulator.run() with the output of main.py
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        sources = dict(modules or {})
+        sources["main"] = main_source
+        for name, source in sources.items():
+            with open(os.path.join(directory, name + ".py"), "w") as f:
+                f.write(textwrap.dedent(source))
+        return simulator.run(os.path.join(directory, "main.py"), duration_sec, start_sec,
+                             wakeup_latency_ms, quiet=True)
+
+
+def records(result, tag):
+    """Return the values of the output lines that start with the tag.
+
+    Args:
+        result (dict): Result of simulate()
+        tag (str): First word of the lines, e.g. "RUN"
+    Returns:
+        list: The other words of each line as tuple of ints where possible
+    """
+    values = []
+    for line in result["output"].splitlines():
+        words = line.split()
+        if words and words[0] == tag:
+            values.append(tuple([int(word) if word.lstrip("-").isdigit() else word for word in words[1:]]))
+    return values
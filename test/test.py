@@ -4,6 +4,8 @@ import utime
 
 INITIAL_DEEP_SLEEP_DELAY = 20
 set_on_cold_boot = False
+# execution times kept during deep sleep
+times = sl.ring_buffer("test_times", ">I", 32)
 
 
 def init_on_cold_boot():
@@ -103,13 +105,23 @@ def finish_test():
                 INITIAL_DEEP_SLEEP_DELAY, 28, 29, 42, 49, 56, 58, 60, 60]
     results = []
 
+    for i in range(len(times)):
+        results.append(times[i][0])
+
+    failure = False
+    # rtc_memory_bytes is kept during deep sleep as well
     index = 0
     while index < len(sl.rtc_memory_bytes):
         result = int.from_bytes(sl.rtc_memory_bytes[index:index + 4], 'big')
-        results.append(result)
+        if index // 4 >= len(results) or results[index // 4] != result:
+            failure = True
+            print("TEST_ERROR rtc_memory_bytes differs at index '{}', was '{}'".format(
+                index // 4, result))
         index = index + 4
-
-    failure = False
+    if index // 4 != len(results):
+        failure = True
+        print("TEST_ERROR Wrong amount of times in rtc_memory_bytes. Expected '{}', was '{}'".format(
+            len(results), index // 4))
     if len(expected) == len(results):
         for i in range(len(expected)):
             if expected[i] != results[i]:
@@ -134,5 +146,6 @@ def finish_test():
 
 
 def store_current_time():
+    times.append(utime.time())
     bytes = utime.time().to_bytes(4, 'big')
     sl.rtc_memory_bytes = sl.rtc_memory_bytes + bytes
@@ -0,0 +1,78 @@
+# Host test of run_forever_async() with coroutine tasks on the virtual clock of the simulator
+#
+# python3 test/test_async.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+import uasyncio
+import utime
+
+
+async def measure():
+    print("START measure", utime.time())
+    await uasyncio.sleep(3)
+    print("END measure", utime.time())
+
+
+async def hang():
+    print("START hang", utime.time())
+    await uasyncio.sleep(5)
+    print("END hang", utime.time())
+
+
+def plain():
+    print("RUN plain", utime.time())
+    utime.sleep_ms(200)
+
+
+def report():
+    for name in ("measure", "hang", "plain"):
+        stats = sl.get_task_stats("tasks", name)
+        print("STATS", name, stats["runs"], stats["total_ms"], stats["max_ms"], stats["overruns"])
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.measure, 10, 60)
+    sl.schedule_delayed("tasks", tasks.plain, 11, 60)
+    task = sl.schedule_delayed("tasks", tasks.hang, 30, 60)
+    sl.set_budget(task, 1000)
+    sl.schedule_delayed("tasks", tasks.report, 145)
+
+
+sl.store_task_stats = True
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever_async()
+"""
+
+
+class AsyncTest(unittest.TestCase):
+
+    def test_coroutines(self):
+        result = simulate(MAIN, {"tasks": TASKS}, 146)
+        self.assertGreater(result["deep_sleeps"], 0)
+        # the plain task runs while measure waits
+        self.assertEqual(records(result, "START"), [("measure", 10), ("hang", 30), ("measure", 70), ("hang", 90),
+                                                     ("measure", 130)])
+        self.assertEqual(records(result, "RUN"), [("plain", 11), ("plain", 71), ("plain", 131)])
+        # hang is cancelled when it reaches its budget
+        self.assertEqual(records(result, "END"), [("measure", 13), ("measure", 73), ("measure", 133)])
+
+    def test_stats(self):
+        # the coroutines are measured until they finished, not until they waited first
+        result = simulate(MAIN, {"tasks": TASKS}, 146)
+        self.assertEqual(records(result, "STATS"), [("measure", 3, 9000, 3000, 0), ("hang", 2, 2000, 1000, 2),
+                                                    ("plain", 3, 600, 200, 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
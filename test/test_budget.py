@@ -0,0 +1,119 @@
+# Host test of the time budgets of tasks, the order of due tasks by budget and the reset of
+# hung functions by the watchdog
+#
+# python3 test/test_budget.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+import utime
+
+
+def hang():
+    print("START hang", utime.time())
+    utime.sleep(5)
+    print("END hang", utime.time())
+
+
+def tick():
+    print("RUN tick", utime.time())
+
+
+def report():
+    stats = sl.get_task_stats("tasks", "hang")
+    print("STATS", stats["runs"], stats["overruns"], stats["max_ms"])
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.tick, 5, 10)
+    task = sl.schedule_delayed("tasks", tasks.hang, 10, 20)
+    sl.set_budget(task, 1000, 30)
+    sl.schedule_delayed("tasks", tasks.report, 99)
+
+
+sl.budget_watchdog = WATCHDOG
+sl.store_task_stats = True
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+ORDER_TASKS = """
+import sleepscheduler as sl
+import utime
+
+
+def large():
+    print("RUN large", utime.time())
+
+
+def unlimited():
+    print("RUN unlimited", utime.time())
+
+
+def small():
+    print("RUN small", utime.time())
+    if utime.time() >= 20:
+        sl.remove_all("tasks", small)
+"""
+
+ORDER_MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.set_budget(sl.schedule_delayed("tasks", tasks.large, 10, 10), 300)
+    sl.schedule_delayed("tasks", tasks.unlimited, 10, 10)
+    sl.set_budget(sl.schedule_delayed("tasks", tasks.small, 10, 10), 100)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+def _simulate(watchdog):
+    return simulate(MAIN.replace("WATCHDOG", str(watchdog)), {"tasks": TASKS}, 100)
+
+
+class BudgetTest(unittest.TestCase):
+
+    def test_watchdog(self):
+        # the hung function is reset after its budget and continues after the backoff,
+        # the other task runs on time and the cold boot is not repeated
+        result = _simulate(True)
+        self.assertEqual(result["watchdog_resets"], 3)
+        self.assertEqual(records(result, "START"), [("hang", 10), ("hang", 50), ("hang", 90)])
+        self.assertEqual(records(result, "END"), [])
+        self.assertEqual(records(result, "RUN"), [("tick", sec) for sec in range(5, 100, 10)])
+        self.assertEqual(records(result, "STATS"), [(3, 3, 1000)])
+        self.assertIn("exceeded its budget of 1000 ms and was reset", result["output"])
+
+    def test_without_watchdog(self):
+        # the overrun is only detected after the function returned
+        result = _simulate(False)
+        self.assertEqual(result["watchdog_resets"], 0)
+        self.assertEqual(records(result, "START"), [("hang", 10), ("hang", 50), ("hang", 90)])
+        self.assertEqual(records(result, "END"), [("hang", 15), ("hang", 55), ("hang", 95)])
+        self.assertEqual(records(result, "STATS"), [(3, 3, 5000)])
+
+    def test_smallest_budget_first(self):
+        # tasks without budget last, a task with a budget can remove itself while it executes
+        result = simulate(ORDER_MAIN, {"tasks": ORDER_TASKS}, 35)
+        self.assertEqual(records(result, "RUN"), [("small", 10), ("large", 10), ("unlimited", 10),
+                                                  ("small", 20), ("large", 20), ("unlimited", 20),
+                                                  ("large", 30), ("unlimited", 30)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+# Host test of cancelling single repeating tasks by the handles returned by the schedule functions
+#
+# python3 test/test_cancel.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+import utime
+
+handles = {}
+
+
+def tick():
+    print("RUN tick", utime.time())
+
+
+def stop():
+    print("RUN stop", utime.time())
+    sl.cancel(handles["fast"])
+    # a second cancel of the same handle does nothing
+    sl.cancel(handles["fast"])
+
+
+def once():
+    print("RUN once", utime.time())
+    if utime.time() >= 25:
+        # a repeating task cancels itself while it executes
+        sl.cancel(handles["once"])
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    tasks.handles["fast"] = sl.schedule_delayed("tasks", tasks.tick, 10, 10)
+    # the same function, only the handle of fast is cancelled
+    sl.schedule_delayed("tasks", tasks.tick, 15, 20)
+    tasks.handles["once"] = sl.schedule_delayed("tasks", tasks.once, 5, 10)
+    sl.schedule_delayed("tasks", tasks.stop, 35)
+
+
+# the handles are kept until the first deep sleep
+sl.initial_deep_sleep_delay_sec = 40
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+class CancelTest(unittest.TestCase):
+
+    def test_cancel(self):
+        result = simulate(MAIN, {"tasks": TASKS}, 100)
+        # in the same second, a rescheduled task executes after those scheduled before
+        self.assertEqual(records(result, "RUN"), [
+            ("once", 5), ("tick", 10), ("tick", 15), ("once", 15), ("tick", 20), ("once", 25),
+            ("tick", 30), ("stop", 35), ("tick", 35), ("tick", 55), ("tick", 75), ("tick", 95)])
+        # the cancelled tasks are not stored for the deep sleeps
+        self.assertEqual(result["deep_sleeps"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+# Host test of the catch-up policies of repeating tasks after the clock jumped forward
+#
+# python3 test/test_catch_up.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+import utime
+
+
+def run_all():
+    print("RUN run_all", utime.time())
+
+
+def run_once_then_align():
+    print("RUN run_once_then_align", utime.time())
+
+
+def skip():
+    print("RUN skip", utime.time())
+
+
+def jump():
+    # the clock is set forward while the tasks wait, e.g. by a time sync
+    if JUMP_ON_WAKE:
+        sl.rtc_memory_bytes = bytearray(b"jump")
+    else:
+        utime._advance_ns(JUMP_TO_SEC * 1000000000 - utime.time_ns())
+
+
+def jump_on_wake():
+    # after the import of sleepscheduler, which decoded only the tasks due until then
+    if sl.rtc_memory_bytes == b"jump":
+        sl.rtc_memory_bytes = bytearray()
+        utime._advance_ns(JUMP_TO_SEC * 1000000000 - utime.time_ns())
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+tasks.jump_on_wake()
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.run_all, 60, 60, catch_up=sl.CATCH_UP_RUN_ALL)
+    sl.schedule_delayed("tasks", tasks.run_once_then_align, 60, 60, catch_up=sl.CATCH_UP_RUN_ONCE_THEN_ALIGN)
+    sl.schedule_delayed("tasks", tasks.skip, 60, 60, catch_up=sl.CATCH_UP_SKIP)
+    sl.schedule_delayed("tasks", tasks.jump, JUMP_AT_SEC)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+def _simulate_jump(jump_at_sec, jump_to_sec, duration_sec, jump_on_wake=False):
+    tasks = TASKS.replace("JUMP_TO_SEC", str(jump_to_sec)).replace("JUMP_ON_WAKE", str(jump_on_wake))
+    main = MAIN.replace("JUMP_AT_SEC", str(jump_at_sec))
+    result = simulate(main, {"tasks": tasks}, duration_sec)
+    times = {"run_all": [], "run_once_then_align": [], "skip": []}
+    for name, seconds_since_epoch in records(result, "RUN"):
+        times[name].append(seconds_since_epoch)
+    return times, result
+
+
+class CatchUpTest(unittest.TestCase):
+
+    def test_jump_while_awake(self):
+        # the clock jumps from 150 to 750, the executions at 180 to 720 are missed
+        times, _ = _simulate_jump(150, 750, 900)
+        self.assertEqual(times["run_all"], [60, 120] + [750] * 10 + [780, 840])
+        self.assertEqual(times["run_once_then_align"], [60, 120, 750, 780, 840])
+        self.assertEqual(times["skip"], [60, 120, 780, 840])
+
+    def test_jump_during_deep_sleep(self):
+        # the wake for 180 sets the clock to 770, the policies are restored from the RTC memory
+        times, result = _simulate_jump(150, 770, 900, jump_on_wake=True)
+        self.assertGreater(result["deep_sleeps"], 0)
+        self.assertEqual(times["run_all"], [60, 120] + [770] * 10 + [780, 840])
+        self.assertEqual(times["run_once_then_align"], [60, 120, 770, 780, 840])
+        self.assertEqual(times["skip"], [60, 120, 780, 840])
+
+    def test_jump_within_period(self):
+        # no execution is missed, so all policies behave the same
+        times, _ = _simulate_jump(150, 170, 400)
+        expected = [60, 120, 180, 240, 300, 360]
+        self.assertEqual(times["run_all"], expected)
+        self.assertEqual(times["run_once_then_align"], expected)
+        self.assertEqual(times["skip"], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
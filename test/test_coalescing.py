@@ -0,0 +1,80 @@
+# Host test of the wakes shared by tasks with a tolerance and the count of the saved wakes
+#
+# python3 test/test_coalescing.py
+
+import re
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+import utime
+
+
+def first():
+    print("RUN first", utime.time())
+
+
+def second():
+    print("RUN second", utime.time())
+
+
+def alone():
+    print("RUN alone", utime.time())
+
+
+def report():
+    sl.print_saved_wakes()
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.first, 100, 100, TOLERANCE)
+    sl.schedule_delayed("tasks", tasks.second, 107, 100, TOLERANCE)
+    # due after the end of the window of first, so it needs its own wake
+    sl.schedule_delayed("tasks", tasks.alone, 150, 100)
+    sl.schedule_delayed("tasks", tasks.report, 380)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+SAVED_WAKES = re.compile(r'"saved_wakes": (\d+)')
+
+
+def _simulate(tolerance_sec):
+    result = simulate(MAIN.replace("TOLERANCE", str(tolerance_sec)), {"tasks": TASKS}, 400)
+    return result, [int(value) for value in SAVED_WAKES.findall(result["output"])]
+
+
+class CoalescingTest(unittest.TestCase):
+
+    def test_shared_wake(self):
+        # both tasks execute in the wake at the end of the earlier window, the repetitions as well,
+        # the first wake is early by DEEP_SLEEP_WAKEUP_DELAY_SEC before the latency was measured
+        result, saved_wakes = _simulate(10)
+        self.assertEqual(records(result, "RUN"), [("first", 108), ("second", 108), ("alone", 150),
+                                                  ("first", 210), ("second", 210), ("alone", 250),
+                                                  ("first", 310), ("second", 310), ("alone", 350)])
+        # the count is kept in RTC memory during the deep sleeps in between
+        self.assertEqual(saved_wakes, [3])
+        self.assertEqual(result["deep_sleeps"], 8)
+
+    def test_without_tolerance(self):
+        result, saved_wakes = _simulate(0)
+        self.assertEqual(records(result, "RUN"), [("first", 100), ("second", 107), ("alone", 150),
+                                                  ("first", 200), ("second", 207), ("alone", 250),
+                                                  ("first", 300), ("second", 307), ("alone", 350)])
+        self.assertEqual(saved_wakes, [0])
+        self.assertEqual(result["deep_sleeps"], 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
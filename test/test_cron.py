@@ -0,0 +1,127 @@
+# Host test of schedule_cron() against a brute-force reference of the matching times
+#
+# python3 test/test_cron.py
+
+import unittest
+
+from simulation import simulate, records
+import utime
+
+SECONDS_PER_DAY = 86400
+START_SEC = 6 * SECONDS_PER_DAY
+"""Friday 2000-01-07, the simulation covers the weekend and the following days."""
+DURATION_SEC = 4 * SECONDS_PER_DAY
+
+# spec and the allowed seconds, minutes, hours and weekdays written out
+SPECS = [
+    ("0 */15 6-21 0-4", [0], [0, 15, 30, 45], range(6, 22), range(0, 5)),
+    ("30 0 0 6", [30], [0], [0], [6]),
+    ("0,30 5-10/2 23 0,4", [0, 30], [5, 7, 9], [23], [0, 4]),
+    ("*/20 59 * *", [0, 20, 40], [59], range(24), range(7)),
+    ("59 59 23 *", [59], [59], [23], range(7)),
+    ("5-7 1 2-3,22 5/1", [5, 6, 7], [1], [2, 3, 22], [5, 6]),
+]
+
+TASKS = """
+import utime
+
+SPECS = SPECS_LIST
+
+
+def _task(index):
+    def task():
+        print("RUN", index, utime.time())
+    return task
+
+
+for _index in range(len(SPECS)):
+    globals()["cron{}".format(_index)] = _task(_index)
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    for index, spec in enumerate(tasks.SPECS):
+        sl.schedule_cron("tasks", "cron{}".format(index), spec)
+    print("PLAN", sl.plan(DURATION_SEC, 0)["executions"])
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+NEXT_MAIN = """
+import sleepscheduler_cron
+
+for index, spec in enumerate(SPECS_LIST):
+    cron = sleepscheduler_cron.parse(spec)
+    for after_sec in AFTER_LIST:
+        print("NEXT", index, after_sec, sleepscheduler_cron.next_sec(cron, after_sec))
+"""
+
+
+def _reference_times(fields, start_sec, end_sec):
+    # all seconds from start_sec before end_sec that match, by trying every combination of the fields
+    _, seconds, minutes, hours, weekdays = fields
+    times = []
+    for day in range(start_sec // SECONDS_PER_DAY, end_sec // SECONDS_PER_DAY + 1):
+        if utime.localtime(day * SECONDS_PER_DAY)[6] not in weekdays:
+            continue
+        for hour in hours:
+            for minute in minutes:
+                for second in seconds:
+                    sec = day * SECONDS_PER_DAY + hour * 3600 + minute * 60 + second
+                    if start_sec <= sec < end_sec:
+                        times.append(sec)
+    return sorted(times)
+
+
+def _reference_next(fields, after_sec):
+    start_sec = after_sec + 1
+    while True:
+        times = _reference_times(fields, start_sec, start_sec + 8 * SECONDS_PER_DAY)
+        if times:
+            return times[0]
+        start_sec = start_sec + 8 * SECONDS_PER_DAY
+
+
+def _specs_source():
+    return repr([fields[0] for fields in SPECS])
+
+
+class CronTest(unittest.TestCase):
+
+    def test_executions(self):
+        tasks = TASKS.replace("SPECS_LIST", _specs_source())
+        main = MAIN.replace("DURATION_SEC", str(DURATION_SEC))
+        result = simulate(main, {"tasks": tasks}, DURATION_SEC, START_SEC)
+        self.assertGreater(result["deep_sleeps"], 0)
+        executed = {}
+        for index, sec in records(result, "RUN"):
+            executed.setdefault(index, []).append(sec)
+        expected_count = 0
+        for index, fields in enumerate(SPECS):
+            expected = _reference_times(fields, START_SEC, START_SEC + DURATION_SEC)
+            expected_count = expected_count + len(expected)
+            self.assertEqual(executed.get(index, []), expected, fields[0])
+        # plan() counts the executions without simulating them
+        self.assertEqual(records(result, "PLAN"), [(expected_count,)])
+
+    def test_next_sec(self):
+        # around the ends of days, weeks, months and years, including the leap day of 2000
+        after_secs = [0, START_SEC - 1, START_SEC, 59 * SECONDS_PER_DAY + 86399,
+                      365 * SECONDS_PER_DAY + 86399, 366 * SECONDS_PER_DAY - 1, 12345678, 98765432]
+        main = NEXT_MAIN.replace("SPECS_LIST", _specs_source()).replace("AFTER_LIST", repr(after_secs))
+        result = simulate(main)
+        results = records(result, "NEXT")
+        self.assertEqual(len(results), len(SPECS) * len(after_secs))
+        for index, after_sec, next_sec in results:
+            self.assertEqual(next_sec, _reference_next(SPECS[index], after_sec), (SPECS[index][0], after_sec))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+# Host test of the time accounted to each state and the boots, compared with the time the
+# simulator spent in each state
+#
+# python3 test/test_energy.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+import utime
+
+
+def work():
+    utime.sleep_ms(500)
+
+
+def report():
+    energy = sl.get_energy()
+    print("ENERGY", energy["boots"], energy["executing_ms"], energy["idle_ms"], energy["sleep_ms"],
+          energy["deep_sleep_ms"], energy["total_ms"])
+    print("NAH", int(energy["mah"] * 1000000))
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.work, 10, 100)
+    sl.schedule_delayed("tasks", tasks.report, 350)
+
+
+sl.allow_deep_sleep = ALLOW_DEEP_SLEEP
+sl.allow_light_sleep = not ALLOW_DEEP_SLEEP
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+def _simulate(allow_deep_sleep):
+    return simulate(MAIN.replace("ALLOW_DEEP_SLEEP", str(allow_deep_sleep)), {"tasks": TASKS}, 355)
+
+
+class EnergyTest(unittest.TestCase):
+
+    def test_deep_sleep(self):
+        # kept in RTC memory during the deep sleeps, the first wake is early by
+        # DEEP_SLEEP_WAKEUP_DELAY_SEC before the latency was measured and waits idle
+        result = _simulate(True)
+        self.assertEqual(records(result, "ENERGY"), [(6, 2000, 2000, 0, 346000, 350000)])
+        # the simulator is only awake while executing or idle, also after the report
+        self.assertEqual(result["awake_sec"], 4)
+        # (2000 ms * 50 mA + 2000 ms * 30 mA + 346000 ms * 0.01 mA) / 3600000
+        self.assertEqual(records(result, "NAH"), [(45405,)])
+
+    def test_light_sleep(self):
+        result = _simulate(False)
+        self.assertEqual(records(result, "ENERGY"), [(1, 2000, 0, 348000, 0, 350000)])
+        self.assertEqual(result["awake_sec"], 2)
+        # (2000 ms * 50 mA + 348000 ms * 0.8 mA) / 3600000
+        self.assertEqual(records(result, "NAH"), [(105111,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# Host test of the tasks scheduled in milliseconds, while awake and across deep sleep
+#
+# python3 test/test_ms_tasks.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+import utime
+
+samples = 0
+
+
+def sample():
+    global samples
+    print("RUN sample", utime.time_ns() // 1000000)
+    # the time of the function does not delay the next execution
+    utime.sleep_ms(30)
+    samples = samples + 1
+    if samples == 20:
+        sl.remove_all("tasks", sample)
+
+
+def slow():
+    print("RUN slow", utime.time_ns() // 1000000)
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed_ms("tasks", tasks.sample, 1000, 250)
+    sl.schedule_delayed_ms("tasks", tasks.slow, 60500, 30250)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+class MsTasksTest(unittest.TestCase):
+
+    def test_repeat_without_drift(self):
+        result = simulate(MAIN, {"tasks": TASKS}, 10)
+        self.assertEqual(records(result, "RUN"), [("sample", 1000 + i * 250) for i in range(20)])
+        # too short for deep sleep in between, the only one is after the samples until slow is due
+        self.assertEqual(result["deep_sleeps"], 1)
+
+    def test_deep_sleep(self):
+        # the milliseconds are kept in RTC memory, each execution is after its own deep sleep
+        result = simulate(MAIN, {"tasks": TASKS}, 125)
+        self.assertEqual(records(result, "RUN")[20:], [("slow", 60500), ("slow", 90750), ("slow", 121000)])
+        self.assertEqual(result["deep_sleeps"], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
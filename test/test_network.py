@@ -0,0 +1,85 @@
+# Host test of the shared connection of the tasks that need the network with the fake network
+# module of the simulator
+#
+# python3 test/test_network.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import network
+import utime
+
+
+def _connected():
+    return int(network.WLAN(network.STA_IF).isconnected())
+
+
+def upload():
+    print("RUN upload", utime.time(), _connected())
+
+
+def fetch():
+    print("RUN fetch", utime.time(), _connected())
+
+
+def publish():
+    print("RUN publish", utime.time(), _connected())
+
+
+def local():
+    print("RUN local", utime.time(), _connected())
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.set_needs_network(sl.schedule_delayed("tasks", tasks.upload, 100, 100))
+    sl.set_needs_network(sl.schedule_delayed("tasks", tasks.fetch, 100, 100))
+    sl.schedule_delayed("tasks", tasks.local, 100, 100)
+    sl.set_needs_network(sl.schedule_delayed("tasks", tasks.publish, 130, 100))
+
+
+sl.wlan_ssid = "simulator"
+sl.network_group_sec = NETWORK_GROUP_SEC
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+def _simulate(network_group_sec):
+    return simulate(MAIN.replace("NETWORK_GROUP_SEC", str(network_group_sec)), {"tasks": TASKS}, 350)
+
+
+class NetworkTest(unittest.TestCase):
+
+    def test_one_connect_per_wake(self):
+        # publish is due within network_group_sec and executes early on the same connection,
+        # the first connect scans for the access point, the later ones use the one kept in RTC memory
+        result = _simulate(60)
+        self.assertEqual(records(result, "RUN"), [
+            ("upload", 103, 1), ("fetch", 103, 1), ("local", 103, 1), ("publish", 103, 1),
+            ("upload", 201, 1), ("fetch", 201, 1), ("local", 201, 1), ("publish", 201, 1),
+            ("upload", 301, 1), ("fetch", 301, 1), ("local", 301, 1), ("publish", 301, 1)])
+        self.assertEqual(result["wlan_connects"], 3)
+        # disconnected before each deep sleep
+        self.assertEqual(result["deep_sleeps"], 4)
+        self.assertEqual(result["output"].count("Disconnect from 'simulator'"), 3)
+
+    def test_without_group(self):
+        result = _simulate(0)
+        self.assertEqual(records(result, "RUN"), [
+            ("upload", 103, 1), ("fetch", 103, 1), ("local", 103, 1), ("publish", 131, 1),
+            ("upload", 201, 1), ("fetch", 201, 1), ("local", 201, 1), ("publish", 231, 1),
+            ("upload", 301, 1), ("fetch", 301, 1), ("local", 301, 1), ("publish", 331, 1)])
+        self.assertEqual(result["wlan_connects"], 6)
+        self.assertEqual(result["deep_sleeps"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
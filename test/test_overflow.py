@@ -0,0 +1,95 @@
+# Host test of the tasks that do not fit into the RTC memory and are moved to overflow_file
+#
+# python3 test/test_overflow.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASK_COUNT = 1000
+FIRST_SEC = 1000
+INTERVAL_SEC = 7
+FUNCTION_COUNT = 7
+REMOVE_SEC = FIRST_SEC + TASK_COUNT // 4 * INTERVAL_SEC + 3
+"""work3 is removed after a quarter, while its later tasks are in overflow_file."""
+END_SEC = FIRST_SEC + TASK_COUNT * INTERVAL_SEC
+
+TASKS = """
+import os
+import sleepscheduler as sl
+import utime
+
+
+def _work(index):
+    def work():
+        print("RUN", index, utime.time())
+    return work
+
+
+for _index in range(FUNCTION_COUNT):
+    globals()["work{}".format(_index)] = _work(_index)
+
+
+def _file_exists():
+    return 1 if sl.overflow_file in os.listdir() else 0
+
+
+def probe():
+    print("PROBE", _file_exists(), len(sl.rtc_memory_bytes))
+
+
+def remove():
+    print("REMOVE", _file_exists(), 0 if sl._overflow_sec is None else 1)
+    sl.remove_all("tasks", "work3")
+
+
+def end():
+    print("END", _file_exists())
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    for i in range(TASK_COUNT):
+        sl.schedule_epoch_sec("tasks", "work{}".format(i % FUNCTION_COUNT), FIRST_SEC + i * INTERVAL_SEC)
+    sl.schedule_epoch_sec("tasks", tasks.probe, FIRST_SEC + 1)
+    sl.schedule_epoch_sec("tasks", tasks.remove, REMOVE_SEC)
+    sl.schedule_epoch_sec("tasks", tasks.end, END_SEC)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+def _replace_constants(source):
+    for name in ("TASK_COUNT", "FIRST_SEC", "INTERVAL_SEC", "FUNCTION_COUNT", "REMOVE_SEC", "END_SEC"):
+        source = source.replace(name, str(globals()[name]))
+    return source
+
+
+class OverflowTest(unittest.TestCase):
+
+    def test_spill_and_load(self):
+        result = simulate(_replace_constants(MAIN), {"tasks": _replace_constants(TASKS)}, END_SEC + 10)
+        self.assertGreater(result["deep_sleeps"], 0)
+        # the tasks did not fit, so the file was written with the first deep sleep
+        self.assertEqual(records(result, "PROBE")[0][0], 1)
+        self.assertEqual(records(result, "REMOVE"), [(1, 1)])
+        expected = []
+        for i in range(TASK_COUNT):
+            sec = FIRST_SEC + i * INTERVAL_SEC
+            if i % FUNCTION_COUNT != 3 or sec < REMOVE_SEC:
+                expected.append((i % FUNCTION_COUNT, sec))
+        # every task is executed once on time, removed ones are not
+        self.assertEqual(records(result, "RUN"), expected)
+        # the file is removed when all its tasks were loaded
+        self.assertEqual(records(result, "END"), [(0,)])
+
+
+if __name__ == "__main__":
+    unittest.main()
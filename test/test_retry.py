@@ -0,0 +1,103 @@
+# Host test of the retries of failing tasks with exponential backoff
+#
+# python3 test/test_retry.py
+
+import re
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import utime
+
+
+def fail():
+    print("RUN fail", utime.time())
+    raise ValueError("failed")
+
+
+def fail_until_150():
+    print("RUN fail_until_150", utime.time())
+    if utime.time() < 150:
+        raise ValueError("failed")
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    task = sl.schedule_delayed("tasks", tasks.FUNCTION, 100, REPEAT_AFTER_SEC)
+    sl.set_retry(task, MAX_ATTEMPTS, 30, 2)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+DELAY_MAIN = """
+import sleepscheduler as sl
+import tasks
+
+# the delays of all attempts without the regular execution, which would drop the retries
+task = sl.schedule_delayed("tasks", tasks.fail, 100, REPEAT_AFTER_SEC)
+sl.set_retry(task, 6, 30, 2)
+sl.remove_all("tasks", "fail")
+for attempt in range(7):
+    task.attempt = attempt
+    sl._schedule_retry(task)
+"""
+
+RETRY_LOG = re.compile(r"Retry (\d+) of function .* in (\d+) ms")
+
+
+def _simulate_retries(function, repeat_after_sec, max_attempts, duration_sec):
+    main = MAIN.replace("FUNCTION", function).replace("REPEAT_AFTER_SEC", str(repeat_after_sec)) \
+        .replace("MAX_ATTEMPTS", str(max_attempts))
+    result = simulate(main, {"tasks": TASKS}, duration_sec)
+    return [sec for name, sec in records(result, "RUN")], result
+
+
+def _retry_delays_ms(result):
+    return [(int(match.group(1)), int(match.group(2))) for match in RETRY_LOG.finditer(result["output"])]
+
+
+class RetryTest(unittest.TestCase):
+
+    def test_one_shot(self):
+        # the delay doubles with every attempt until the attempts are used up
+        times, result = _simulate_retries("fail", 0, 4, 1000)
+        self.assertGreater(result["deep_sleeps"], 0)
+        self.assertEqual(times, [100, 130, 190, 310, 550])
+        self.assertIn("failed after 4 retries", result["output"])
+
+    def test_repeating(self):
+        # the third retry at 290 would be after the regular execution at 200, so it is dropped
+        # and every regular execution starts the retries again
+        times, result = _simulate_retries("fail", 100, 4, 450)
+        self.assertGreater(result["deep_sleeps"], 0)
+        self.assertEqual(times, [100, 130, 190, 200, 230, 290, 300, 330, 390, 400, 430])
+        self.assertNotIn("failed after", result["output"])
+
+    def test_recovers(self):
+        # the retries stop with the first successful execution
+        times, _ = _simulate_retries("fail_until_150", 100, 4, 450)
+        self.assertEqual(times, [100, 130, 190, 200, 300, 400])
+
+    def test_delays(self):
+        result = simulate(DELAY_MAIN.replace("REPEAT_AFTER_SEC", "0"), {"tasks": TASKS})
+        self.assertEqual(_retry_delays_ms(result),
+                         [(1, 30000), (2, 60000), (3, 120000), (4, 240000), (5, 480000), (6, 960000)])
+        self.assertIn("failed after 6 retries", result["output"])
+
+    def test_delays_capped_by_period(self):
+        result = simulate(DELAY_MAIN.replace("REPEAT_AFTER_SEC", "100"), {"tasks": TASKS})
+        self.assertEqual(_retry_delays_ms(result),
+                         [(1, 30000), (2, 60000), (3, 100000), (4, 100000), (5, 100000), (6, 100000)])
+        self.assertIn("failed after 6 retries", result["output"])
+
+
+if __name__ == "__main__":
+    unittest.main()
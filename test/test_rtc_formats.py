@@ -0,0 +1,147 @@
+# Host test of the RTC memory left by older versions of sleepscheduler and of the order of
+# tasks due in the same second that are restored without decoding them on every wake
+#
+# python3 test/test_rtc_formats.py
+
+import unittest
+
+from simulation import simulate, records
+
+# Stored at 1000 by the last version of sleepscheduler that wrote the format, with the tasks
+# tasks.first at 1100 repeating every 60 seconds, tasks.second at 1100 and other.third at 1200,
+# rtc_memory_bytes b"kept", from version 3 on the ring buffer "ring" of ">h" with -3 and 7
+# and from version 4 on the slots "slots" with count = 42.
+FIXTURES = {
+    0: "000000037461736b73006669727374000000044c0000003c7461736b73007365636f6e64000000044c00000000"
+       "6f7468657200746869726400000004b0000000006b657074",
+    1: "0184ae621005057461736b73056669727374067365636f6e64056f7468657205746869726403000001cc083c00"
+       "0002000000030464006b657074",
+    2: "02fa71ee1305057461736b73056669727374067365636f6e64056f7468657205746869726403000001cc083c00"
+       "00020000000304640003010300e807000208d00f00000000000000040501000000006b657074",
+    3: "030a5b2a5c07057461736b73056669727374067365636f6e64056f746865720574686972640472696e67023e68"
+       "03000001cc083c0000020000000304640003010300e807000208d00f0000000000000004050100000000010506"
+       "040200fffd00076b657074",
+    4: "04a372b8fb09057461736b73056669727374067365636f6e64056f746865720574686972640472696e67023e68"
+       "05736c6f747309636f756e743a75313603000001cc083c0000020000000304640003010300e807000208d00f00"
+       "00000000000004050100000000010506040200fffd0007010708022a006b657074",
+}
+
+TASKS = """
+import utime
+
+
+def first():
+    print("RUN first", utime.time())
+
+
+def second():
+    print("RUN second", utime.time())
+"""
+
+OTHER = """
+import utime
+
+
+def third():
+    print("RUN third", utime.time())
+"""
+
+FORMAT_MAIN = """
+import binascii
+import machine
+
+if machine.reset_cause() != machine.DEEPSLEEP_RESET:
+    # the RTC memory as left by the older version before the update
+    machine.RTC().memory(binascii.unhexlify(FIXTURE))
+    machine.deepsleep(1)
+
+import sleepscheduler as sl
+
+print("KEPT", bytes(sl.rtc_memory_bytes).decode())
+if VERSION >= 3:
+    print("RING", *[value for (value,) in sl.ring_buffer("ring", ">h", 4)])
+if VERSION >= 4:
+    print("SLOTS", sl.rtc_slots("slots", (("count", "u16"),)).count)
+sl.run_forever()
+"""
+
+ORDER_TASKS = """
+import sleepscheduler as sl
+import utime
+
+
+def _task(index):
+    def task():
+        print("RUN", index, utime.time())
+    return task
+
+
+for _index in range(TASK_COUNT):
+    globals()["task{}".format(_index)] = _task(_index)
+
+
+def schedule_block():
+    # fewer tasks on every wake so that the runs of the earlier wakes are not merged
+    block = utime.time() // 10
+    first = TASK_COUNT - TASK_COUNT // 2 ** block
+    last = TASK_COUNT - TASK_COUNT // 2 ** (block + 1)
+    for index in range(first, last):
+        # every third task is due a second later
+        sl.schedule_epoch_sec("tasks", "task{}".format(index), DUE_SEC + (1 if index % 3 == 0 else 0))
+    print("RUNS", len(sl._pending_runs))
+"""
+
+ORDER_MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.schedule_block, 0, 10)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+class RtcFormatTest(unittest.TestCase):
+
+    def _simulate_fixture(self, version):
+        main = FORMAT_MAIN.replace("FIXTURE", repr(FIXTURES[version])).replace("VERSION", str(version))
+        return simulate(main, {"tasks": TASKS, "other": OTHER}, 250, 1000)
+
+    def test_versions(self):
+        for version in sorted(FIXTURES):
+            with self.subTest(version=version):
+                result = self._simulate_fixture(version)
+                self.assertEqual(records(result, "RUN"), [("first", 1100), ("second", 1100), ("first", 1160),
+                                                          ("third", 1200), ("first", 1220)])
+                # restored from the old format on the first wake and from the current one after
+                kept = records(result, "KEPT")
+                self.assertGreater(len(kept), 1)
+                self.assertEqual(set(kept), {("kept",)})
+                if version >= 3:
+                    self.assertEqual(set(records(result, "RING")), {(-3, 7)})
+                if version >= 4:
+                    self.assertEqual(set(records(result, "SLOTS")), {(42,)})
+
+    def test_same_second_order(self):
+        # the tasks of each wake are stored as a run that is only decoded when it is due,
+        # tasks due in the same second are still executed in the order they were scheduled
+        task_count = 64
+        due_sec = 100
+        tasks = ORDER_TASKS.replace("TASK_COUNT", str(task_count)).replace("DUE_SEC", str(due_sec))
+        result = simulate(ORDER_MAIN, {"tasks": tasks}, due_sec + 5)
+        self.assertGreater(result["deep_sleeps"], 0)
+        self.assertGreater(max([runs for (runs,) in records(result, "RUNS")]), 1)
+        scheduled = [index for index in range(task_count) if index % 3 != 0] + \
+            [index for index in range(task_count) if index % 3 == 0]
+        self.assertEqual([index for index, _ in records(result, "RUN")], scheduled)
+        self.assertEqual([sec for _, sec in records(result, "RUN")],
+                         [due_sec + (1 if index % 3 == 0 else 0) for index in scheduled])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+# Host test of the typed slots kept in RTC memory during deep sleep
+#
+# python3 test/test_slots.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+
+FIELDS = (("count", "u16"), ("level", "i8"))
+
+
+def count():
+    slots = sl.rtc_slots("counter", FIELDS)
+    slots.count = slots.count + 1
+    slots.level = -slots.count
+    print("COUNT", slots.count, slots.level)
+
+
+def misspell():
+    try:
+        sl.rtc_slots("counter", (("count", "u17"), ("level", "i8")))
+    except ValueError as e:
+        print("ERROR", e)
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.count, 10, 10)
+    sl.schedule_delayed("tasks", tasks.misspell, 25)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+class SlotsTest(unittest.TestCase):
+
+    def test_kept_during_deep_sleep(self):
+        result = simulate(MAIN, {"tasks": TASKS}, 45)
+        self.assertGreater(result["deep_sleeps"], 0)
+        self.assertEqual(records(result, "COUNT"), [(1, -1), (2, -2), (3, -3), (4, -4)])
+
+    def test_unknown_type(self):
+        # the misspelled type at 25 does not reset the count
+        result = simulate(MAIN, {"tasks": TASKS}, 45)
+        self.assertIn("ERROR invalid type 'u17' of field 'count' of slots 'counter'", result["output"])
+        self.assertEqual(records(result, "COUNT")[2:], [(3, -3), (4, -4)])
+
+
+if __name__ == "__main__":
+    unittest.main()
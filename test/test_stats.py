@@ -0,0 +1,80 @@
+# Host test of the statistics of the executed tasks, kept in RTC memory or reset on every wake
+#
+# python3 test/test_stats.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+import utime
+
+
+def work():
+    # 100 ms longer on every execution
+    utime.sleep_ms((utime.time() - 10) // 20 * 100 + 100)
+
+
+def after():
+    pass
+
+
+def fail():
+    raise ValueError("failed")
+
+
+def report():
+    for name in ("work", "after", "fail"):
+        stats = sl.get_task_stats("tasks", name)
+        if stats is None:
+            print("STATS", name, "None")
+        else:
+            print("STATS", name, stats["runs"], stats["failures"], stats["total_ms"], stats["max_ms"],
+                  stats["last_ms"], stats["late_total_ms"], stats["late_max_ms"], stats["last_late_ms"])
+    sl.print_task_stats()
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.work, 10, 20)
+    # executes when work returned, as late as work took
+    sl.schedule_delayed("tasks", tasks.after, 10, 20)
+    sl.schedule_delayed("tasks", tasks.fail, 20)
+    sl.schedule_delayed("tasks", tasks.report, 60)
+
+
+sl.store_task_stats = STORE_TASK_STATS
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+def _simulate(store_task_stats):
+    return simulate(MAIN.replace("STORE_TASK_STATS", str(store_task_stats)), {"tasks": TASKS}, 65)
+
+
+class StatsTest(unittest.TestCase):
+
+    def test_stored(self):
+        result = _simulate(True)
+        self.assertGreater(result["deep_sleeps"], 3)
+        self.assertEqual(records(result, "STATS"), [("work", 3, 0, 600, 300, 300, 0, 0, 0),
+                                                    ("after", 3, 0, 0, 0, 0, 600, 300, 300),
+                                                    ("fail", 1, 1, 0, 0, 0, 0, 0, 0)])
+        self.assertIn('print_task_stats() { "module_name": "tasks", "function_name": "work", "runs": 3, "failures": 0, '
+                      '"total_ms": 600, "max_ms": 300, "last_ms": 300', result["output"])
+
+    def test_reset_on_wake(self):
+        # report executes in a wake of its own
+        result = _simulate(False)
+        self.assertEqual(records(result, "STATS"), [("work", "None"), ("after", "None"), ("fail", "None")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+# Host test of the measured wakeup latency that the scheduler wakes up early by
+#
+# python3 test/test_wakeup_latency.py
+
+import unittest
+
+from simulation import simulate, records
+
+TASKS = """
+import sleepscheduler as sl
+
+
+def tick():
+    print("WAKE", sl._wakeup_lead_ms(), sl._early_wakes, sl._early_wakes_total_ms, sl._late_wakes)
+"""
+
+MAIN = """
+import sleepscheduler as sl
+import tasks
+
+
+def init_on_cold_boot():
+    sl.schedule_delayed("tasks", tasks.tick, 60, 60)
+
+
+sl.initial_deep_sleep_delay_sec = 0
+sl.schedule_on_cold_boot(init_on_cold_boot)
+sl.run_forever()
+"""
+
+
+def _simulate_wakes(wakeup_latency_ms):
+    result = simulate(MAIN, {"tasks": TASKS}, 20 * 60 + 30, 0, wakeup_latency_ms)
+    wakes = records(result, "WAKE")
+    leads = [lead_ms for lead_ms, _, _, _ in wakes]
+    # how early each wake was, from the totals after it
+    early_ms = []
+    previous_total_ms = 0
+    for _, _, total_ms, _ in wakes:
+        early_ms.append(total_ms - previous_total_ms)
+        previous_total_ms = total_ms
+    return result, wakes, leads, early_ms
+
+
+class WakeupLatencyTest(unittest.TestCase):
+
+    def test_converges(self):
+        result, wakes, leads, early_ms = _simulate_wakes(80)
+        self.assertEqual(len(wakes), 20)
+        # the last deep sleep lasts until the end of the simulation
+        self.assertEqual(result["deep_sleeps"], len(wakes) + 1)
+        # the first wake after the cold boot uses DEEP_SLEEP_WAKEUP_DELAY_SEC, its measurement
+        # replaces it with the latency plus twice half of it
+        self.assertEqual(early_ms[0], 2000 - 80)
+        self.assertEqual(leads[0], 160)
+        self.assertEqual(leads, sorted(leads, reverse=True))
+        self.assertEqual(leads[-1], 80)
+        # only the first wake is early by more than the deviation of the first measurement
+        self.assertEqual(len([ms for ms in early_ms if ms > 80]), 1)
+        self.assertEqual(wakes[-1][3], 0)
+
+    def test_no_latency(self):
+        _, wakes, leads, early_ms = _simulate_wakes(0)
+        self.assertEqual(early_ms[0], 2000)
+        self.assertEqual(set(leads), {0})
+        self.assertEqual(early_ms[1:], [0] * (len(wakes) - 1))
+        self.assertEqual(wakes[-1][3], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()